@@ -0,0 +1,41 @@
+"""add_ban_addresses
+
+Revision ID: add_ban_addresses_001
+Revises: add_geocode_cache_001
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_ban_addresses_001'
+down_revision = 'add_geocode_cache_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Extrait local de la Base Adresse Nationale (charge par scripts/load_ban.py)
+    op.create_table('ban_addresses',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('departement', sa.String(3), nullable=False),
+        sa.Column('numero', sa.Integer(), nullable=True),
+        sa.Column('rep', sa.String(10), nullable=True),
+        sa.Column('nom_voie', sa.String(), nullable=False),
+        sa.Column('street_key', sa.String(), nullable=False),
+        sa.Column('code_postal', sa.String(5), nullable=False),
+        sa.Column('code_insee', sa.String(5), nullable=False),
+        sa.Column('nom_commune', sa.String(), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ban_addresses_departement', 'ban_addresses', ['departement'])
+    op.create_index('idx_ban_addresses_lookup', 'ban_addresses', ['code_postal', 'street_key', 'numero'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_ban_addresses_lookup', table_name='ban_addresses')
+    op.drop_index('ix_ban_addresses_departement', table_name='ban_addresses')
+    op.drop_table('ban_addresses')
@@ -0,0 +1,49 @@
+"""add_communes
+
+Revision ID: add_communes_001
+Revises: add_pool_geog_001
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from geoalchemy2 import Geometry
+
+# revision identifiers, used by Alembic.
+revision = 'add_communes_001'
+down_revision = 'add_pool_geog_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Contours des communes (charges par scripts/load_communes.py)
+    op.create_table('communes',
+        sa.Column('insee_code', sa.String(5), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('departement', sa.String(3), nullable=True),
+        sa.Column('epci_code', sa.String(9), nullable=True),
+        sa.Column('epci_name', sa.String(), nullable=True),
+        sa.Column('geom', Geometry(geometry_type='MULTIPOLYGON', srid=4326, spatial_index=False), nullable=False),
+        sa.PrimaryKeyConstraint('insee_code')
+    )
+    op.create_index('ix_communes_departement', 'communes', ['departement'])
+    op.create_index('ix_communes_epci_code', 'communes', ['epci_code'])
+    op.execute('CREATE INDEX idx_communes_geom ON communes USING GIST (geom)')
+
+    # Code INSEE de la commune des biens du pool et des biens evalues
+    op.add_column('comparable_pool', sa.Column('insee_code', sa.String(5), nullable=True))
+    op.create_index('idx_comparable_pool_insee_type', 'comparable_pool', ['insee_code', 'property_type'])
+    op.add_column('property_infos', sa.Column('insee_code', sa.String(5), nullable=True))
+    op.create_index('ix_property_infos_insee_code', 'property_infos', ['insee_code'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_property_infos_insee_code', table_name='property_infos')
+    op.drop_column('property_infos', 'insee_code')
+    op.drop_index('idx_comparable_pool_insee_type', table_name='comparable_pool')
+    op.drop_column('comparable_pool', 'insee_code')
+    op.execute('DROP INDEX IF EXISTS idx_communes_geom')
+    op.drop_index('ix_communes_epci_code', table_name='communes')
+    op.drop_index('ix_communes_departement', table_name='communes')
+    op.drop_table('communes')
@@ -0,0 +1,72 @@
+"""add_comparable_dedup
+
+Revision ID: add_comparable_dedup_001
+Revises: add_pool_geom_trigger_001
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_comparable_dedup_001'
+down_revision = 'add_pool_geom_trigger_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # similarity() des adresses candidates
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # NULL = a examiner : les biens existants sont traites au premier passage
+    op.add_column('comparable_pool', sa.Column('dedup_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'idx_comparable_pool_dedup_pending', 'comparable_pool', ['id'],
+        postgresql_where=sa.text('dedup_at IS NULL'),
+    )
+
+    op.create_table('comparable_pool_merges',
+        sa.Column('duplicate_id', sa.Integer(), nullable=False),
+        sa.Column('survivor_id', sa.Integer(), nullable=True),
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('source_reference', sa.String(), nullable=True),
+        sa.Column('similarity', sa.Float(), nullable=False),
+        sa.Column('distance_m', sa.Float(), nullable=False),
+        sa.Column('payload', postgresql.JSONB(), nullable=False),
+        sa.Column('merged_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['survivor_id'], ['comparable_pool.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('duplicate_id')
+    )
+    op.create_index('ix_comparable_pool_merges_survivor_id', 'comparable_pool_merges', ['survivor_id'])
+    op.create_index('ix_comparable_pool_merges_source_reference', 'comparable_pool_merges', ['source_reference'])
+
+    # Un bien deplace est reexamine
+    op.execute("""
+        CREATE OR REPLACE FUNCTION comparable_pool_set_geom() RETURNS trigger AS $$
+        BEGIN
+            NEW.geom := ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326);
+            IF TG_OP = 'UPDATE' AND (NEW.latitude, NEW.longitude) IS DISTINCT FROM (OLD.latitude, OLD.longitude) THEN
+                NEW.dedup_at := NULL;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION comparable_pool_set_geom() RETURNS trigger AS $$
+        BEGIN
+            NEW.geom := ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.drop_index('ix_comparable_pool_merges_source_reference', table_name='comparable_pool_merges')
+    op.drop_index('ix_comparable_pool_merges_survivor_id', table_name='comparable_pool_merges')
+    op.drop_table('comparable_pool_merges')
+    op.drop_index('idx_comparable_pool_dedup_pending', table_name='comparable_pool')
+    op.drop_column('comparable_pool', 'dedup_at')
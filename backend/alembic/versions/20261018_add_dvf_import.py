@@ -0,0 +1,44 @@
+"""add_dvf_import
+
+Revision ID: add_dvf_import_001
+Revises: add_ban_addresses_001
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_dvf_import_001'
+down_revision = 'add_ban_addresses_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Colonne geom du modele DVFRecord, absente du schema initial (PostGIS desactive)
+    op.execute("ALTER TABLE dvf_records ADD COLUMN IF NOT EXISTS geom geography(Point, 4326)")
+    op.execute('CREATE INDEX IF NOT EXISTS idx_dvf_geom ON dvf_records USING GIST (geom)')
+
+    # Fichier d'origine de chaque ligne : rechargement idempotent d'un fichier
+    op.add_column('dvf_records', sa.Column('source_file', sa.String(), nullable=True))
+    op.create_index('ix_dvf_records_source_file', 'dvf_records', ['source_file'])
+
+    # Fichiers entierement charges (reprise d'un import interrompu)
+    op.create_table('dvf_import_files',
+        sa.Column('file_name', sa.String(), nullable=False),
+        sa.Column('file_format', sa.String(10), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('skipped', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('seconds', sa.Float(), nullable=True),
+        sa.Column('loaded_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('file_name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('dvf_import_files')
+    op.drop_index('ix_dvf_records_source_file', table_name='dvf_records')
+    op.drop_column('dvf_records', 'source_file')
+    op.execute('DROP INDEX IF EXISTS idx_dvf_geom')
+    op.execute('ALTER TABLE dvf_records DROP COLUMN IF EXISTS geom')
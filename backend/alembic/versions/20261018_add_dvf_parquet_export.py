@@ -0,0 +1,27 @@
+"""add_dvf_parquet_export
+
+Revision ID: add_dvf_parquet_export_001
+Revises: add_dvf_promotions_001
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_dvf_parquet_export_001'
+down_revision = 'add_dvf_promotions_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fichiers a exporter en Parquet : exported_at NULL ou anterieur au dernier import
+    op.add_column('dvf_import_files', sa.Column('exported_at', sa.DateTime(), nullable=True))
+    # Partitions (departement, annee) touchees par les imports pas encore exportes
+    op.add_column('dvf_import_files', sa.Column('parquet_partitions', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('dvf_import_files', 'parquet_partitions')
+    op.drop_column('dvf_import_files', 'exported_at')
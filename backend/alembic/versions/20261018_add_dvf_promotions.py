@@ -0,0 +1,37 @@
+"""add_dvf_promotions
+
+Revision ID: add_dvf_promotions_001
+Revises: partition_dvf_001
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_dvf_promotions_001'
+down_revision = 'partition_dvf_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fichiers a promouvoir : promoted_at NULL ou anterieur au dernier import
+    op.add_column('dvf_import_files', sa.Column('promoted_at', sa.DateTime(), nullable=True))
+
+    op.create_table('dvf_promotions',
+        sa.Column('mutation_id', sa.String(), nullable=False),
+        sa.Column('pool_id', sa.Integer(), nullable=False),
+        sa.Column('source_file', sa.String(), nullable=False),
+        sa.Column('promoted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['pool_id'], ['comparable_pool.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('mutation_id'),
+        sa.UniqueConstraint('pool_id')
+    )
+    op.create_index('ix_dvf_promotions_source_file', 'dvf_promotions', ['source_file'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_dvf_promotions_source_file', table_name='dvf_promotions')
+    op.drop_table('dvf_promotions')
+    op.drop_column('dvf_import_files', 'promoted_at')
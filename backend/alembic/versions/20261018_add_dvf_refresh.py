@@ -0,0 +1,61 @@
+"""add_dvf_refresh
+
+Revision ID: add_dvf_refresh_001
+Revises: add_dvf_import_001
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_dvf_refresh_001'
+down_revision = 'add_dvf_import_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Empreinte et bilan de fusion par fichier (les fichiers deja charges,
+    # sans empreinte, seront fusionnes une fois au prochain import)
+    op.add_column('dvf_import_files', sa.Column('checksum', sa.String(64), nullable=True))
+    op.add_column('dvf_import_files', sa.Column('size_bytes', sa.BigInteger(), nullable=True))
+    op.add_column('dvf_import_files', sa.Column('inserted', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('dvf_import_files', sa.Column('updated', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('dvf_import_files', sa.Column('deleted', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table('dvf_watermarks',
+        sa.Column('departement', sa.String(3), nullable=False),
+        sa.Column('max_mutation_date', sa.Date(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('departement')
+    )
+    op.execute("""
+        INSERT INTO dvf_watermarks (departement, max_mutation_date, updated_at)
+        SELECT departement, max(mutation_date), now() AT TIME ZONE 'utc'
+        FROM dvf_records
+        WHERE departement IS NOT NULL
+        GROUP BY departement
+    """)
+
+    # Local de la disposition (services/dvf_import.py). Les lignes deja chargees
+    # gardent une cle unique : aucune n'est supprimee, celles d'un fichier sont
+    # remplacees par la fusion au prochain import de ce fichier
+    op.add_column('dvf_records', sa.Column('lot_key', sa.String(), nullable=True))
+    op.execute("UPDATE dvf_records SET lot_key = 'legacy-' || id")
+    op.alter_column('dvf_records', 'lot_key', nullable=False)
+    op.execute("""
+        CREATE UNIQUE INDEX uq_dvf_records_mutation
+        ON dvf_records (mutation_id, numero_disposition, lot_key) NULLS NOT DISTINCT
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS uq_dvf_records_mutation')
+    op.drop_column('dvf_records', 'lot_key')
+    op.drop_table('dvf_watermarks')
+    op.drop_column('dvf_import_files', 'deleted')
+    op.drop_column('dvf_import_files', 'updated')
+    op.drop_column('dvf_import_files', 'inserted')
+    op.drop_column('dvf_import_files', 'size_bytes')
+    op.drop_column('dvf_import_files', 'checksum')
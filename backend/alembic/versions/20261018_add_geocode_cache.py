@@ -0,0 +1,34 @@
+"""add_geocode_cache
+
+Revision ID: add_geocode_cache_001
+Revises: add_communes_001
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_geocode_cache_001'
+down_revision = 'add_communes_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Cache persistant des geocodages, cle = adresse normalisee
+    op.create_table('geocode_cache',
+        sa.Column('normalized_address', sa.String(), nullable=False),
+        sa.Column('address', sa.String(), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('provider', sa.String(20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('normalized_address')
+    )
+    op.create_index('ix_geocode_cache_created_at', 'geocode_cache', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_geocode_cache_created_at', table_name='geocode_cache')
+    op.drop_table('geocode_cache')
@@ -0,0 +1,34 @@
+"""add_geog_to_comparable_pool
+
+Revision ID: add_pool_geog_001
+Revises: add_geographic_zones_001
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_pool_geog_001'
+down_revision = 'add_geographic_zones_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Colonne geography generee a partir de geom : evite le cast geom::geography
+    # ligne par ligne qui empechait l'utilisation de l'index GIST
+    op.execute("""
+        ALTER TABLE comparable_pool
+        ADD COLUMN geog geography(Point, 4326)
+        GENERATED ALWAYS AS (geom::geography) STORED
+    """)
+
+    # Index GIST sur la colonne geography (utilise par ST_DWithin en metres)
+    op.execute('CREATE INDEX idx_comparable_pool_geog ON comparable_pool USING GIST (geog)')
+    op.execute('ANALYZE comparable_pool')
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS idx_comparable_pool_geog')
+    op.drop_column('comparable_pool', 'geog')
@@ -0,0 +1,42 @@
+"""add_pool_geom_trigger
+
+Revision ID: add_pool_geom_trigger_001
+Revises: add_price_heatmap_001
+Create Date: 2026-10-18 23:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_pool_geom_trigger_001'
+down_revision = 'add_price_heatmap_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # geom derivee de latitude/longitude a chaque insertion ou deplacement ;
+    # geog (colonne generee depuis geom) est recalculee apres les triggers BEFORE.
+    # Trigger plutot que colonne generee : une colonne generee ne peut pas
+    # servir de source a une autre (geog)
+    op.execute("""
+        CREATE FUNCTION comparable_pool_set_geom() RETURNS trigger AS $$
+        BEGIN
+            NEW.geom := ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER comparable_pool_set_geom
+        BEFORE INSERT OR UPDATE OF latitude, longitude ON comparable_pool
+        FOR EACH ROW EXECUTE FUNCTION comparable_pool_set_geom()
+    """)
+    # Les lignes existantes sans geom ne sont pas mises a jour ici (verrou sur
+    # toute la table) : scripts/backfill_pool_geom.py, par paquets commites
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS comparable_pool_set_geom ON comparable_pool')
+    op.execute('DROP FUNCTION IF EXISTS comparable_pool_set_geom()')
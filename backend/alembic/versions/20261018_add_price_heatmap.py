@@ -0,0 +1,95 @@
+"""add_price_heatmap
+
+Revision ID: add_price_heatmap_001
+Revises: add_dvf_parquet_export_001
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_price_heatmap_001'
+down_revision = 'add_dvf_parquet_export_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('price_heatmap_cells',
+        sa.Column('source', sa.String(length=10), nullable=False),
+        sa.Column('property_type', sa.String(length=20), nullable=False),
+        sa.Column('precision', sa.SmallInteger(), nullable=False),
+        sa.Column('quarter', sa.Date(), nullable=False),
+        sa.Column('geohash', sa.String(length=12), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.Column('sale_count', sa.Integer(), nullable=False),
+        sa.Column('sale_p25', sa.Float(), nullable=True),
+        sa.Column('sale_median', sa.Float(), nullable=True),
+        sa.Column('sale_p75', sa.Float(), nullable=True),
+        sa.Column('rent_count', sa.Integer(), nullable=False),
+        sa.Column('rent_p25', sa.Float(), nullable=True),
+        sa.Column('rent_median', sa.Float(), nullable=True),
+        sa.Column('rent_p75', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('source', 'property_type', 'precision', 'quarter', 'geohash')
+    )
+
+    op.create_table('price_heatmap_dirty',
+        sa.Column('source', sa.String(length=10), nullable=False),
+        sa.Column('property_type', sa.String(length=20), nullable=False),
+        sa.Column('quarter', sa.Date(), nullable=False),
+        sa.Column('geohash', sa.String(length=12), nullable=False),
+        sa.PrimaryKeyConstraint('source', 'property_type', 'quarter', 'geohash')
+    )
+
+    # Fichiers DVF a reporter dans la carte : heatmap_at NULL ou anterieur au dernier import
+    op.add_column('dvf_import_files', sa.Column('heatmap_at', sa.DateTime(), nullable=True))
+
+    # Cellules touchees par les ecritures du pool (ancienne et nouvelle position),
+    # au geohash de 8 caracteres (HEATMAP_KEY_PRECISION de services/price_heatmap.py)
+    op.execute("""
+        CREATE FUNCTION comparable_pool_heatmap_dirty() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO price_heatmap_dirty (source, property_type, quarter, geohash)
+                VALUES (
+                    'pool', OLD.property_type, date_trunc('quarter', OLD.transaction_date)::date,
+                    ST_GeoHash(ST_SetSRID(ST_MakePoint(OLD.longitude, OLD.latitude), 4326), 8)
+                )
+                ON CONFLICT DO NOTHING;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO price_heatmap_dirty (source, property_type, quarter, geohash)
+                VALUES (
+                    'pool', NEW.property_type, date_trunc('quarter', NEW.transaction_date)::date,
+                    ST_GeoHash(ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326), 8)
+                )
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER comparable_pool_heatmap_dirty_write
+        AFTER INSERT OR DELETE ON comparable_pool
+        FOR EACH ROW EXECUTE FUNCTION comparable_pool_heatmap_dirty()
+    """)
+    # Mises a jour : seulement si une colonne de la carte change (pas updated_at, insee_code...)
+    op.execute("""
+        CREATE TRIGGER comparable_pool_heatmap_dirty_update
+        AFTER UPDATE OF latitude, longitude, property_type, transaction_type, price_per_m2, transaction_date
+        ON comparable_pool
+        FOR EACH ROW EXECUTE FUNCTION comparable_pool_heatmap_dirty()
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS comparable_pool_heatmap_dirty_update ON comparable_pool')
+    op.execute('DROP TRIGGER IF EXISTS comparable_pool_heatmap_dirty_write ON comparable_pool')
+    op.execute('DROP FUNCTION IF EXISTS comparable_pool_heatmap_dirty()')
+    op.drop_column('dvf_import_files', 'heatmap_at')
+    op.drop_table('price_heatmap_dirty')
+    op.drop_table('price_heatmap_cells')
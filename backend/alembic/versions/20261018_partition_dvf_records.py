@@ -0,0 +1,128 @@
+"""partition_dvf_records
+
+Revision ID: partition_dvf_001
+Revises: add_dvf_refresh_001
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'partition_dvf_001'
+down_revision = 'add_dvf_refresh_001'
+branch_labels = None
+depends_on = None
+
+_COLUMNS = """
+    id, mutation_id, mutation_date, nature_mutation, valeur_fonciere, adresse,
+    code_postal, commune, code_commune, departement, type_local, surface_reelle_bati,
+    surface_terrain, nombre_pieces_principales, latitude, longitude, geom,
+    code_type_local, numero_disposition, lot_key, source_file
+"""
+
+_TABLE_BODY = """
+    id integer NOT NULL DEFAULT nextval('dvf_records_id_seq'),
+    mutation_id varchar,
+    mutation_date date NOT NULL,
+    nature_mutation varchar,
+    valeur_fonciere double precision,
+    adresse varchar,
+    code_postal varchar,
+    commune varchar,
+    code_commune varchar,
+    departement varchar NOT NULL,
+    type_local varchar,
+    surface_reelle_bati double precision,
+    surface_terrain double precision,
+    nombre_pieces_principales integer,
+    latitude double precision,
+    longitude double precision,
+    geom geography(Point, 4326),
+    code_type_local varchar,
+    numero_disposition varchar,
+    lot_key varchar NOT NULL,
+    source_file varchar
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Departement deduit du code commune si absent ; lignes sans departement ecartees
+    op.execute("""
+        UPDATE dvf_records SET departement = upper(left(code_commune, 2))
+        WHERE departement IS NULL AND code_commune IS NOT NULL
+    """)
+    op.execute("ALTER TABLE dvf_records RENAME TO dvf_records_old")
+
+    # Table mere partitionnee par departement, sous-partitions par annee
+    op.execute(f"CREATE TABLE dvf_records ({_TABLE_BODY}) PARTITION BY LIST (departement)")
+    op.execute("ALTER SEQUENCE dvf_records_id_seq OWNED BY dvf_records.id")
+
+    partitions = bind.execute(sa.text("""
+        SELECT DISTINCT departement, extract(year FROM mutation_date)::int AS year
+        FROM dvf_records_old
+        WHERE departement IS NOT NULL
+        ORDER BY departement, year
+    """)).all()
+    departements = sorted({row.departement for row in partitions})
+    for departement in departements:
+        parent = f"dvf_records_{departement.lower()}"
+        op.execute(
+            f"CREATE TABLE {parent} PARTITION OF dvf_records "
+            f"FOR VALUES IN ('{departement}') PARTITION BY RANGE (mutation_date)"
+        )
+        for row in partitions:
+            if row.departement == departement:
+                op.execute(
+                    f"CREATE TABLE {parent}_{row.year} PARTITION OF {parent} "
+                    f"FOR VALUES FROM ('{row.year}-01-01') TO ('{row.year + 1}-01-01')"
+                )
+
+    # Copie des donnees avant creation des index (plus rapide)
+    op.execute(f"""
+        INSERT INTO dvf_records ({_COLUMNS})
+        SELECT {_COLUMNS} FROM dvf_records_old WHERE departement IS NOT NULL
+    """)
+    op.execute("DROP TABLE dvf_records_old")
+
+    # Index des partitions : declares sur la mere, crees sur chaque partition
+    op.execute("ALTER TABLE dvf_records ADD CONSTRAINT dvf_records_pkey PRIMARY KEY (id, departement, mutation_date)")
+    op.execute("""
+        CREATE UNIQUE INDEX uq_dvf_records_mutation
+        ON dvf_records (mutation_id, numero_disposition, lot_key, departement, mutation_date) NULLS NOT DISTINCT
+    """)
+    op.execute("CREATE INDEX idx_dvf_date ON dvf_records USING BRIN (mutation_date)")
+    op.execute("CREATE INDEX idx_dvf_geom ON dvf_records USING GIST (geom)")
+    op.create_index('ix_dvf_records_code_postal', 'dvf_records', ['code_postal'])
+    op.create_index('ix_dvf_records_code_commune', 'dvf_records', ['code_commune'])
+    op.create_index('ix_dvf_records_type_local', 'dvf_records', ['type_local'])
+    op.create_index('ix_dvf_records_source_file', 'dvf_records', ['source_file'])
+    op.execute("ANALYZE dvf_records")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE dvf_records RENAME TO dvf_records_partitioned")
+    op.execute(f"CREATE TABLE dvf_records ({_TABLE_BODY}, PRIMARY KEY (id))")
+    op.execute("ALTER TABLE dvf_records ALTER COLUMN departement DROP NOT NULL")
+    op.execute("ALTER SEQUENCE dvf_records_id_seq OWNED BY dvf_records.id")
+    op.execute(f"""
+        INSERT INTO dvf_records ({_COLUMNS})
+        SELECT {_COLUMNS} FROM dvf_records_partitioned
+    """)
+    op.execute("DROP TABLE dvf_records_partitioned CASCADE")
+
+    op.execute("""
+        CREATE UNIQUE INDEX uq_dvf_records_mutation
+        ON dvf_records (mutation_id, numero_disposition, lot_key) NULLS NOT DISTINCT
+    """)
+    op.execute("CREATE INDEX idx_dvf_geom ON dvf_records USING GIST (geom)")
+    op.create_index('ix_dvf_records_mutation_id', 'dvf_records', ['mutation_id'])
+    op.create_index('ix_dvf_records_mutation_date', 'dvf_records', ['mutation_date'])
+    op.create_index('ix_dvf_records_commune', 'dvf_records', ['commune'])
+    op.create_index('ix_dvf_records_code_commune', 'dvf_records', ['code_commune'])
+    op.create_index('ix_dvf_records_code_postal', 'dvf_records', ['code_postal'])
+    op.create_index('ix_dvf_records_departement', 'dvf_records', ['departement'])
+    op.create_index('ix_dvf_records_type_local', 'dvf_records', ['type_local'])
+    op.create_index('ix_dvf_records_source_file', 'dvf_records', ['source_file'])
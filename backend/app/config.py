@@ -62,6 +62,63 @@ class Settings(BaseSettings):
 
     # DVF
     DVF_DATA_PATH: str = "data/dvf"
+    DVF_SEARCH_MAX_RADIUS_M: float = 10000  # Rayon max de GET /dvf/search
+    DVF_SEARCH_MAX_BBOX_DEG: float = 0.5  # Cote max (degres) de l'emprise de GET /dvf/search
+
+    # Recherche de comparables
+    # "postgis" : distances et agregats calcules en une requete SQL
+    # "python" : moteur historique (distances et stats calculees en Python)
+    # "memory" : snapshot NumPy du pool en memoire (repli sur PostGIS si perime)
+    COMPARABLE_SEARCH_ENGINE: str = "postgis"
+    COMPARABLE_INDEX_MAX_AGE_SECONDS: int = 300  # Age max du snapshot memoire
+    COMPARABLE_SEARCH_CACHE_SIZE: int = 512  # Nombre max de recherches en cache (0 = desactive)
+    COMPARABLE_SEARCH_CACHE_TTL_SECONDS: int = 120
+    # Regroupement (clusters) des resultats pour la carte
+    COMPARABLE_CLUSTER_CELL_PX: int = 60  # Taille d'une cellule a l'ecran (tuiles 256 px)
+    COMPARABLE_CLUSTER_MIN_POINTS: int = 3  # Nombre min de biens d'une cellule pour former un cluster
+    # Tuiles vectorielles du pool (cache disque invalide a chaque ecriture)
+    COMPARABLE_TILE_CACHE_DIR: str = "data/tiles"
+    COMPARABLE_TILE_CACHE_MAX_ZOOM: int = 16  # Zoom max mis en cache
+    COMPARABLE_TILE_CACHE_MAX_AGE_SECONDS: int = 3600  # Age max d'une tuile en cache
+    # Recherche par lot (portefeuilles)
+    COMPARABLE_BATCH_MAX_PROJECTS: int = 500
+    COMPARABLE_BATCH_CHUNK_SIZE: int = 25  # Projets par requete LATERAL
+    COMPARABLE_BATCH_PARALLEL_THRESHOLD: int = 50  # Au-dela, paquets traites en parallele
+    COMPARABLE_BATCH_WORKERS: int = 4
+    # Import en masse (CSV, XLSX)
+    COMPARABLE_IMPORT_MAX_SIZE: int = 50 * 1024 * 1024  # 50 MB
+    COMPARABLE_IMPORT_CHUNK_ROWS: int = 5000  # Lignes validees et chargees par COPY a la fois
+    # Doublons du pool (meme transaction recue de plusieurs sources)
+    COMPARABLE_DEDUP_RADIUS_M: float = 30  # Distance max entre les deux biens
+    COMPARABLE_DEDUP_SURFACE_TOLERANCE: float = 0.1  # Ecart relatif max des surfaces
+    COMPARABLE_DEDUP_PRICE_TOLERANCE: float = 0.1  # Ecart relatif max des prix au m2
+    COMPARABLE_DEDUP_DATE_DAYS: int = 90  # Ecart max des dates de transaction
+    COMPARABLE_DEDUP_MIN_SIMILARITY: float = 0.4  # Similarite pg_trgm min des adresses
+
+    # Geocodage (cache memoire LRU devant le cache persistant geocode_cache)
+    GEOCODE_CACHE_TTL_DAYS: int = 180  # Duree de validite d'une adresse trouvee
+    GEOCODE_NEGATIVE_CACHE_TTL_DAYS: int = 7  # Duree de validite d'une adresse introuvable
+    GEOCODE_MEMORY_CACHE_SIZE: int = 2048  # 0 = desactive
+    GEOCODE_MEMORY_CACHE_TTL_SECONDS: int = 3600
+    # Geocodeurs essayes dans l'ordre : "ban" (extrait BAN local, sans reseau), "nominatim"
+    GEOCODER_BACKENDS: Union[List[str], str] = ["nominatim"]
+    BAN_DATA_PATH: str = "data/ban"  # Extraits adresses-XX.csv.gz
+    NOMINATIM_RATE_PER_SECOND: float = 1.0  # Politique d'usage du service public (0 = illimite)
+    GEOCODE_BATCH_WORKERS: int = 4  # Threads du geocodage par lot
+    GEOCODE_REQUEST_WORKERS: int = 4  # Threads des geocodages demandes par les routes async
+    BACKGROUND_JOB_WORKERS: int = 2  # Threads des taches de fond (geocodage par lot...)
+    INTERACTIVE_JOB_WORKERS: int = 2  # Threads des taches courtes (geocodage d'un projet)
+
+    @field_validator('GEOCODER_BACKENDS', mode='before')
+    @classmethod
+    def parse_geocoder_backends(cls, v):
+        """Parse GEOCODER_BACKENDS depuis une chaîne JSON ou une liste separee par des virgules"""
+        if isinstance(v, str):
+            try:
+                return json.loads(v)
+            except json.JSONDecodeError:
+                return [name.strip() for name in v.split(',') if name.strip()]
+        return v
 
     class Config:
         env_file = ".env"
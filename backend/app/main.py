@@ -6,6 +6,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.database import engine, Base
+from app.services.comparable_index import pool_index
+from app.services.comparable_service import SEARCH_ENGINE_MEMORY
 
 # Import des routeurs
 from app.routers.auth import router as auth_router
@@ -18,6 +20,7 @@ from app.routers.comparable_pool import router as comparable_pool_router
 from app.routers.agencies import router as agencies_router
 from app.routers.geographic_zones import router as geographic_zone_router
 from app.routers.simulations import router as simulations_router
+from app.routers.dvf import router as dvf_router
 
 app = FastAPI(
     title="ORYEM API",
@@ -43,6 +46,9 @@ async def startup_event():
     print("🚀 Démarrage de l'application ORYEM...")
     # Création des tables (à remplacer par Alembic en production)
     # Base.metadata.create_all(bind=engine)
+    if settings.COMPARABLE_SEARCH_ENGINE == SEARCH_ENGINE_MEMORY:
+        # Chargement du snapshot memoire du pool de comparables
+        pool_index.refresh_in_background()
     print("✅ Application prête")
 
 
@@ -83,6 +89,7 @@ app.include_router(agencies_router, prefix="/api")
 app.include_router(geographic_zone_router, prefix="/api")
 
 app.include_router(simulations_router, prefix="/api")
+app.include_router(dvf_router, prefix="/api")
 
 
 if __name__ == "__main__":
@@ -9,6 +9,9 @@ from app.models.document import Document, DocumentType
 from app.models.comparable import Comparable
 from app.models.valuation import Valuation, ValuationMethod
 from app.models.dvf_record import DVFRecord
+from app.models.dvf_import_file import DvfImportFile
+from app.models.dvf_watermark import DvfWatermark
+from app.models.dvf_promotion import DvfPromotion
 from app.models.comparable_pool import ComparablePool, ComparableSource, TransactionType, ComparableStatus
 from app.models.surface import Surface, SurfaceType
 from app.models.analysis_result import AnalysisResult
@@ -17,6 +20,11 @@ from app.models.document_generation import DocumentGeneration, DocFormat
 from app.models.property_breakdown import PropertyBreakdown
 from app.models.owner import Owner
 from app.models.agency import Agency, UserAgency
+from app.models.commune import Commune
+from app.models.geocode_cache import GeocodeCache
+from app.models.ban_address import BanAddress
+from app.models.price_heatmap import PriceHeatmapCell, PriceHeatmapDirty
+from app.models.comparable_pool_merge import ComparablePoolMerge
 
 __all__ = [
     "User",
@@ -32,6 +40,9 @@ __all__ = [
     "Valuation",
     "ValuationMethod",
     "DVFRecord",
+    "DvfImportFile",
+    "DvfWatermark",
+    "DvfPromotion",
     "ComparablePool",
     "ComparableSource",
     "TransactionType",
@@ -47,4 +58,10 @@ __all__ = [
     "Owner",
     "Agency",
     "UserAgency",
+    "Commune",
+    "GeocodeCache",
+    "BanAddress",
+    "PriceHeatmapCell",
+    "PriceHeatmapDirty",
+    "ComparablePoolMerge",
 ]
@@ -0,0 +1,29 @@
+"""
+Modele BanAddress - Extrait local de la Base Adresse Nationale (BAN)
+Charge par departement (scripts/load_ban.py) ; sert au geocodage hors ligne.
+"""
+from sqlalchemy import Column, Integer, String, Float, Index
+from app.database import Base
+
+
+class BanAddress(Base):
+    __tablename__ = "ban_addresses"
+
+    id = Column(String, primary_key=True)  # Identifiant BAN (cle d'interoperabilite)
+    departement = Column(String(3), nullable=False, index=True)
+    numero = Column(Integer, nullable=True)
+    rep = Column(String(10), nullable=True)  # Indice de repetition (bis, ter, a...)
+    nom_voie = Column(String, nullable=False)
+    street_key = Column(String, nullable=False)  # nom_voie normalise (utils/address.py)
+    code_postal = Column(String(5), nullable=False)
+    code_insee = Column(String(5), nullable=False)
+    nom_commune = Column(String, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<BanAddress(id='{self.id}', numero={self.numero}, nom_voie='{self.nom_voie}')>"
+
+
+# Index de recherche : code postal puis voie puis numero
+Index('idx_ban_addresses_lookup', BanAddress.code_postal, BanAddress.street_key, BanAddress.numero)
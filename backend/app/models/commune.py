@@ -0,0 +1,27 @@
+"""
+Modele Commune - Contours des communes et rattachement a leur EPCI
+Charge depuis un fichier local (scripts/load_communes.py) ; sert au perimetre
+"Agglomeration" de la recherche de comparables.
+"""
+from sqlalchemy import Column, String, Index
+from geoalchemy2 import Geometry
+from app.database import Base
+
+
+class Commune(Base):
+    __tablename__ = "communes"
+
+    insee_code = Column(String(5), primary_key=True)  # Code officiel geographique
+    name = Column(String, nullable=False)
+    departement = Column(String(3), nullable=True, index=True)
+    # EPCI (communaute d'agglomeration, metropole...) de rattachement
+    epci_code = Column(String(9), nullable=True, index=True)
+    epci_name = Column(String, nullable=True)
+    geom = Column(Geometry(geometry_type='MULTIPOLYGON', srid=4326, spatial_index=False), nullable=False)
+
+    def __repr__(self):
+        return f"<Commune(insee_code='{self.insee_code}', name='{self.name}')>"
+
+
+# Index geographique pour la localisation d'un point (ST_Contains)
+Index('idx_communes_geom', Commune.geom, postgresql_using='gist')
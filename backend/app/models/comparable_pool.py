@@ -2,8 +2,8 @@
 Modele ComparablePool - Pool de biens comparables de reference
 Contient les biens issus de la base interne Arthur Loyd et des sources externes (DVF, concurrence)
 """
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, Enum as SQLEnum
-from geoalchemy2 import Geometry
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, Computed, Enum as SQLEnum
+from geoalchemy2 import Geometry, Geography
 from datetime import datetime
 from enum import Enum
 from app.database import Base
@@ -36,10 +36,19 @@ class ComparablePool(Base):
     address = Column(String, nullable=False)
     postal_code = Column(String, index=True, nullable=True)
     city = Column(String, index=True, nullable=True)
+    insee_code = Column(String(5), nullable=True)  # Commune (table communes), renseignee par localisation
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
-    # Colonne geographique pour les requetes spatiales PostGIS
+    # Colonne geographique pour les requetes spatiales PostGIS, derivee de
+    # latitude/longitude par le trigger comparable_pool_set_geom (ne pas l'ecrire)
     geom = Column(Geometry(geometry_type='POINT', srid=4326), nullable=True)
+    # Copie geography de geom maintenue par PostgreSQL (colonne generee) :
+    # les predicats ST_DWithin/ST_Distance en metres utilisent directement son index GIST
+    geog = Column(
+        Geography(geometry_type='POINT', srid=4326, spatial_index=False),
+        Computed("geom::geography", persisted=True),
+        nullable=True,
+    )
 
     # Caracteristiques du bien
     property_type = Column(String, index=True, nullable=False)  # office, warehouse, retail, industrial, land, mixed
@@ -66,6 +75,9 @@ class ComparablePool(Base):
     # Metadonnees
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Derniere recherche de doublons (services/comparable_dedup.py) ; NULL = a traiter,
+    # remis a NULL par le trigger comparable_pool_set_geom si le bien est deplace
+    dedup_at = Column(DateTime, nullable=True)
 
     def __repr__(self):
         return f"<ComparablePool(id={self.id}, address='{self.address}', price={self.price_per_m2}EUR/m2, source='{self.source}')>"
@@ -73,7 +85,11 @@ class ComparablePool(Base):
 
 # Index geographique pour optimiser les recherches spatiales
 Index('idx_comparable_pool_geom', ComparablePool.geom, postgresql_using='gist')
+Index('idx_comparable_pool_geog', ComparablePool.geog, postgresql_using='gist')
 Index('idx_comparable_pool_type', ComparablePool.property_type)
 Index('idx_comparable_pool_date', ComparablePool.transaction_date)
 Index('idx_comparable_pool_source', ComparablePool.source)
 Index('idx_comparable_pool_type_source', ComparablePool.property_type, ComparablePool.source)
+Index('idx_comparable_pool_insee_type', ComparablePool.insee_code, ComparablePool.property_type)
+# Biens a examiner par la recherche de doublons (index partiel : reste petit)
+Index('idx_comparable_pool_dedup_pending', ComparablePool.id, postgresql_where=ComparablePool.dedup_at.is_(None))
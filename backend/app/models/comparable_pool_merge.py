@@ -0,0 +1,26 @@
+"""
+Modele ComparablePoolMerge - Journal des doublons fusionnes du pool de comparables
+Une ligne par bien supprime comme doublon d'un autre (services/comparable_dedup.py) :
+copie complete du bien supprime pour audit ou restauration. Les mutations DVF
+fusionnees ne sont pas promues a nouveau (services/dvf_promotion.py).
+"""
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+from app.database import Base
+
+
+class ComparablePoolMerge(Base):
+    __tablename__ = "comparable_pool_merges"
+
+    duplicate_id = Column(Integer, primary_key=True)  # Id du bien supprime
+    survivor_id = Column(Integer, ForeignKey("comparable_pool.id", ondelete="SET NULL"), nullable=True, index=True)
+    source = Column(String(20), nullable=False)  # Source du bien supprime
+    source_reference = Column(String, nullable=True, index=True)  # Reference du bien supprime (mutation DVF...)
+    similarity = Column(Float, nullable=False)  # Similarite pg_trgm des adresses
+    distance_m = Column(Float, nullable=False)
+    payload = Column(JSONB, nullable=False)  # Colonnes du bien supprime (hors geom/geog)
+    merged_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<ComparablePoolMerge(duplicate_id={self.duplicate_id}, survivor_id={self.survivor_id})>"
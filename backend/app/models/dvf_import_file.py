@@ -0,0 +1,33 @@
+"""
+Modele DvfImportFile - Fichiers DVF charges dans dvf_records
+Une ligne par fichier importe avec succes et son empreinte : seuls les fichiers
+nouveaux ou modifies sont recharges (services/dvf_import.py).
+"""
+from sqlalchemy import Column, String, Integer, BigInteger, Float, DateTime, JSON
+from datetime import datetime
+from app.database import Base
+
+
+class DvfImportFile(Base):
+    __tablename__ = "dvf_import_files"
+
+    file_name = Column(String, primary_key=True)  # Chemin relatif a DVF_DATA_PATH
+    file_format = Column(String(10), nullable=False)  # etalab, dgfip
+    checksum = Column(String(64), nullable=True)  # SHA-256 du fichier
+    size_bytes = Column(BigInteger, nullable=True)
+    rows = Column(Integer, nullable=False)  # Lignes lues
+    skipped = Column(Integer, nullable=False, default=0)  # Lignes inexploitables ignorees
+    # Bilan de la derniere fusion dans dvf_records
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    deleted = Column(Integer, nullable=False, default=0)
+    seconds = Column(Float, nullable=True)  # Duree du chargement
+    loaded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    promoted_at = Column(DateTime, nullable=True)  # Derniere promotion dans le pool (services/dvf_promotion.py)
+    exported_at = Column(DateTime, nullable=True)  # Dernier export Parquet (services/dvf_parquet.py)
+    # [departement, annee] ecrits ou supprimes par les imports depuis le dernier export Parquet
+    parquet_partitions = Column(JSON, nullable=True)
+    heatmap_at = Column(DateTime, nullable=True)  # Dernier recalcul de la carte de chaleur (services/price_heatmap.py)
+
+    def __repr__(self):
+        return f"<DvfImportFile(file_name='{self.file_name}', rows={self.rows})>"
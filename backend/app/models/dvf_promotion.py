@@ -0,0 +1,20 @@
+"""
+Modele DvfPromotion - Mutations DVF promues dans le pool de comparables
+Lien mutation -> bien du pool : mise a jour lors d'une revision de la mutation,
+suppression du bien si elle n'est plus retenue (services/dvf_promotion.py).
+"""
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from datetime import datetime
+from app.database import Base
+
+
+class DvfPromotion(Base):
+    __tablename__ = "dvf_promotions"
+
+    mutation_id = Column(String, primary_key=True)
+    pool_id = Column(Integer, ForeignKey("comparable_pool.id", ondelete="CASCADE"), nullable=False, unique=True)
+    source_file = Column(String, nullable=False, index=True)  # Fichier DVF de la mutation
+    promoted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<DvfPromotion(mutation_id='{self.mutation_id}', pool_id={self.pool_id})>"
@@ -1,6 +1,7 @@
 """
 Modèle DVFRecord - Données des transactions immobilières (Demandes de Valeurs Foncières)
 Source: https://app.dvf.etalab.gouv.fr/
+Table partitionnee par departement puis par annee de mutation (services/dvf_partitions.py).
 """
 from sqlalchemy import Column, Integer, String, Float, Date, Index
 from geoalchemy2 import Geography
@@ -9,12 +10,15 @@ from app.database import Base
 
 class DVFRecord(Base):
     __tablename__ = "dvf_records"
+    __table_args__ = {"postgresql_partition_by": "LIST (departement)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Cle primaire en base : (id, departement, mutation_date), les cles de
+    # partitionnement devant figurer dans toute contrainte d'unicite
+    id = Column(Integer, primary_key=True)
 
     # Identifiants
-    mutation_id = Column(String, index=True)  # ID de la mutation
-    mutation_date = Column(Date, index=True, nullable=False)
+    mutation_id = Column(String)  # ID de la mutation
+    mutation_date = Column(Date, nullable=False)
 
     # Nature de la mutation
     nature_mutation = Column(String, nullable=True)  # Vente, Échange, etc.
@@ -25,9 +29,9 @@ class DVFRecord(Base):
     # Localisation
     adresse = Column(String, nullable=True)
     code_postal = Column(String, index=True, nullable=True)
-    commune = Column(String, index=True, nullable=True)
+    commune = Column(String, nullable=True)
     code_commune = Column(String, index=True, nullable=True)
-    departement = Column(String, index=True, nullable=True)
+    departement = Column(String, nullable=False)  # Cle de partitionnement
 
     # Type de bien
     type_local = Column(String, index=True, nullable=True)  # Maison, Appartement, Local industriel, etc.
@@ -41,18 +45,30 @@ class DVFRecord(Base):
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
     # Colonne géographique pour les requêtes spatiales
-    geom = Column(Geography(geometry_type='POINT', srid=4326), nullable=True)
+    geom = Column(Geography(geometry_type='POINT', srid=4326, spatial_index=False), nullable=True)
 
     # Informations cadastrales
     code_type_local = Column(String, nullable=True)
     numero_disposition = Column(String, nullable=True)
+    # Local de la disposition : parcelle|type|lot|surface|pieces (services/dvf_import.py)
+    lot_key = Column(String, nullable=False)
+
+    # Fichier source de l'import (services/dvf_import.py)
+    source_file = Column(String, index=True, nullable=True)
 
     def __repr__(self):
         return f"<DVFRecord(id={self.id}, commune='{self.commune}', valeur={self.valeur_fonciere}€, date={self.mutation_date})>"
 
 
-# Index géographique pour optimiser les recherches spatiales
+# Index declares sur la table mere, crees automatiquement sur chaque partition
+# GIST par partition pour les recherches spatiales
 Index('idx_dvf_geom', DVFRecord.geom, postgresql_using='gist')
-Index('idx_dvf_date', DVFRecord.mutation_date)
-Index('idx_dvf_type', DVFRecord.type_local)
-Index('idx_dvf_commune', DVFRecord.commune)
+# BRIN : les lignes d'une partition annuelle sont chargees dans l'ordre des fichiers
+Index('idx_dvf_date', DVFRecord.mutation_date, postgresql_using='brin')
+# Cle de fusion des imports incrementaux (une ligne par local de chaque disposition)
+Index(
+    'uq_dvf_records_mutation',
+    DVFRecord.mutation_id, DVFRecord.numero_disposition, DVFRecord.lot_key,
+    DVFRecord.departement, DVFRecord.mutation_date,
+    unique=True, postgresql_nulls_not_distinct=True,
+)
@@ -0,0 +1,18 @@
+"""
+Modele DvfWatermark - Date de mutation la plus recente chargee par departement
+Mise a jour a chaque fusion d'un fichier DVF (services/dvf_import.py).
+"""
+from sqlalchemy import Column, String, Date, DateTime
+from datetime import datetime
+from app.database import Base
+
+
+class DvfWatermark(Base):
+    __tablename__ = "dvf_watermarks"
+
+    departement = Column(String(3), primary_key=True)
+    max_mutation_date = Column(Date, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<DvfWatermark(departement='{self.departement}', max_mutation_date={self.max_mutation_date})>"
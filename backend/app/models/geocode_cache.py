@@ -0,0 +1,22 @@
+"""
+Modele GeocodeCache - Cache persistant des geocodages d'adresses
+Cle : adresse francaise normalisee (services/geocoding.py). Les adresses
+introuvables sont aussi conservees (latitude/longitude NULL) pour une duree plus courte.
+"""
+from sqlalchemy import Column, String, Float, DateTime
+from datetime import datetime
+from app.database import Base
+
+
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+
+    normalized_address = Column(String, primary_key=True)
+    address = Column(String, nullable=False)  # Derniere adresse brute geocodee
+    latitude = Column(Float, nullable=True)   # NULL : adresse introuvable
+    longitude = Column(Float, nullable=True)
+    provider = Column(String(20), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<GeocodeCache(normalized_address='{self.normalized_address}', provider='{self.provider}')>"
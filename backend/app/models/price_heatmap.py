@@ -0,0 +1,53 @@
+"""
+Modeles PriceHeatmapCell / PriceHeatmapDirty - Carte de chaleur des prix precalculee
+Statistiques de prix au m2 par cellule geohash, type de bien et trimestre, pour
+le pool de comparables et les mutations DVF (services/price_heatmap.py).
+Les ecritures du pool marquent leurs cellules a recalculer (trigger
+comparable_pool_heatmap_dirty) ; le recalcul ne touche que ces cellules.
+"""
+from sqlalchemy import Column, String, Integer, SmallInteger, Float, Date, DateTime
+from datetime import datetime
+from app.database import Base
+
+
+class PriceHeatmapCell(Base):
+    __tablename__ = "price_heatmap_cells"
+
+    # Cle : une ligne par couche, type, precision, trimestre et cellule
+    source = Column(String(10), primary_key=True)  # pool, dvf
+    property_type = Column(String(20), primary_key=True)  # Types du pool ; house, apartment, mixed pour DVF
+    precision = Column(SmallInteger, primary_key=True)  # Longueur du geohash
+    quarter = Column(Date, primary_key=True)  # Premier jour du trimestre
+    geohash = Column(String(12), primary_key=True)
+
+    # Centre de la cellule
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+
+    # Prix au m2 : effectif et quartiles par type de transaction
+    sale_count = Column(Integer, nullable=False, default=0)
+    sale_p25 = Column(Float, nullable=True)
+    sale_median = Column(Float, nullable=True)
+    sale_p75 = Column(Float, nullable=True)
+    rent_count = Column(Integer, nullable=False, default=0)
+    rent_p25 = Column(Float, nullable=True)
+    rent_median = Column(Float, nullable=True)
+    rent_p75 = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<PriceHeatmapCell(source='{self.source}', geohash='{self.geohash}', quarter={self.quarter})>"
+
+
+class PriceHeatmapDirty(Base):
+    __tablename__ = "price_heatmap_dirty"
+
+    # Cellule touchee depuis le dernier recalcul, au geohash le plus fin
+    source = Column(String(10), primary_key=True)
+    property_type = Column(String(20), primary_key=True)
+    quarter = Column(Date, primary_key=True)
+    geohash = Column(String(12), primary_key=True)
+
+    def __repr__(self):
+        return f"<PriceHeatmapDirty(source='{self.source}', geohash='{self.geohash}', quarter={self.quarter})>"
@@ -33,6 +33,7 @@ class PropertyInfo(Base):
     longitude = Column(Float, nullable=True)
     postal_code = Column(String, nullable=True)
     city = Column(String, nullable=True)
+    insee_code = Column(String(5), nullable=True, index=True)  # Commune (table communes)
     geographic_sector = Column(String, nullable=True)
 
     # Environnement PLU
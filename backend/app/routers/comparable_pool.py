@@ -1,12 +1,41 @@
 """
-Routes du pool de comparables - Ajout rapide
+Routes du pool de comparables - Ajout rapide, import en masse, doublons, recherche
+par lot, tuiles vectorielles, carte de chaleur des prix, geocodage par lot, supervision des caches
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+import shutil
+import tempfile
+from datetime import date
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Response, UploadFile, status
 from sqlalchemy.orm import Session
-from typing import Optional
-from pydantic import BaseModel
+from typing import Any, List, Literal, Optional
+from pydantic import BaseModel, Field
+from app.config import settings
 from app.database import get_db
-from app.services.comparable_service import quick_add_comparable
+from app.models import User, UserRole, Project, PropertyType, ComparableSource, ComparableStatus, TransactionType
+from app.utils.security import get_current_user, require_admin
+from app.routers.projects import can_read_project
+from app.routers.comparables import ComparableSearchResponse
+from app.services.comparable_dedup import run_comparable_dedup_job
+from app.services.comparable_geom import POOL_GEOM_BACKFILL_BATCH, run_pool_geom_backfill_job
+from app.services.comparable_index import pool_index
+from app.services.comparable_import import COMPARABLE_IMPORT_EXTENSIONS, run_comparable_import_job
+from app.services.geocoding import geocoding_stats, geocode_address_async
+from app.services.geocoding_batch import GEOCODE_TARGET_POOL, run_geocode_job
+from app.services.jobs import job_registry
+from app.services.comparable_tiles import TileFilters, TILE_MEDIA_TYPE, get_tile, is_valid_tile
+from app.services.price_heatmap import (
+    HEATMAP_PRECISIONS,
+    HEATMAP_SOURCE_POOL,
+    get_heatmap_cells,
+    run_price_heatmap_job,
+)
+from app.services.comparable_service import (
+    quick_add_comparable,
+    search_comparables_batch,
+    search_cache,
+    ComparableSearchParams
+)
 
 
 router = APIRouter(prefix="/comparable-pool", tags=["ComparablePool"])
@@ -42,6 +71,130 @@ class QuickAddResponse(BaseModel):
         from_attributes = True
 
 
+class BatchSearchRequest(BaseModel):
+    """Schema de requete pour la recherche de comparables de plusieurs projets"""
+    project_ids: List[int] = Field(..., min_length=1, max_length=settings.COMPARABLE_BATCH_MAX_PROJECTS)
+    surface_min: Optional[float] = None
+    surface_max: Optional[float] = None
+    year_min: Optional[int] = None
+    year_max: Optional[int] = None
+    distance_km: float = Field(5.0, ge=0.1, le=50)
+    source: Optional[str] = "all"
+    comparable_status: Optional[str] = "all"
+    include_comparables: bool = True  # False : statistiques uniquement (reponse legere)
+
+
+class BatchSearchResultResponse(ComparableSearchResponse):
+    """Schema de reponse de la recherche d'un projet du lot"""
+    project_id: int
+
+
+class GeocodeBatchRequest(BaseModel):
+    """Schema de requete du geocodage par lot"""
+    target: Literal["projects", "pool"] = "projects"
+    ids: Optional[List[int]] = Field(None, max_length=10000)  # Projets ou biens du pool ; projets : tous les non geocodes si vide
+    limit: Optional[int] = Field(None, ge=1)
+
+
+class GeomBackfillRequest(BaseModel):
+    """Schema de requete du rattrapage de geom"""
+    batch_size: int = Field(POOL_GEOM_BACKFILL_BATCH, ge=100, le=50000)  # Lignes par transaction
+
+
+class DedupRequest(BaseModel):
+    """Schema de requete de la recherche de doublons"""
+    dry_run: bool = False  # Lister les paires detectees sans fusionner
+
+
+class HeatmapRefreshRequest(BaseModel):
+    """Schema de requete du recalcul de la carte de chaleur"""
+    full: bool = False  # Reconstruire toutes les cellules, sinon celles touchees depuis le dernier passage
+
+
+class HeatmapCellResponse(BaseModel):
+    """Schema d'une cellule de la carte de chaleur (prix au m2)"""
+    geohash: str
+    latitude: float
+    longitude: float
+    sale_count: int
+    sale_p25: Optional[float]
+    sale_median: Optional[float]
+    sale_p75: Optional[float]
+    rent_count: int
+    rent_p25: Optional[float]
+    rent_median: Optional[float]
+    rent_p75: Optional[float]
+
+
+class HeatmapResponse(BaseModel):
+    """Schema de reponse de la carte de chaleur"""
+    quarter: Optional[str]  # Premier jour du trimestre
+    precision: int
+    cells: List[HeatmapCellResponse]
+
+
+class JobResponse(BaseModel):
+    """Schema de reponse d'une tache de fond"""
+    id: str
+    kind: str
+    status: str
+    done: int
+    total: Optional[int]
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
+
+
+# === Recherche par lot ===
+
+@router.post("/batch-search", response_model=List[BatchSearchResultResponse])
+def batch_search_comparables(
+    data: BatchSearchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Recherche des comparables de plusieurs projets en un appel (mandats de portefeuille).
+    Memes filtres pour tous les projets ; le type de bien reste celui de chaque projet.
+    """
+    project_ids = list(dict.fromkeys(data.project_ids))
+    projects = db.query(Project).filter(Project.id.in_(project_ids)).all()
+
+    missing = set(project_ids) - {project.id for project in projects}
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Projets non trouves : {sorted(missing)}"
+        )
+    forbidden = [project.id for project in projects if not can_read_project(db, current_user, project)]
+    if forbidden:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Acces refuse aux projets : {sorted(forbidden)}"
+        )
+
+    params = ComparableSearchParams(
+        surface_min=data.surface_min,
+        surface_max=data.surface_max,
+        year_min=data.year_min,
+        year_max=data.year_max,
+        distance_km=data.distance_km,
+        source=data.source,
+        status=data.comparable_status
+    )
+    results = search_comparables_batch(db, project_ids, params)
+
+    return [
+        {
+            **result,
+            "project_id": project_id,
+            "comparables": result["comparables"] if data.include_comparables else [],
+        }
+        for project_id, result in results.items()
+    ]
+
+
 # === Routes DEV (sans authentification) ===
 
 @router.post("/dev/quick-add", response_model=QuickAddResponse, status_code=status.HTTP_201_CREATED)
@@ -51,16 +204,20 @@ async def quick_add_comparable_dev(
 ):
     """
     [DEV ONLY] Ajout rapide d'un bien comparable sans authentification.
-    Geocode l'adresse via Nominatim et cree le bien dans le pool.
-    """
-    result = quick_add_comparable(
-        db=db,
-        project_id=data.project_id,
-        address=data.address,
-        surface=data.surface,
-        price=data.price,
-        construction_year=data.construction_year
-    )
+    Geocode l'adresse (hors boucle d'evenements) et cree le bien dans le pool.
+    """
+    coords = await geocode_address_async(data.address)
+    result = None
+    if coords:
+        result = quick_add_comparable(
+            db=db,
+            project_id=data.project_id,
+            address=data.address,
+            surface=data.surface,
+            price=data.price,
+            construction_year=data.construction_year,
+            coords=coords
+        )
 
     if result is None:
         raise HTTPException(
@@ -82,3 +239,199 @@ async def quick_add_comparable_dev(
         "construction_year": result.construction_year,
         "transaction_date": result.transaction_date.isoformat() if result.transaction_date else None,
     }
+
+
+# === Tuiles vectorielles ===
+
+@router.get("/tiles/{z}/{x}/{y}.mvt")
+def get_comparable_tile(
+    z: int,
+    x: int,
+    y: int,
+    property_type: Optional[PropertyType] = Query(None, description="Type de bien"),
+    transaction_type: Optional[TransactionType] = Query(None, description="sale ou rent"),
+    source: Optional[ComparableSource] = Query(None, description="arthur_loyd ou concurrence"),
+    comparable_status: Optional[ComparableStatus] = Query(None, description="transaction ou disponible"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Tuile Mapbox Vector Tile (couche "comparables") des biens du pool,
+    generee par ST_AsMVT et servie depuis le cache disque si disponible.
+    """
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Coordonnees de tuile invalides"
+        )
+
+    filters = TileFilters(
+        property_type=property_type.value if property_type else None,
+        transaction_type=transaction_type.value if transaction_type else None,
+        source=source.value if source else None,
+        status=comparable_status.value if comparable_status else None,
+    )
+    tile = get_tile(db, z, x, y, filters)
+    return Response(content=tile, media_type=TILE_MEDIA_TYPE)
+
+
+# === Carte de chaleur des prix ===
+
+@router.get("/heatmap", response_model=HeatmapResponse)
+def get_price_heatmap(
+    property_type: str = Query(..., description="Type de bien (pool) ; house, apartment ou mixed (dvf)"),
+    source: Literal["pool", "dvf"] = Query(HEATMAP_SOURCE_POOL, description="Couche : pool de comparables ou ventes DVF"),
+    precision: int = Query(5, description="Longueur du geohash (4, 5 ou 6)"),
+    quarter: Optional[date] = Query(None, description="Une date du trimestre ; le plus recent si absent"),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lng: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lng: Optional[float] = Query(None, ge=-180, le=180),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Cellules precalculees (effectif, quartiles du prix au m2 vente et location)
+    d'une couche, d'un type de bien et d'un trimestre, dans l'emprise demandee.
+    """
+    if precision not in HEATMAP_PRECISIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Precision invalide (valeurs : {', '.join(map(str, HEATMAP_PRECISIONS))})"
+        )
+    bbox = (min_lat, min_lng, max_lat, max_lng)
+    if None in bbox:
+        bbox = None
+
+    return get_heatmap_cells(db, source, property_type, precision, quarter, bbox)
+
+
+# === Taches de fond ===
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """Etat et avancement d'une tache de fond (lanceur ou admin)."""
+    job = job_registry.get(job_id)
+    if not job or (job.owner_id != current_user.id and current_user.role != UserRole.ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tache non trouvee"
+        )
+    return job.to_dict()
+
+
+# === Routes d'administration ===
+
+@router.post("/geocode-batch", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def geocode_batch_job(
+    data: GeocodeBatchRequest,
+    admin: User = Depends(require_admin),
+):
+    """
+    Lance en tache de fond le geocodage par lot des projets sans coordonnees
+    (ou des projets/biens du pool listes). Avancement via GET /jobs/{job_id}.
+    """
+    if data.target == GEOCODE_TARGET_POOL and not data.ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids requis pour regeocoder des biens du pool"
+        )
+    job = job_registry.submit(
+        f"geocode_{data.target}", run_geocode_job, data.target, data.ids, data.limit,
+        owner_id=admin.id,
+    )
+    return job.to_dict()
+
+
+@router.post("/import", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def import_comparables(
+    file: UploadFile = File(...),
+    source: ComparableSource = Form(ComparableSource.CONCURRENCE),
+    dry_run: bool = Form(False),
+    admin: User = Depends(require_admin),
+):
+    """
+    Lance en tache de fond l'import d'un fichier CSV ou XLSX de comparables
+    (source appliquee aux lignes sans colonne source). Le resultat de la tache
+    donne le debit et les erreurs par numero de ligne ; dry_run valide sans inserer.
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in COMPARABLE_IMPORT_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Format non supporte (attendu : {', '.join(COMPARABLE_IMPORT_EXTENSIONS)})"
+        )
+
+    # Copie sur disque : la tache lit le fichier en flux apres la fin de la requete
+    with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        size = tmp.tell()
+    if size > settings.COMPARABLE_IMPORT_MAX_SIZE:
+        os.remove(tmp.name)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Fichier trop volumineux (max {settings.COMPARABLE_IMPORT_MAX_SIZE // (1024 * 1024)} MB)"
+        )
+
+    job = job_registry.submit(
+        "comparable_import", run_comparable_import_job, tmp.name, file.filename, source.value, dry_run,
+        owner_id=admin.id,
+    )
+    return job.to_dict()
+
+
+@router.post("/geom-backfill", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def backfill_pool_geom_job(
+    data: GeomBackfillRequest,
+    admin: User = Depends(require_admin),
+):
+    """
+    Lance en tache de fond le rattrapage de geom pour les biens du pool qui
+    n'en ont pas (un commit par paquet de batch_size lignes).
+    """
+    job = job_registry.submit("pool_geom_backfill", run_pool_geom_backfill_job, data.batch_size, owner_id=admin.id)
+    return job.to_dict()
+
+
+@router.post("/dedup", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def dedup_comparable_pool_job(
+    data: DedupRequest,
+    admin: User = Depends(require_admin),
+):
+    """
+    Lance en tache de fond la recherche des doublons parmi les biens du pool
+    pas encore examines (nouveaux ou deplaces) et leur fusion.
+    """
+    job = job_registry.submit("comparable_dedup", run_comparable_dedup_job, data.dry_run, owner_id=admin.id)
+    return job.to_dict()
+
+
+@router.post("/heatmap/refresh", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def refresh_price_heatmap_job(
+    data: HeatmapRefreshRequest,
+    admin: User = Depends(require_admin),
+):
+    """
+    Lance en tache de fond le recalcul de la carte de chaleur : cellules touchees
+    par les ecritures du pool et les imports DVF depuis le dernier passage (toutes si full).
+    """
+    job = job_registry.submit("price_heatmap", run_price_heatmap_job, data.full, owner_id=admin.id)
+    return job.to_dict()
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(
+    admin: User = Depends(require_admin),
+):
+    """
+    Compteurs du cache de recherche (hits, miss, evictions, invalidations),
+    etat du snapshot memoire du pool et taux de hit / latences du geocodage.
+    """
+    return {
+        "search_cache": search_cache.stats(),
+        "memory_index": pool_index.stats(),
+        "geocoding": geocoding_stats(),
+    }
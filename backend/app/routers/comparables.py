@@ -4,20 +4,21 @@ Routes des biens comparables - Recherche et selection
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
 from app.database import get_db
 from app.utils.security import get_current_user
 from app.models import User, Project, Comparable
+from app.services.geocoding_batch import schedule_project_geocoding, is_project_geocoding_pending
 from app.services.comparable_service import (
     search_comparables,
     get_selected_comparables,
     select_comparable_from_pool,
+    select_comparables_from_pool,
     deselect_comparable,
     update_comparable_adjustment,
     update_comparable_fields,
     validate_project_comparables,
-    ensure_property_coordinates,
     ComparableSearchParams
 )
 
@@ -47,11 +48,23 @@ class ComparablePoolResponse(BaseModel):
     photo_url: Optional[str]
     status: Optional[str] = "transaction"
     distance_km: Optional[float]
+    score: Optional[float] = None  # Mode classement : score de similarite (faible = proche)
 
     class Config:
         from_attributes = True
 
 
+class PriceDistributionResponse(BaseModel):
+    """Schema de reponse pour la distribution des prix au m2 (location ou vente)"""
+    median: Optional[float] = None
+    p10: Optional[float] = None
+    p25: Optional[float] = None
+    p75: Optional[float] = None
+    p90: Optional[float] = None
+    stddev: Optional[float] = None
+    trimmed_mean: Optional[float] = None  # Moyenne des prix entre P10 et P90
+
+
 class PriceStatsResponse(BaseModel):
     """Schema de reponse pour les statistiques de prix"""
     avg_rent_per_m2: Optional[float]
@@ -61,6 +74,8 @@ class PriceStatsResponse(BaseModel):
     latest_sale_per_m2: Optional[float]
     latest_sale_date: Optional[str]
     total_count: int
+    rent_distribution: Optional[PriceDistributionResponse] = None
+    sale_distribution: Optional[PriceDistributionResponse] = None
 
 
 class CenterResponse(BaseModel):
@@ -75,14 +90,30 @@ class PerimeterStatsResponse(BaseModel):
     avg_rent_per_m2: Optional[float]
     avg_sale_per_m2: Optional[float]
     total_count: int
+    rent_distribution: Optional[PriceDistributionResponse] = None
+    sale_distribution: Optional[PriceDistributionResponse] = None
+
+
+class ClusterResponse(BaseModel):
+    """Schema de reponse pour un cluster de comparables (mode clusters de la carte)"""
+    latitude: float
+    longitude: float
+    count: int
+    avg_price_per_m2: Optional[float]
+    rent_count: int
+    avg_rent_per_m2: Optional[float]
+    sale_count: int
+    avg_sale_per_m2: Optional[float]
 
 
 class ComparableSearchResponse(BaseModel):
     """Schema de reponse pour la recherche de comparables"""
     comparables: List[ComparablePoolResponse]
+    clusters: List[ClusterResponse] = []
     stats: PriceStatsResponse
     perimeter_stats: List[PerimeterStatsResponse] = []
     center: Optional[CenterResponse]
+    geocoding_pending: bool = False  # Coordonnees du bien en cours de geocodage (resultat vide)
 
 
 class SelectedComparableResponse(BaseModel):
@@ -117,6 +148,13 @@ class SelectComparableRequest(BaseModel):
     notes: Optional[str] = None
 
 
+class SelectComparablesBulkRequest(BaseModel):
+    """Schema de requete pour selectionner plusieurs comparables (ex : top_k du classement)"""
+    comparable_pool_ids: List[int] = Field(..., min_length=1, max_length=50)
+    adjustment: float = 0.0
+    notes: Optional[str] = None
+
+
 class UpdateAdjustmentRequest(BaseModel):
     """Schema de requete pour mettre a jour un ajustement"""
     adjustment: float
@@ -130,6 +168,44 @@ class UpdateComparableFieldsRequest(BaseModel):
     construction_year: Optional[int] = None
 
 
+# === Dependances ===
+
+class RankingQuery:
+    """Parametres du mode classement (top_k et poids du score de similarite)"""
+
+    def __init__(
+        self,
+        top_k: Optional[int] = Query(None, ge=1, le=50, description="Mode classement : nombre de biens renvoyes"),
+        weight_surface: Optional[float] = Query(None, ge=0, description="Poids de l'ecart de surface"),
+        weight_year: Optional[float] = Query(None, ge=0, description="Poids de l'ecart d'annee de construction"),
+        weight_distance: Optional[float] = Query(None, ge=0, description="Poids de la distance"),
+        weight_recency: Optional[float] = Query(None, ge=0, description="Poids de l'anciennete de la transaction"),
+        weight_source: Optional[float] = Query(None, ge=0, description="Poids de la penalite source externe"),
+    ):
+        self.top_k = top_k
+        weights = {
+            "surface": weight_surface,
+            "year": weight_year,
+            "distance": weight_distance,
+            "recency": weight_recency,
+            "source": weight_source,
+        }
+        self.rank_weights = {name: value for name, value in weights.items() if value is not None} or None
+
+
+# === Helpers ===
+
+def _with_geocoding_status(result: dict, project: Project) -> dict:
+    """
+    Sans coordonnees du bien, planifie son geocodage en tache de fond au lieu
+    de l'attendre : le resultat (vide) est signale par geocoding_pending.
+    """
+    if result["center"] is None and project.address:
+        schedule_project_geocoding(project.id)
+        return {**result, "geocoding_pending": is_project_geocoding_pending(project.id)}
+    return result
+
+
 # === Routes ===
 
 @router.get("/search", response_model=ComparableSearchResponse)
@@ -142,12 +218,18 @@ async def search_comparable_properties(
     distance_km: float = Query(5.0, ge=0.1, le=50, description="Rayon de recherche en km"),
     source: Optional[str] = Query("all", description="Source: all, arthur_loyd, concurrence"),
     comparable_status: Optional[str] = Query("all", description="Statut: all, transaction, disponible"),
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Zoom de la carte : active le mode clusters"),
+    cluster_grid_m: Optional[float] = Query(None, gt=0, description="Taille des cellules de cluster en metres"),
+    ranking: RankingQuery = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Recherche des biens comparables dans le pool selon les filtres.
     Le filtre par type de bien est automatique (meme type que le bien evalue).
+    Avec zoom ou cluster_grid_m, les biens sont regroupes en clusters cote serveur.
+    Avec top_k, seuls les k biens les plus similaires au bien evalue sont renvoyes,
+    tries par score (surface, annee, distance, anciennete, source).
     """
     # Verifier que le projet existe et que l'utilisateur y a acces
     project = db.query(Project).filter(Project.id == project_id).first()
@@ -165,13 +247,17 @@ async def search_comparable_properties(
         year_max=year_max,
         distance_km=distance_km,
         source=source,
-        status=comparable_status
+        status=comparable_status,
+        cluster_zoom=zoom,
+        cluster_grid_m=cluster_grid_m,
+        top_k=ranking.top_k,
+        rank_weights=ranking.rank_weights
     )
 
     # Effectuer la recherche
     result = search_comparables(db, project_id, params)
 
-    return result
+    return _with_geocoding_status(result, project)
 
 
 @router.get("/selected", response_model=List[SelectedComparableResponse])
@@ -229,6 +315,41 @@ async def select_comparable(
     return comparable
 
 
+@router.post("/select/bulk", response_model=List[SelectedComparableResponse], status_code=status.HTTP_201_CREATED)
+async def select_comparables_bulk(
+    project_id: int,
+    data: SelectComparablesBulkRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Selectionne plusieurs comparables du pool en un appel (ex : top_k du mode classement).
+    Les comparables deja selectionnes sont renvoyes sans etre dupliques.
+    """
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Projet non trouve"
+        )
+
+    comparables = select_comparables_from_pool(
+        db,
+        project_id,
+        data.comparable_pool_ids,
+        data.adjustment,
+        data.notes
+    )
+
+    if not comparables:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Aucun comparable trouve dans le pool"
+        )
+
+    return comparables
+
+
 @router.delete("/select/{comparable_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_comparable(
     project_id: int,
@@ -343,6 +464,9 @@ async def search_comparable_properties_dev(
     distance_km: float = Query(5.0, ge=0.1, le=50),
     source: Optional[str] = Query("all"),
     comparable_status: Optional[str] = Query("all"),
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+    cluster_grid_m: Optional[float] = Query(None, gt=0),
+    ranking: RankingQuery = Depends(),
     db: Session = Depends(get_db)
 ):
     """
@@ -356,9 +480,6 @@ async def search_comparable_properties_dev(
             detail="Projet non trouve"
         )
 
-    # Geocoder automatiquement si pas de coordonnees
-    ensure_property_coordinates(db, project_id)
-
     params = ComparableSearchParams(
         surface_min=surface_min,
         surface_max=surface_max,
@@ -366,11 +487,15 @@ async def search_comparable_properties_dev(
         year_max=year_max,
         distance_km=distance_km,
         source=source,
-        status=comparable_status
+        status=comparable_status,
+        cluster_zoom=zoom,
+        cluster_grid_m=cluster_grid_m,
+        top_k=ranking.top_k,
+        rank_weights=ranking.rank_weights
     )
 
     result = search_comparables(db, project_id, params)
-    return result
+    return _with_geocoding_status(result, project)
 
 
 @router.get("/dev/selected", response_model=List[SelectedComparableResponse])
@@ -413,6 +538,33 @@ async def select_comparable_dev(
     return comparable
 
 
+@router.post("/dev/select/bulk", response_model=List[SelectedComparableResponse], status_code=status.HTTP_201_CREATED)
+async def select_comparables_bulk_dev(
+    project_id: int,
+    data: SelectComparablesBulkRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    [DEV ONLY] Selection de plusieurs comparables sans authentification.
+    A SUPPRIMER avant la mise en production.
+    """
+    comparables = select_comparables_from_pool(
+        db,
+        project_id,
+        data.comparable_pool_ids,
+        data.adjustment,
+        data.notes
+    )
+
+    if not comparables:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Erreur lors de la selection (comparables non trouves)"
+        )
+
+    return comparables
+
+
 @router.delete("/dev/select/{comparable_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_comparable_dev(
     project_id: int,
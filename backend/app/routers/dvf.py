@@ -0,0 +1,260 @@
+"""
+Routes DVF - Recherche, analyses de marche et import des donnees publiques de valeurs foncieres
+"""
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from app.config import settings
+from app.database import get_db
+from app.models import User
+from app.utils.security import get_current_user, require_admin
+from app.routers.comparable_pool import JobResponse
+from app.services.dvf_analytics import DVF_ANALYTICS_GROUPS, dvf_parquet_available, price_evolution
+from app.services.dvf_import import dvf_file_key, dvf_refresh_status, list_dvf_files, run_dvf_import_job
+from app.services.dvf_parquet import run_dvf_parquet_export_job
+from app.services.dvf_promotion import run_dvf_promotion_job
+from app.services.dvf_search import DvfSearchParams, search_dvf
+from app.services.jobs import job_registry
+
+
+router = APIRouter(prefix="/dvf", tags=["DVF"])
+
+
+# === Pydantic Schemas ===
+
+class DvfImportRequest(BaseModel):
+    """Schema de requete de l'import DVF"""
+    files: Optional[List[str]] = Field(None, max_length=500)  # Chemins relatifs a DVF_DATA_PATH ; tous si vide
+    force: bool = False  # Recharger aussi les fichiers dont l'empreinte n'a pas change
+
+
+class DvfPromotionRequest(BaseModel):
+    """Schema de requete de la promotion DVF -> pool de comparables"""
+    full: bool = False  # Retraiter tous les fichiers (changement des regles de promotion)
+
+
+class DvfExportRequest(BaseModel):
+    """Schema de requete de l'export Parquet DVF"""
+    full: bool = False  # Reecrire toutes les partitions, sinon celles touchees depuis le dernier export
+
+
+class DvfMutationResponse(BaseModel):
+    """Schema d'une mutation DVF (lots regroupes)"""
+    mutation_id: Optional[str]
+    mutation_date: str
+    nature_mutation: Optional[str]
+    type_local: Optional[str]  # Type du lot principal (plus grande surface batie)
+    address: Optional[str]
+    postal_code: Optional[str]
+    city: Optional[str]
+    insee_code: Optional[str]
+    departement: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    price: Optional[float]
+    surface: Optional[float]  # Surfaces baties cumulees
+    price_per_m2: Optional[float]
+    lots: int
+    distance_m: Optional[float] = None  # Recherche par rayon uniquement
+
+
+class DvfQuarterResponse(BaseModel):
+    """Schema d'un trimestre de la serie de prix"""
+    quarter: str  # AAAA-Qn
+    start_date: str
+    count: int
+    median_price_per_m2: Optional[float]
+
+
+class DvfSearchStatsResponse(BaseModel):
+    """Schema des agregats calcules sur l'ensemble du resultat"""
+    count: int
+    median_price_per_m2: Optional[float]
+    quarterly: List[DvfQuarterResponse]
+
+
+class DvfSearchResponse(BaseModel):
+    """Schema de reponse de la recherche DVF"""
+    items: List[DvfMutationResponse]
+    total: int
+    page: int
+    page_size: int
+    total_pages: int
+    stats: DvfSearchStatsResponse
+
+
+# === Recherche ===
+
+@router.get("/search", response_model=DvfSearchResponse)
+def search_dvf_mutations(
+    # Localisation (un critere requis) : rayon, emprise ou commune
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_m: Optional[float] = Query(None, gt=0, description="Rayon en metres"),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lng: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lng: Optional[float] = Query(None, ge=-180, le=180),
+    insee_code: Optional[str] = Query(None, min_length=5, max_length=5, description="Code INSEE de la commune"),
+    # Filtres
+    type_local: Optional[List[str]] = Query(None, description="Appartement, Maison, Local industriel. commercial ou assimilé..."),
+    date_min: Optional[date] = Query(None),
+    date_max: Optional[date] = Query(None),
+    surface_min: Optional[float] = Query(None, ge=0),
+    surface_max: Optional[float] = Query(None, ge=0),
+    # Pagination
+    page: int = Query(1, ge=1, description="Numéro de page"),
+    page_size: int = Query(50, ge=1, le=200, description="Nombre de mutations par page"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Recherche des mutations DVF (rayon, emprise ou commune) avec agregats calcules
+    sur l'ensemble du resultat : nombre, mediane du prix au m2, serie trimestrielle.
+    """
+    params = DvfSearchParams(
+        latitude=latitude, longitude=longitude, radius_m=radius_m,
+        min_lat=min_lat, min_lng=min_lng, max_lat=max_lat, max_lng=max_lng,
+        insee_code=insee_code, type_local=type_local,
+        date_min=date_min, date_max=date_max,
+        surface_min=surface_min, surface_max=surface_max,
+    )
+    if not params.has_location:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Critere de localisation requis : latitude/longitude/radius_m, emprise min/max ou insee_code"
+        )
+    if params.has_radius and radius_m > settings.DVF_SEARCH_MAX_RADIUS_M:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Rayon limite a {settings.DVF_SEARCH_MAX_RADIUS_M:g} m"
+        )
+    if not params.has_radius and params.has_bbox:
+        if min_lat >= max_lat or min_lng >= max_lng:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Emprise invalide (min >= max)"
+            )
+        if max(max_lat - min_lat, max_lng - min_lng) > settings.DVF_SEARCH_MAX_BBOX_DEG:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Emprise limitee a {settings.DVF_SEARCH_MAX_BBOX_DEG:g} degre de cote"
+            )
+    if date_min and date_max and date_min > date_max:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_min posterieure a date_max"
+        )
+
+    return search_dvf(db, params, page, page_size)
+
+
+# === Analyses de marche (cache Parquet) ===
+
+@router.get("/analytics/price-evolution")
+def get_dvf_price_evolution(
+    group_by: List[str] = Query(["departement"], description="departement, code_commune, type_local"),
+    period: Literal["year", "quarter"] = Query("year"),
+    departement: Optional[List[str]] = Query(None),
+    insee_code: Optional[List[str]] = Query(None),
+    type_local: Optional[List[str]] = Query(None),
+    year_min: Optional[int] = Query(None, ge=2000, le=2100),
+    year_max: Optional[int] = Query(None, ge=2000, le=2100),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Evolution du prix au m2 des ventes DVF par groupe et par periode, calculee
+    sur le cache Parquet (hors base transactionnelle).
+    """
+    unknown = [key for key in group_by if key not in DVF_ANALYTICS_GROUPS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Regroupement invalide : {', '.join(unknown)}"
+        )
+    # Pas de parcours du cache national toutes annees dans une requete utilisateur
+    if not departement and not insee_code and year_min is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Filtre requis : departement, insee_code ou year_min"
+        )
+    if not dvf_parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cache Parquet DVF absent (POST /dvf/export)"
+        )
+
+    return price_evolution(
+        group_by=group_by, period=period, departements=departement, insee_codes=insee_code,
+        type_local=type_local, year_min=year_min, year_max=year_max,
+    )
+
+
+# === Routes d'administration ===
+
+@router.post("/import", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_dvf(
+    data: DvfImportRequest,
+    admin: User = Depends(require_admin),
+):
+    """
+    Lance en tache de fond l'import incremental des fichiers DVF de DVF_DATA_PATH
+    (fichiers nouveaux ou modifies seulement, fusionnes dans dvf_records), puis
+    promotion des mutations importees dans le pool. Avancement via GET /comparable-pool/jobs/{job_id}.
+    """
+    available = {dvf_file_key(path): path for path in list_dvf_files()}
+    if data.files:
+        unknown = [name for name in data.files if name not in available]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Fichiers DVF introuvables : {', '.join(unknown)}"
+            )
+        paths = [available[name] for name in data.files]
+    else:
+        paths = list(available.values())
+    if not paths:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Aucun fichier DVF a importer"
+        )
+
+    job = job_registry.submit("dvf_import", run_dvf_import_job, paths, data.force, owner_id=admin.id)
+    return job.to_dict()
+
+
+@router.post("/promote", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def promote_dvf(
+    data: DvfPromotionRequest,
+    admin: User = Depends(require_admin),
+):
+    """
+    Lance en tache de fond la promotion des mutations DVF professionnelles dans
+    le pool de comparables (fichiers importes depuis la derniere promotion, ou tous si full).
+    """
+    job = job_registry.submit("dvf_promotion", run_dvf_promotion_job, data.full, owner_id=admin.id)
+    return job.to_dict()
+
+
+@router.post("/export", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def export_dvf(
+    data: DvfExportRequest,
+    admin: User = Depends(require_admin),
+):
+    """
+    Lance en tache de fond l'export Parquet de dvf_records (partitions touchees
+    depuis le dernier export, ou toutes si full) sous DVF_DATA_PATH/parquet.
+    """
+    job = job_registry.submit("dvf_parquet_export", run_dvf_parquet_export_job, data.full, owner_id=admin.id)
+    return job.to_dict()
+
+
+@router.get("/status")
+async def get_dvf_status(
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Fichiers DVF charges (empreinte, bilan de fusion) et date de mutation la plus recente par departement."""
+    return dvf_refresh_status(db)
@@ -31,6 +31,7 @@ from app.utils.security import get_current_user, get_user_admin_id
 from app.models import User, Project, ProjectShare, UserRole, PropertyInfo, Document, DocumentType
 from app.models.project_share import SharePermission
 from app.services.agency import get_primary_agency_for_user
+from app.services.geocoding_batch import schedule_project_geocoding
 
 UPLOAD_DIR = Path("/app/uploaded_files")
 
@@ -289,6 +290,8 @@ async def create_project_dev(
     db.add(project)
     db.commit()
     db.refresh(project)
+    # Coordonnees du bien obtenues en tache de fond (la creation n'attend pas le geocodage)
+    schedule_project_geocoding(project.id, owner_id=project.user_id)
     return project
 
 
@@ -337,10 +340,13 @@ async def update_project_dev(
             detail="Projet non trouvé"
         )
     update_data = project_data.model_dump(exclude_unset=True)
+    address_changed = "address" in update_data and update_data["address"] != project.address
     for field, value in update_data.items():
         setattr(project, field, value)
     db.commit()
     db.refresh(project)
+    if address_changed:
+        schedule_project_geocoding(project.id, owner_id=project.user_id, address_changed=True)
     return project
 
 
@@ -715,6 +721,8 @@ async def create_project(
     db.add(project)
     db.commit()
     db.refresh(project)
+    # Coordonnees du bien obtenues en tache de fond (la creation n'attend pas le geocodage)
+    schedule_project_geocoding(project.id, owner_id=project.user_id)
     return project
 
 
@@ -827,11 +835,16 @@ async def update_project(
 
     # Appliquer les modifications
     update_data = project_data.model_dump(exclude_unset=True)
+    address_changed = "address" in update_data and update_data["address"] != project.address
     for field, value in update_data.items():
         setattr(project, field, value)
 
     db.commit()
     db.refresh(project)
+
+    # Nouvelle adresse : coordonnees du bien recalculees en tache de fond
+    if address_changed:
+        schedule_project_geocoding(project.id, owner_id=current_user.id, address_changed=True)
     return project
 
 
@@ -0,0 +1,163 @@
+"""
+Base Adresse Nationale (BAN) locale : geocodage sans reseau et chargement en
+flux des extraits departementaux (adresses-XX.csv[.gz]) par COPY.
+"""
+import csv
+import gzip
+import io
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import case, func, literal, select, text
+from sqlalchemy.orm import Session
+
+from app.models import BanAddress
+from app.utils.address import normalize_address, split_address
+
+# Lignes envoyees par COPY a la fois (memoire bornee quel que soit le fichier)
+BAN_COPY_CHUNK_ROWS = 50_000
+
+_COPY_COLUMNS = (
+    "id", "departement", "numero", "rep", "nom_voie", "street_key",
+    "code_postal", "code_insee", "nom_commune", "latitude", "longitude",
+)
+
+
+@dataclass
+class BanLoadReport:
+    """Bilan du chargement d'un fichier BAN"""
+    path: str
+    departements: List[str]
+    rows: int
+    skipped: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def ban_lookup(db: Session, address: str) -> Optional[Tuple[float, float]]:
+    """
+    Geocode une adresse sur la BAN locale, du plus precis au moins precis :
+    numero dans la voie (ou numero le plus proche), puis centroide du code postal.
+    Le code postal est obligatoire. Retourne (latitude, longitude) ou None.
+    """
+    number, repetition, words, postal_code = split_address(normalize_address(address))
+    if not postal_code:
+        return None
+
+    if words:
+        # Voie la plus longue dont le libelle normalise prefixe "voie + commune"
+        street_match = literal(f"{words} ").startswith(BanAddress.street_key + " ")
+        order_by = [func.length(BanAddress.street_key).desc()]
+        if number is not None:
+            order_by += [
+                func.abs(BanAddress.numero - number).asc().nulls_last(),
+                case((BanAddress.rep == repetition, 0), else_=1),
+            ]
+        row = db.execute(
+            select(BanAddress.latitude, BanAddress.longitude)
+            .where(BanAddress.code_postal == postal_code, street_match)
+            .order_by(*order_by)
+            .limit(1)
+        ).first()
+        if row:
+            return (row.latitude, row.longitude)
+
+    row = db.execute(
+        select(func.avg(BanAddress.latitude).label("latitude"), func.avg(BanAddress.longitude).label("longitude"))
+        .where(BanAddress.code_postal == postal_code)
+    ).first()
+    if row and row.latitude is not None:
+        return (row.latitude, row.longitude)
+    return None
+
+
+def load_ban_file(db: Session, path: str, chunk_rows: int = BAN_COPY_CHUNK_ROWS) -> BanLoadReport:
+    """
+    Charge un extrait BAN departemental (CSV ';', eventuellement gzip) en flux.
+    Les adresses des departements du fichier sont remplacees dans une seule
+    transaction : un fichier interrompu peut simplement etre recharge.
+    """
+    start = time.perf_counter()
+    cursor = db.connection().connection.cursor()
+    departements: List[str] = []
+    rows = skipped = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+
+    try:
+        for record in _read_ban_rows(path):
+            if record is None:
+                skipped += 1
+                continue
+            if record["departement"] not in departements:
+                # Rechargement idempotent : on remplace le departement entier
+                db.execute(
+                    text("DELETE FROM ban_addresses WHERE departement = :departement"),
+                    {"departement": record["departement"]},
+                )
+                departements.append(record["departement"])
+            writer.writerow(record[column] for column in _COPY_COLUMNS)
+            pending += 1
+            if pending >= chunk_rows:
+                _copy_buffer(cursor, buffer)
+                rows += pending
+                pending = 0
+        if pending:
+            _copy_buffer(cursor, buffer)
+            rows += pending
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return BanLoadReport(
+        path=path, departements=departements, rows=rows, skipped=skipped,
+        seconds=time.perf_counter() - start,
+    )
+
+
+def _read_ban_rows(path: str) -> Iterator[Optional[Dict[str, object]]]:
+    """Lignes du fichier BAN pretes pour COPY (None si ligne inexploitable)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            try:
+                code_insee = row["code_insee"]
+                record = {
+                    "id": row["id"],
+                    "departement": code_insee[:3] if code_insee.startswith("97") else code_insee[:2],
+                    "numero": int(row["numero"]) if row.get("numero") and row["numero"] != "99999" else None,
+                    "rep": (row.get("rep") or "").lower() or None,
+                    "nom_voie": row["nom_voie"],
+                    "street_key": normalize_address(row["nom_voie"]),
+                    "code_postal": row["code_postal"],
+                    "code_insee": code_insee,
+                    "nom_commune": row["nom_commune"],
+                    "latitude": float(row["lat"]),
+                    "longitude": float(row["lon"]),
+                }
+            except (KeyError, ValueError):
+                yield None
+                continue
+            if not record["code_postal"] or not record["street_key"]:
+                yield None
+                continue
+            yield record
+
+
+def _copy_buffer(cursor, buffer: io.StringIO):
+    """Envoie le tampon CSV par COPY FROM STDIN puis le vide."""
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY ban_addresses ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    buffer.seek(0)
+    buffer.truncate()
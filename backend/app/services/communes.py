@@ -0,0 +1,85 @@
+"""
+Service des communes : localisation d'un point (code INSEE) et perimetre
+"Agglomeration" (communes du meme EPCI) a partir des contours charges en base.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session, aliased
+
+from app.models import Commune
+
+
+@dataclass(frozen=True)
+class Agglomeration:
+    """Perimetre agglomeration d'une commune : son EPCI, ou la commune seule"""
+    name: str
+    insee_codes: Tuple[str, ...]
+
+
+def locate_insee_code(db: Session, lat: float, lng: float) -> Optional[str]:
+    """Code INSEE de la commune contenant le point (index GIST), None si hors contours."""
+    point = func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326)
+    return db.execute(
+        select(Commune.insee_code).where(func.ST_Contains(Commune.geom, point)).limit(1)
+    ).scalar()
+
+
+def load_agglomerations(db: Session, insee_codes: Iterable[str]) -> Dict[str, Agglomeration]:
+    """
+    Perimetres agglomeration des communes donnees, en une requete : toutes les
+    communes partageant le meme EPCI (la commune seule si elle n'en a pas).
+    """
+    insee_codes = {code for code in insee_codes if code}
+    if not insee_codes:
+        return {}
+
+    member = aliased(Commune)
+    group_key = func.coalesce(Commune.epci_code, Commune.insee_code)
+    rows = db.execute(
+        select(
+            Commune.insee_code,
+            func.coalesce(Commune.epci_name, Commune.name).label("name"),
+            member.insee_code.label("member_code"),
+        )
+        .join(member, func.coalesce(member.epci_code, member.insee_code) == group_key)
+        .where(Commune.insee_code.in_(insee_codes))
+        .order_by(Commune.insee_code, member.insee_code)
+    ).all()
+
+    names: Dict[str, str] = {}
+    members: Dict[str, list] = {}
+    for row in rows:
+        names[row.insee_code] = row.name
+        members.setdefault(row.insee_code, []).append(row.member_code)
+    return {
+        code: Agglomeration(name=names[code], insee_codes=tuple(codes))
+        for code, codes in members.items()
+    }
+
+
+def backfill_insee_codes(db: Session, overwrite: bool = False) -> Tuple[int, int]:
+    """
+    Renseigne insee_code sur comparable_pool et property_infos par jointure
+    spatiale (ST_Contains). updated_at est touche pour que le rafraichissement
+    incremental du snapshot memoire reprenne les biens du pool modifies.
+    Retourne (biens du pool, biens evalues) mis a jour.
+    """
+    only_missing = "" if overwrite else "AND t.insee_code IS NULL"
+    pool = db.execute(text(f"""
+        UPDATE comparable_pool AS t
+        SET insee_code = c.insee_code, updated_at = (now() AT TIME ZONE 'utc')
+        FROM communes AS c
+        WHERE ST_Contains(c.geom, t.geom) {only_missing}
+    """)).rowcount
+    properties = db.execute(text(f"""
+        UPDATE property_infos AS t
+        SET insee_code = c.insee_code, updated_at = (now() AT TIME ZONE 'utc')
+        FROM communes AS c
+        WHERE t.latitude IS NOT NULL AND t.longitude IS NOT NULL
+          AND ST_Contains(c.geom, ST_SetSRID(ST_MakePoint(t.longitude, t.latitude), 4326))
+          {only_missing}
+    """)).rowcount
+    db.commit()
+    return pool, properties
@@ -0,0 +1,229 @@
+"""
+Detection et fusion des doublons du pool de comparables
+Une meme transaction arrive souvent de la base interne et des sources concurrentes
+avec des adresses et coordonnees legerement differentes. Seuls les biens pas encore
+examines (dedup_at NULL : nouveaux ou deplaces) sont compares, au reste du pool :
+candidats bornes par l'index GIST de geog (COMPARABLE_DEDUP_RADIUS_M), meme type de
+bien et de transaction, surfaces, prix au m2 et dates proches, puis similarite
+pg_trgm des adresses. Deux biens d'une meme source avec des references distinctes
+sont deux transactions (lots voisins d'un immeuble) et ne sont jamais fusionnes.
+De chaque paire, le bien interne (puis le plus ancien) est conserve :
+ses colonnes vides sont completees par le doublon, qui est supprime et journalise
+dans comparable_pool_merges. Traitement ensembliste par paquets, un commit par paquet.
+"""
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import ComparablePool
+from app.services.comparable_service import notify_pool_delete, notify_pool_write
+from app.services.jobs import Job
+
+# Biens examines par transaction
+COMPARABLE_DEDUP_BATCH = 2000
+
+# Paires detaillees dans le rapport d'un dry_run
+COMPARABLE_DEDUP_MAX_PAIRS = 1000
+
+_BATCH_SQL = text("""
+    CREATE TEMP TABLE dedup_batch ON COMMIT DROP AS
+    SELECT id FROM comparable_pool
+    WHERE dedup_at IS NULL AND id > :after
+    ORDER BY id
+    LIMIT :batch
+""")
+
+# Paires candidates orientees (doublon -> conserve) : le bien interne puis le plus
+# ancien l'emporte ; un doublon garde sa meilleure paire (adresse la plus proche)
+_PAIRS_SQL = text("""
+    CREATE TEMP TABLE dedup_pairs ON COMMIT DROP AS
+    WITH matches AS (
+        SELECT n.id AS new_id, o.id AS other_id,
+               ROW(n.source <> 'arthur_loyd', n.id) < ROW(o.source <> 'arthur_loyd', o.id) AS new_wins,
+               similarity(n.address, o.address) AS similarity,
+               ST_Distance(n.geog, o.geog) AS distance_m
+        FROM dedup_batch b
+        JOIN comparable_pool n ON n.id = b.id
+        JOIN comparable_pool o
+          ON ST_DWithin(o.geog, n.geog, :radius_m)
+         AND o.id <> n.id
+         AND o.property_type = n.property_type
+         AND o.transaction_type = n.transaction_type
+         AND abs(o.surface - n.surface) <= :surface_tolerance * greatest(o.surface, n.surface)
+         AND abs(o.price_per_m2 - n.price_per_m2) <= :price_tolerance * greatest(o.price_per_m2, n.price_per_m2)
+         AND abs(o.transaction_date - n.transaction_date) <= :date_days
+         AND NOT (o.source = n.source AND o.source_reference IS NOT NULL
+                  AND n.source_reference IS NOT NULL AND o.source_reference <> n.source_reference)
+        WHERE similarity(n.address, o.address) >= :min_similarity
+    )
+    SELECT DISTINCT ON (duplicate_id) duplicate_id, survivor_id, similarity, distance_m
+    FROM (
+        SELECT CASE WHEN new_wins THEN other_id ELSE new_id END AS duplicate_id,
+               CASE WHEN new_wins THEN new_id ELSE other_id END AS survivor_id,
+               similarity, distance_m
+        FROM matches
+    ) oriented
+    ORDER BY duplicate_id, similarity DESC, distance_m
+""")
+
+# Chaines (a -> b -> c) : rattachement au bien conserve en bout de chaine
+_RESOLVE_CHAINS_SQL = text("""
+    UPDATE dedup_pairs p SET survivor_id = q.survivor_id
+    FROM dedup_pairs q
+    WHERE p.survivor_id = q.duplicate_id
+""")
+
+_LIST_PAIRS_SQL = text("""
+    SELECT p.duplicate_id, p.survivor_id, p.similarity, p.distance_m,
+           d.address AS duplicate_address, s.address AS survivor_address
+    FROM dedup_pairs p
+    JOIN comparable_pool d ON d.id = p.duplicate_id
+    JOIN comparable_pool s ON s.id = p.survivor_id
+    ORDER BY p.duplicate_id
+""")
+
+# Colonnes vides du bien conserve completees par son doublon le plus proche
+_FILL_SURVIVORS_SQL = text("""
+    UPDATE comparable_pool s SET
+        postal_code = coalesce(s.postal_code, d.postal_code),
+        city = coalesce(s.city, d.city),
+        insee_code = coalesce(s.insee_code, d.insee_code),
+        construction_year = coalesce(s.construction_year, d.construction_year),
+        photo_url = coalesce(s.photo_url, d.photo_url),
+        updated_at = :now
+    FROM (
+        SELECT DISTINCT ON (p.survivor_id) p.survivor_id, c.*
+        FROM dedup_pairs p
+        JOIN comparable_pool c ON c.id = p.duplicate_id
+        ORDER BY p.survivor_id, p.similarity DESC
+    ) d
+    WHERE s.id = d.survivor_id
+      AND (s.postal_code, s.city, s.insee_code, s.construction_year, s.photo_url)
+          IS DISTINCT FROM (coalesce(s.postal_code, d.postal_code), coalesce(s.city, d.city),
+                            coalesce(s.insee_code, d.insee_code),
+                            coalesce(s.construction_year, d.construction_year),
+                            coalesce(s.photo_url, d.photo_url))
+    RETURNING s.id
+""")
+
+_JOURNAL_SQL = text("""
+    INSERT INTO comparable_pool_merges (
+        duplicate_id, survivor_id, source, source_reference, similarity, distance_m, payload, merged_at
+    )
+    SELECT p.duplicate_id, p.survivor_id, d.source::text, d.source_reference, p.similarity, p.distance_m,
+           to_jsonb(d) - 'geom' - 'geog', :now
+    FROM dedup_pairs p
+    JOIN comparable_pool d ON d.id = p.duplicate_id
+    ON CONFLICT (duplicate_id) DO NOTHING
+""")
+
+# Fusions anterieures dont le bien conserve devient lui-meme un doublon
+_REPOINT_SQL = text("""
+    UPDATE comparable_pool_merges m SET survivor_id = p.survivor_id
+    FROM dedup_pairs p
+    WHERE m.survivor_id = p.duplicate_id
+""")
+
+_DELETE_SQL = text("""
+    DELETE FROM comparable_pool
+    WHERE id IN (SELECT duplicate_id FROM dedup_pairs)
+    RETURNING id, property_type, latitude, longitude
+""")
+
+_MARK_SQL = text("""
+    UPDATE comparable_pool SET dedup_at = :now
+    WHERE id IN (SELECT id FROM dedup_batch)
+""")
+
+
+def dedup_comparable_pool(
+    db: Session,
+    dry_run: bool = False,
+    batch_size: int = COMPARABLE_DEDUP_BATCH,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Recherche les doublons des biens pas encore examines et les fusionne dans
+    le bien conserve. dry_run : paires detectees listees, rien n'est modifie
+    (ni fusion ni marquage). progress(biens examines, total) apres chaque paquet.
+    """
+    started_at = time.perf_counter()
+    total = db.scalar(text("SELECT count(*) FROM comparable_pool WHERE dedup_at IS NULL"))
+    params = {
+        "radius_m": settings.COMPARABLE_DEDUP_RADIUS_M,
+        "surface_tolerance": settings.COMPARABLE_DEDUP_SURFACE_TOLERANCE,
+        "price_tolerance": settings.COMPARABLE_DEDUP_PRICE_TOLERANCE,
+        "date_days": settings.COMPARABLE_DEDUP_DATE_DAYS,
+        "min_similarity": settings.COMPARABLE_DEDUP_MIN_SIMILARITY,
+    }
+    report: Dict[str, Any] = {
+        "checked": 0, "duplicates": 0, "survivors_filled": 0, "batches": 0, "dry_run": dry_run,
+    }
+    pairs: List[Dict[str, Any]] = []
+    after = 0
+
+    while True:
+        now = datetime.utcnow()
+        try:
+            db.execute(_BATCH_SQL, {"after": after, "batch": batch_size})
+            checked, last_id = db.execute(text("SELECT count(*), max(id) FROM dedup_batch")).one()
+            if not checked:
+                db.rollback()
+                break
+            db.execute(_PAIRS_SQL, params)
+            # Un doublon ne peut pas rester le bien conserve d'un autre (au plus quelques maillons)
+            while db.execute(_RESOLVE_CHAINS_SQL).rowcount:
+                pass
+
+            if dry_run:
+                found = [dict(row._mapping) for row in db.execute(_LIST_PAIRS_SQL)]
+                pairs += found[:max(0, COMPARABLE_DEDUP_MAX_PAIRS - len(pairs))]
+                deleted, filled = found, []
+                db.rollback()
+            else:
+                filled = list(db.execute(_FILL_SURVIVORS_SQL, {"now": now}).scalars())
+                db.execute(_JOURNAL_SQL, {"now": now})
+                db.execute(_REPOINT_SQL)
+                deleted = db.execute(_DELETE_SQL).all()
+                db.execute(_MARK_SQL, {"now": now})
+                db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+
+        # Snapshot memoire, cache de recherche et tuiles (apres commit)
+        if not dry_run:
+            if deleted:
+                notify_pool_delete(deleted)
+            if filled:
+                notify_pool_write(db.query(ComparablePool).filter(ComparablePool.id.in_(filled)).all())
+
+        after = last_id
+        report["checked"] += checked
+        report["duplicates"] += len(deleted)
+        report["survivors_filled"] += len(filled)
+        report["batches"] += 1
+        if progress:
+            progress(report["checked"], max(total, report["checked"]))
+
+    if dry_run:
+        report["pairs"] = [
+            {**pair, "similarity": round(pair["similarity"], 3), "distance_m": round(pair["distance_m"], 1)}
+            for pair in pairs
+        ]
+    report["seconds"] = round(time.perf_counter() - started_at, 3)
+    return report
+
+
+def run_comparable_dedup_job(job: Job, dry_run: bool = False) -> Dict[str, Any]:
+    """Point d'entree des taches de fond : session dediee, avancement reporte dans job."""
+    db = SessionLocal()
+    try:
+        return dedup_comparable_pool(db, dry_run=dry_run, progress=job.report)
+    finally:
+        db.close()
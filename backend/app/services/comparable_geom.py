@@ -0,0 +1,82 @@
+"""
+Rattrapage de la colonne geom du pool
+geom est derivee de latitude/longitude par le trigger comparable_pool_set_geom ;
+les lignes ecrites avant le trigger sans geom sont invisibles de la recherche
+spatiale. Rattrapage par paquets de cles primaires croissantes, chaque paquet
+dans sa propre transaction courte (verrous de ligne limites au paquet).
+"""
+import time
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ComparablePool
+from app.services.comparable_service import notify_pool_write
+from app.services.jobs import Job
+
+# Lignes mises a jour par transaction
+POOL_GEOM_BACKFILL_BATCH = 5000
+
+_COUNT_SQL = text("SELECT count(*) FROM comparable_pool WHERE geom IS NULL")
+
+# Parcours par cle primaire (id > :after) : chaque paquet reprend la ou le precedent s'est arrete
+_BACKFILL_SQL = text("""
+    UPDATE comparable_pool p
+    SET geom = ST_SetSRID(ST_MakePoint(p.longitude, p.latitude), 4326)
+    WHERE p.id IN (
+        SELECT id FROM comparable_pool
+        WHERE geom IS NULL AND id > :after
+        ORDER BY id
+        LIMIT :batch
+    )
+    RETURNING p.id
+""")
+
+
+def backfill_pool_geom(
+    db: Session,
+    batch_size: int = POOL_GEOM_BACKFILL_BATCH,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Renseigne geom pour les biens du pool qui n'en ont pas, un commit par
+    paquet. progress(lignes mises a jour, total initial) apres chaque paquet.
+    Snapshot memoire, cache de recherche et tuiles mis a jour au fil des paquets.
+    """
+    started_at = time.perf_counter()
+    total = db.scalar(_COUNT_SQL)
+    updated = batches = 0
+    after = 0
+    while True:
+        try:
+            ids = list(db.execute(_BACKFILL_SQL, {"after": after, "batch": batch_size}).scalars())
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        if not ids:
+            break
+        updated += len(ids)
+        batches += 1
+        after = max(ids)
+        notify_pool_write(db.query(ComparablePool).filter(ComparablePool.id.in_(ids)).all())
+        if progress:
+            progress(updated, max(total, updated))
+
+    return {
+        "missing": total,
+        "updated": updated,
+        "batches": batches,
+        "seconds": round(time.perf_counter() - started_at, 3),
+    }
+
+
+def run_pool_geom_backfill_job(job: Job, batch_size: int = POOL_GEOM_BACKFILL_BATCH) -> Dict[str, Any]:
+    """Point d'entree des taches de fond : session dediee, avancement reporte dans job."""
+    db = SessionLocal()
+    try:
+        return backfill_pool_geom(db, batch_size, job.report)
+    finally:
+        db.close()
@@ -0,0 +1,460 @@
+"""
+Import en masse de biens comparables (CSV, XLSX) dans comparable_pool
+Lecture en flux par paquets (pandas pour le CSV, openpyxl en lecture seule pour
+le XLSX), validation et normalisation vectorisees, geocodage par lot des seules
+lignes sans coordonnees, puis COPY FROM STDIN dans une table de transit et un
+INSERT ... SELECT (commune calculee en SQL, geom par trigger). Un fichier = une
+transaction ; les lignes invalides sont ecartees et rapportees avec leur numero.
+"""
+import io
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import ComparablePool, ComparableSource, ComparableStatus, PropertyType, TransactionType
+from app.services.comparable_service import notify_pool_write
+from app.services.geocoding import geocode_batch
+from app.services.jobs import Job
+
+COMPARABLE_IMPORT_EXTENSIONS = (".csv", ".xlsx")
+
+# Lignes en erreur detaillees dans le rapport (toutes sont comptees)
+COMPARABLE_IMPORT_MAX_ERRORS = 1000
+
+# En-tetes acceptes (minuscules, sans accents, separateurs "_") -> colonne du pool
+COLUMN_ALIASES = {
+    "address": "address", "adresse": "address",
+    "postal_code": "postal_code", "code_postal": "postal_code", "cp": "postal_code",
+    "city": "city", "ville": "city", "commune": "city",
+    "latitude": "latitude", "lat": "latitude",
+    "longitude": "longitude", "lng": "longitude", "lon": "longitude",
+    "property_type": "property_type", "type": "property_type", "type_de_bien": "property_type",
+    "surface": "surface", "surface_m2": "surface",
+    "construction_year": "construction_year", "annee_construction": "construction_year",
+    "annee_de_construction": "construction_year",
+    "transaction_type": "transaction_type", "transaction": "transaction_type",
+    "type_de_transaction": "transaction_type",
+    "price": "price", "prix": "price", "loyer": "price", "montant": "price",
+    "price_per_m2": "price_per_m2", "prix_m2": "price_per_m2", "prix_au_m2": "price_per_m2",
+    "loyer_m2": "price_per_m2",
+    "transaction_date": "transaction_date", "date": "transaction_date",
+    "date_transaction": "transaction_date", "date_de_transaction": "transaction_date",
+    "source": "source",
+    "source_reference": "source_reference", "reference": "source_reference", "ref": "source_reference",
+    "status": "status", "statut": "status",
+}
+
+PROPERTY_TYPE_ALIASES = {
+    **{ptype.value: ptype.value for ptype in PropertyType},
+    "bureau": "office", "bureaux": "office",
+    "entrepot": "warehouse", "entrepots": "warehouse", "logistique": "warehouse",
+    "commerce": "retail", "commerces": "retail", "local_commercial": "retail", "boutique": "retail",
+    "activite": "industrial", "local_d_activite": "industrial", "locaux_d_activite": "industrial",
+    "industriel": "industrial",
+    "terrain": "land",
+    "mixte": "mixed",
+}
+
+TRANSACTION_TYPE_ALIASES = {
+    "sale": TransactionType.SALE.value, "vente": TransactionType.SALE.value,
+    "rent": TransactionType.RENT.value, "location": TransactionType.RENT.value,
+    "bail": TransactionType.RENT.value,
+}
+
+SOURCE_ALIASES = {
+    **{source.value: source.value for source in ComparableSource},
+    "interne": ComparableSource.ARTHUR_LOYD.value,
+    "externe": ComparableSource.CONCURRENCE.value,
+}
+
+STATUS_ALIASES = {
+    **{status.value: status.value for status in ComparableStatus},
+    "realisee": ComparableStatus.TRANSACTION.value, "vendu": ComparableStatus.TRANSACTION.value,
+    "loue": ComparableStatus.TRANSACTION.value,
+    "offre": ComparableStatus.DISPONIBLE.value, "available": ComparableStatus.DISPONIBLE.value,
+}
+
+# Colonnes envoyees par COPY, dans l'ordre de la table de transit
+_COPY_COLUMNS = (
+    "address", "postal_code", "city", "latitude", "longitude", "property_type", "surface",
+    "construction_year", "transaction_type", "price", "price_per_m2", "transaction_date",
+    "source", "source_reference", "status",
+)
+
+_CREATE_STAGING_SQL = text("""
+    CREATE TEMP TABLE comparable_import_staging (
+        address text, postal_code text, city text,
+        latitude float8, longitude float8,
+        property_type text, surface float8, construction_year integer,
+        transaction_type text, price float8, price_per_m2 float8, transaction_date date,
+        source text, source_reference text, status text
+    ) ON COMMIT DROP
+""")
+
+# Commune calculee en base (index GIST des contours) ; geom posee par le trigger comparable_pool_set_geom
+_INSERT_SQL = text("""
+    INSERT INTO comparable_pool (
+        address, postal_code, city, insee_code, latitude, longitude,
+        property_type, surface, construction_year, transaction_type, price, price_per_m2,
+        transaction_date, source, source_reference, status, created_at, updated_at
+    )
+    SELECT s.address, s.postal_code, s.city,
+           (SELECT c.insee_code FROM communes c
+            WHERE ST_Contains(c.geom, ST_SetSRID(ST_MakePoint(s.longitude, s.latitude), 4326))
+            LIMIT 1),
+           s.latitude, s.longitude,
+           s.property_type, s.surface, s.construction_year, s.transaction_type::transactiontype,
+           s.price, s.price_per_m2, s.transaction_date, s.source::comparablesource,
+           s.source_reference, s.status, :now, :now
+    FROM comparable_import_staging s
+    RETURNING id
+""")
+
+Progress = Optional[Callable[[int, Optional[int]], None]]
+
+
+@dataclass
+class ComparableImportReport:
+    """Bilan de l'import d'un fichier de comparables"""
+    file_name: str
+    rows: int       # Lignes lues dans le fichier
+    valid: int      # Lignes retenues (inserees sauf dry_run)
+    invalid: int    # Lignes ecartees (validation ou geocodage)
+    geocoded: int   # Lignes sans coordonnees geocodees
+    seconds: float
+    inserted: int = 0
+    dry_run: bool = False
+    errors: List[Dict[str, Any]] = field(default_factory=list)  # {"row": numero de ligne, "errors": [...]}
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def errors_truncated(self) -> bool:
+        return self.invalid > len(self.errors)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "rows_per_second": round(self.rows_per_second),
+            "errors_truncated": self.errors_truncated,
+        }
+
+
+def import_comparables_file(
+    db: Session,
+    path: str,
+    default_source: str = ComparableSource.CONCURRENCE.value,
+    dry_run: bool = False,
+    chunk_rows: Optional[int] = None,
+    file_name: Optional[str] = None,
+    progress: Progress = None
+) -> ComparableImportReport:
+    """
+    Importe un fichier CSV ou XLSX de comparables. Les lignes valides sont
+    chargees par COPY puis inserees en une requete ; tout est annule si
+    dry_run (validation et geocodage seulement). Snapshot memoire, cache de
+    recherche et tuiles sont mis a jour apres le commit.
+    progress(lignes lues, None) est appele apres chaque paquet.
+    """
+    start = time.perf_counter()
+    file_name = file_name or os.path.basename(path)
+    chunk_rows = chunk_rows or settings.COMPARABLE_IMPORT_CHUNK_ROWS
+    cursor = db.connection().connection.cursor()
+    rows = valid = invalid = geocoded = 0
+    errors: List[Dict[str, Any]] = []
+    buffer = io.StringIO()
+    ids: List[int] = []
+
+    try:
+        db.execute(_CREATE_STAGING_SQL)
+        for chunk in read_comparable_chunks(path, chunk_rows):
+            rows += len(chunk)
+            frame, chunk_errors = normalize_comparable_chunk(chunk, default_source)
+
+            # Geocodage par lot des seules lignes sans coordonnees
+            missing = frame["latitude"].isna()
+            if missing.any():
+                located, failed = _geocode_rows(frame[missing])
+                geocoded += len(located)
+                frame.loc[located.index, ["latitude", "longitude"]] = located.to_numpy()
+                frame = frame.drop(index=failed)
+                chunk_errors += [{"row": row, "errors": ["adresse introuvable"]} for row in failed]
+
+            invalid += len(chunk_errors)
+            errors += chunk_errors[:max(0, COMPARABLE_IMPORT_MAX_ERRORS - len(errors))]
+            if not frame.empty:
+                frame.to_csv(buffer, header=False, index=False, columns=list(_COPY_COLUMNS), date_format="%Y-%m-%d")
+                _copy_buffer(cursor, buffer)
+                valid += len(frame)
+            if progress:
+                progress(rows, None)
+
+        if dry_run:
+            db.rollback()
+        else:
+            ids = list(db.execute(_INSERT_SQL, {"now": datetime.utcnow()}).scalars())
+            db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    # Snapshot memoire, cache de recherche et tuiles
+    if ids:
+        notify_pool_write(db.query(ComparablePool).filter(ComparablePool.id.in_(ids)).all())
+
+    errors.sort(key=lambda error: error["row"])
+    return ComparableImportReport(
+        file_name, rows, valid, invalid, geocoded, time.perf_counter() - start,
+        inserted=len(ids), dry_run=dry_run, errors=errors,
+    )
+
+
+def run_comparable_import_job(
+    job: Job,
+    path: str,
+    file_name: str,
+    default_source: str,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """Point d'entree des taches de fond : session dediee, fichier televerse supprime a la fin."""
+    db = SessionLocal()
+    try:
+        report = import_comparables_file(
+            db, path, default_source, dry_run, file_name=file_name, progress=job.report
+        )
+        return report.as_dict()
+    finally:
+        db.close()
+        os.remove(path)
+
+
+def read_comparable_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Paquets de lignes brutes (colonnes du fichier, texte ou valeurs Excel) avec
+    leur numero de ligne dans la colonne "_row" (en-tete = ligne 1).
+    """
+    if path.lower().endswith(".xlsx"):
+        yield from _read_xlsx_chunks(path, chunk_rows)
+        return
+
+    encoding = _detect_encoding(path)
+    with open(path, "rt", encoding=encoding, newline="") as f:
+        separator = _sniff_separator(f.readline())
+        f.seek(0)
+        for chunk in pd.read_csv(f, sep=separator, dtype=str, chunksize=chunk_rows, skip_blank_lines=False):
+            chunk = chunk.dropna(how="all")
+            chunk["_row"] = chunk.index + 2
+            yield chunk
+
+
+def normalize_comparable_chunk(chunk: pd.DataFrame, default_source: str) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Colonnes du pool normalisees (types, valeurs traduites, prix et prix au m2
+    completes l'un par l'autre) et lignes en erreur : regles evaluees par
+    colonne, un message par regle violee. Retourne (lignes valides, erreurs).
+    """
+    chunk = chunk.rename(columns=lambda name: name if name == "_row" else COLUMN_ALIASES.get(_key(str(name)), None))
+    chunk = chunk.loc[:, [name is not None for name in chunk.columns]]
+    chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+    column = lambda name: chunk[name] if name in chunk else pd.Series(np.nan, index=chunk.index, dtype=object)
+
+    frame = pd.DataFrame({
+        "_row": chunk["_row"],
+        "address": _to_text(column("address")),
+        "postal_code": _to_text(column("postal_code")).str.replace(r"\.0$", "", regex=True),  # Cellule numerique Excel
+        "city": _to_text(column("city")),
+        "latitude": _to_number(column("latitude")),
+        "longitude": _to_number(column("longitude")),
+        "property_type": _to_key(column("property_type")).map(PROPERTY_TYPE_ALIASES),
+        "surface": _to_number(column("surface")),
+        "construction_year": _to_number(column("construction_year")),
+        "transaction_type": _to_key(column("transaction_type")).map(TRANSACTION_TYPE_ALIASES),
+        "price": _to_number(column("price")),
+        "price_per_m2": _to_number(column("price_per_m2")),
+        "transaction_date": _to_date(column("transaction_date")),
+        "source": _to_key(column("source")),
+        "source_reference": _to_text(column("source_reference")),
+        "status": _to_key(column("status")),
+    })
+
+    # Valeurs par defaut des colonnes facultatives
+    source_given = frame["source"].notna()
+    status_given = frame["status"].notna()
+    frame["source"] = frame["source"].map(SOURCE_ALIASES).where(source_given, default_source)
+    frame["status"] = frame["status"].map(STATUS_ALIASES).where(status_given, ComparableStatus.TRANSACTION.value)
+    frame["price"] = frame["price"].fillna(frame["price_per_m2"] * frame["surface"])
+    frame["price_per_m2"] = frame["price_per_m2"].fillna(frame["price"] / frame["surface"]).round(2)
+    # Coordonnees partielles : geocodage depuis l'adresse
+    partial = frame["latitude"].isna() | frame["longitude"].isna()
+    frame.loc[partial, ["latitude", "longitude"]] = np.nan
+
+    this_year = date.today().year
+    rules = {
+        "adresse manquante": frame["address"].isna(),
+        "type de bien inconnu": frame["property_type"].isna(),
+        "type de transaction inconnu": frame["transaction_type"].isna(),
+        "surface invalide": ~(frame["surface"] > 0),
+        "prix invalide": ~(frame["price"] > 0),
+        "date de transaction invalide": frame["transaction_date"].isna(),
+        "latitude hors limites": ~frame["latitude"].between(-90, 90) & frame["latitude"].notna(),
+        "longitude hors limites": ~frame["longitude"].between(-180, 180) & frame["longitude"].notna(),
+        "annee de construction invalide": (
+            frame["construction_year"].notna() & ~frame["construction_year"].between(1700, this_year + 5)
+        ),
+        "source inconnue": source_given & frame["source"].isna(),
+        "statut inconnu": status_given & frame["status"].isna(),
+    }
+    violations = pd.DataFrame(rules)
+    rejected = violations.any(axis=1)
+
+    errors = [
+        {"row": int(row), "errors": [rule for rule, violated in flags.items() if violated]}
+        for row, (_, flags) in zip(frame.loc[rejected, "_row"], violations[rejected].iterrows())
+    ]
+    frame = frame[~rejected].copy()
+    frame["construction_year"] = frame["construction_year"].round().astype("Int64")
+    return frame.set_index("_row", drop=False), errors
+
+
+def _geocode_rows(frame: pd.DataFrame) -> Tuple[pd.DataFrame, List[int]]:
+    """
+    Geocode par lot les lignes sans coordonnees (adresse completee du code
+    postal et de la ville). Retourne (coordonnees des lignes trouvees, numeros
+    des lignes introuvables).
+    """
+    queries = (
+        frame["address"]
+        + (" " + frame["postal_code"]).fillna("")
+        + (" " + frame["city"]).fillna("")
+    )
+    coords = geocode_batch(queries.tolist())
+    found = queries.map(lambda query: coords.get(query))
+    located = found.dropna()
+    return (
+        pd.DataFrame(located.tolist(), index=located.index, columns=["latitude", "longitude"]),
+        [int(row) for row in found.index[found.isna()]],
+    )
+
+
+def _key(value: str) -> str:
+    """Cle de comparaison : minuscules, sans accents, separateurs "_"."""
+    return _to_key(pd.Series([value])).iloc[0] or ""
+
+
+def _to_key(series: pd.Series) -> pd.Series:
+    keys = (
+        _to_text(series)
+        .str.normalize("NFKD").str.encode("ascii", errors="ignore").str.decode("ascii")
+        .str.lower().str.replace(r"[^a-z0-9]+", "_", regex=True).str.strip("_")
+    )
+    return keys.mask(keys == "")
+
+
+def _to_text(series: pd.Series) -> pd.Series:
+    """Texte sans espaces superflus ; NaN si vide."""
+    values = series.astype("string").str.strip()
+    values = values.mask(values == "")
+    return values.astype(object).where(values.notna(), None)
+
+
+def _to_number(series: pd.Series) -> pd.Series:
+    """Nombre decimal ('1 250,50 EUR', '1250.5' ou valeur Excel) ; NaN si illisible."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    as_text = series.astype("string").str.replace(r"[^0-9,.\-]", "", regex=True)
+    # Virgule decimale : les points sont des separateurs de milliers ('1.250,50')
+    comma = as_text.str.contains(",", regex=False).fillna(False)
+    as_text = as_text.mask(comma, as_text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    numbers = pd.to_numeric(as_text, errors="coerce")
+    # Valeurs deja numeriques (cellules Excel) conservees telles quelles
+    native = pd.to_numeric(series.where(series.map(lambda v: isinstance(v, (int, float)))), errors="coerce")
+    return native.fillna(numbers).astype(float)
+
+
+def _to_date(series: pd.Series) -> pd.Series:
+    """
+    Date ISO (2024-12-31) ou jour en premier (31/12/2024) ; NaT si illisible.
+    Les dates ISO sont lues strictement d'abord : dayfirst inverserait jour et mois.
+    """
+    parsed = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    rest = parsed.isna() & series.notna()
+    if rest.any():
+        parsed = parsed.fillna(pd.to_datetime(series[rest], errors="coerce", dayfirst=True, format="mixed"))
+    return parsed.dt.date.where(parsed.notna(), None)
+
+
+def _detect_encoding(path: str) -> str:
+    """UTF-8 (avec ou sans BOM), sinon Windows-1252 (exports Excel francais)."""
+    with open(path, "rb") as f:
+        sample = f.read(1 << 20)
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Caractere coupe en fin d'echantillon : encore de l'UTF-8
+        if e.start < len(sample) - 3:
+            return "cp1252"
+    return "utf-8-sig"
+
+
+def _sniff_separator(header: str) -> str:
+    """Separateur de l'en-tete : ';' (Excel francais), tabulation ou ','."""
+    return max((";", "\t", ","), key=header.count)
+
+
+def _read_xlsx_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Premiere feuille lue ligne a ligne (openpyxl en lecture seule : memoire bornee)."""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else "" for name in header]
+        width = len(columns)
+        batch: List[tuple] = []
+        numbers: List[int] = []
+        for number, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            values = tuple(values[:width]) + (None,) * (width - len(values))
+            batch.append(values)
+            numbers.append(number)
+            if len(batch) >= chunk_rows:
+                yield _xlsx_frame(batch, columns, numbers)
+                batch, numbers = [], []
+        if batch:
+            yield _xlsx_frame(batch, columns, numbers)
+    finally:
+        workbook.close()
+
+
+def _xlsx_frame(batch: List[tuple], columns: List[str], numbers: List[int]) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(batch, columns=columns)
+    frame = frame.loc[:, [name != "" for name in frame.columns]]
+    frame["_row"] = numbers
+    return frame
+
+
+def _copy_buffer(cursor, buffer: io.StringIO):
+    """Envoie le tampon CSV dans la table de transit par COPY FROM STDIN puis le vide."""
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY comparable_import_staging ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    buffer.seek(0)
+    buffer.truncate()
@@ -0,0 +1,422 @@
+"""
+Index spatial en memoire du pool de comparables
+Snapshot compact (tableaux NumPy) partitionne par type de bien, avec un index
+grille pour repondre aux recherches par rayon sans aller-retour en base.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from math import cos, floor, radians
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import ComparablePool, ComparableSource, TransactionType
+from app.services.comparable_stats import haversine_km
+
+# Taille d'une cellule de la grille (en degres, ~5.5 km en latitude)
+GRID_CELL_DEG = 0.05
+# Decalage/pas des cles de cellule (cle = y * STRIDE + x + OFFSET, toujours positive)
+_GRID_OFFSET = 1 << 15
+_GRID_STRIDE = 1 << 16
+# Nombre minimal de lignes non indexees (ajouts incrementaux) avant reconstruction de la grille
+_REBUILD_MIN_TAIL = 1024
+
+KM_PER_DEG_LAT = 111.32
+
+_SOURCE_CODES = {source: code for code, source in enumerate(ComparableSource)}
+
+_LOAD_COLUMNS = (
+    ComparablePool.id,
+    ComparablePool.address,
+    ComparablePool.postal_code,
+    ComparablePool.city,
+    ComparablePool.insee_code,
+    ComparablePool.latitude,
+    ComparablePool.longitude,
+    ComparablePool.property_type,
+    ComparablePool.surface,
+    ComparablePool.construction_year,
+    ComparablePool.transaction_type,
+    ComparablePool.price,
+    ComparablePool.price_per_m2,
+    ComparablePool.transaction_date,
+    ComparablePool.source,
+    ComparablePool.source_reference,
+    ComparablePool.photo_url,
+    ComparablePool.status,
+    ComparablePool.created_at,
+    ComparablePool.updated_at,
+)
+
+
+def _enum_value(value: Any) -> Any:
+    return value.value if hasattr(value, "value") else value
+
+
+@dataclass
+class PoolHits:
+    """Biens candidats d'une recherche en memoire, tries par distance croissante."""
+    distance_km: np.ndarray
+    lat: np.ndarray
+    lng: np.ndarray
+    is_rent: np.ndarray
+    price_per_m2: np.ndarray
+    transaction_day: np.ndarray  # date.toordinal()
+    city: List[Optional[str]]    # en minuscules
+    records: List[Dict[str, Any]]
+    in_agglomeration: Optional[np.ndarray] = None  # Si codes INSEE d'agglomeration fournis
+
+    def to_dicts(self, mask: np.ndarray) -> List[Dict[str, Any]]:
+        """Serialise les biens selectionnes par mask au format de reponse API."""
+        return [
+            {**self.records[i], "distance_km": round(float(self.distance_km[i]), 2)}
+            for i in np.flatnonzero(mask)
+        ]
+
+
+class _Partition:
+    """
+    Snapshot d'un type de bien.
+    Les n_indexed premieres lignes sont indexees par la grille ; les lignes
+    ajoutees ensuite (ecritures incrementales) sont parcourues lineairement
+    jusqu'a la prochaine reconstruction.
+    """
+
+    def __init__(self, rows: List[Any]):
+        self.records: List[Dict[str, Any]] = []
+        self.cities: List[Optional[str]] = []
+        self.columns: Dict[str, np.ndarray] = {
+            "lat": np.empty(0, dtype=np.float64),
+            "lng": np.empty(0, dtype=np.float64),
+            "surface": np.empty(0, dtype=np.float64),
+            "year": np.empty(0, dtype=np.float64),  # NaN si inconnue
+            "price_per_m2": np.empty(0, dtype=np.float64),
+            "is_rent": np.empty(0, dtype=bool),
+            "source": np.empty(0, dtype=np.int8),
+            "status": np.empty(0, dtype=object),
+            "day": np.empty(0, dtype=np.int32),
+            "insee": np.empty(0, dtype=object),
+        }
+        self.alive = np.empty(0, dtype=bool)
+        self.positions: Dict[int, int] = {}
+        self._append(rows)
+        self._build_grid()
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def _append(self, rows: List[Any]):
+        """Ajoute des lignes en fin de snapshot (une ancienne version est marquee morte)."""
+        if not rows:
+            return
+        for row in rows:
+            previous = self.positions.get(row.id)
+            if previous is not None:
+                self.alive[previous] = False
+
+        start = len(self.records)
+        new_columns = {
+            "lat": np.array([r.latitude for r in rows], dtype=np.float64),
+            "lng": np.array([r.longitude for r in rows], dtype=np.float64),
+            "surface": np.array([r.surface for r in rows], dtype=np.float64),
+            "year": np.array(
+                [r.construction_year if r.construction_year is not None else np.nan for r in rows],
+                dtype=np.float64,
+            ),
+            "price_per_m2": np.array([r.price_per_m2 for r in rows], dtype=np.float64),
+            "is_rent": np.array(
+                [_enum_value(r.transaction_type) == TransactionType.RENT.value for r in rows], dtype=bool
+            ),
+            "source": np.array([_SOURCE_CODES[ComparableSource(_enum_value(r.source))] for r in rows], dtype=np.int8),
+            "status": np.array([_enum_value(r.status) for r in rows], dtype=object),
+            "day": np.array([r.transaction_date.toordinal() for r in rows], dtype=np.int32),
+            "insee": np.array([r.insee_code for r in rows], dtype=object),
+        }
+        for name, values in new_columns.items():
+            self.columns[name] = np.concatenate([self.columns[name], values])
+        self.alive = np.concatenate([self.alive, np.ones(len(rows), dtype=bool)])
+
+        for offset, row in enumerate(rows):
+            self.positions[row.id] = start + offset
+            self.cities.append(row.city.lower() if row.city else None)
+            self.records.append({
+                "id": row.id,
+                "address": row.address,
+                "postal_code": row.postal_code,
+                "city": row.city,
+                "latitude": row.latitude,
+                "longitude": row.longitude,
+                "property_type": row.property_type,
+                "surface": row.surface,
+                "construction_year": row.construction_year,
+                "transaction_type": _enum_value(row.transaction_type),
+                "price": row.price,
+                "price_per_m2": row.price_per_m2,
+                "transaction_date": row.transaction_date.isoformat() if row.transaction_date else None,
+                "source": _enum_value(row.source),
+                "source_reference": row.source_reference,
+                "photo_url": row.photo_url,
+                "status": _enum_value(row.status) or "transaction",
+            })
+
+    def _compact(self):
+        """Supprime les lignes mortes (anciennes versions / biens deplaces)."""
+        keep = np.flatnonzero(self.alive)
+        if len(keep) == len(self.alive):
+            return
+        self.columns = {name: values[keep] for name, values in self.columns.items()}
+        self.records = [self.records[i] for i in keep]
+        self.cities = [self.cities[i] for i in keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.positions = {record["id"]: i for i, record in enumerate(self.records)}
+
+    def _build_grid(self):
+        self._compact()
+        keys = self._cell_keys(self.columns["lat"], self.columns["lng"])
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+        self.n_indexed = len(self.records)
+
+    @staticmethod
+    def _cell_keys(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        cell_y = np.floor(lats / GRID_CELL_DEG).astype(np.int64)
+        cell_x = np.floor(lngs / GRID_CELL_DEG).astype(np.int64) + _GRID_OFFSET
+        return cell_y * _GRID_STRIDE + cell_x
+
+    def apply(self, rows: List[Any]):
+        """Applique des insertions/mises a jour incrementales."""
+        self._append(rows)
+        tail = len(self.records) - self.n_indexed
+        if tail > max(_REBUILD_MIN_TAIL, self.n_indexed // 10):
+            self._build_grid()
+
+    def remove(self, ids: Iterable[int]):
+        for pool_id in ids:
+            position = self.positions.pop(pool_id, None)
+            if position is not None:
+                self.alive[position] = False
+
+    def candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Positions des lignes vivantes dans les cellules couvrant le rayon."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlng = radius_km / (KM_PER_DEG_LAT * max(cos(radians(lat)), 0.01))
+        y0, y1 = floor((lat - dlat) / GRID_CELL_DEG), floor((lat + dlat) / GRID_CELL_DEG)
+        x0 = floor((lng - dlng) / GRID_CELL_DEG) + _GRID_OFFSET
+        x1 = floor((lng + dlng) / GRID_CELL_DEG) + _GRID_OFFSET
+
+        slices = []
+        for y in range(y0, y1 + 1):
+            lo = np.searchsorted(self.sorted_keys, y * _GRID_STRIDE + x0, side="left")
+            hi = np.searchsorted(self.sorted_keys, y * _GRID_STRIDE + x1, side="right")
+            if hi > lo:
+                slices.append(self.order[lo:hi])
+        slices.append(np.arange(self.n_indexed, len(self.records)))
+
+        positions = np.concatenate(slices)
+        return positions[self.alive[positions]]
+
+    def in_communes(self, insee_codes: Iterable[str]) -> np.ndarray:
+        """Positions des lignes vivantes situees dans les communes donnees (parcours vectorise)."""
+        return np.flatnonzero(self.alive & np.isin(self.columns["insee"], list(insee_codes)))
+
+
+class ComparablePoolIndex:
+    """
+    Snapshot memoire du pool, rafraichi incrementalement.
+    Les ecritures du processus courant sont appliquees immediatement (apply) ;
+    celles des autres processus (imports, scripts) sont recuperees par refresh
+    via updated_at. Au-dela de COMPARABLE_INDEX_MAX_AGE_SECONDS sans
+    rafraichissement, le snapshot est considere perime et la recherche
+    retombe sur PostGIS.
+    """
+
+    def __init__(self):
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+        self._watermark: Optional[datetime] = None
+        self._refreshed_at: Optional[float] = None
+        self._refreshing = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._refreshed_at is not None
+
+    def is_fresh(self) -> bool:
+        """True si le snapshot est charge et assez recent pour remplacer PostGIS."""
+        if self._refreshed_at is None:
+            return False
+        return time.monotonic() - self._refreshed_at <= settings.COMPARABLE_INDEX_MAX_AGE_SECONDS
+
+    def stats(self) -> Dict[str, Any]:
+        """Volumetrie du snapshot par type de bien."""
+        return {
+            "loaded": self.loaded,
+            "fresh": self.is_fresh(),
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            "partitions": {ptype: len(p) for ptype, p in self._partitions.items()},
+        }
+
+    def refresh(self, db: Session, full: bool = False):
+        """
+        Charge le snapshot complet au premier appel, puis uniquement les lignes
+        creees/modifiees depuis le dernier rafraichissement.
+        """
+        full = full or self._watermark is None
+        last_change = func.coalesce(ComparablePool.updated_at, ComparablePool.created_at)
+        query = select(*_LOAD_COLUMNS).where(ComparablePool.geom.isnot(None))
+        if not full:
+            query = query.where(last_change >= self._watermark)
+        rows = db.execute(query).all()
+
+        with self._lock:
+            if full:
+                self._partitions = {}
+                self._watermark = None
+            self._apply_locked(rows)
+            changes = [r.updated_at or r.created_at for r in rows if (r.updated_at or r.created_at)]
+            if changes:
+                self._watermark = max([self._watermark, *changes] if self._watermark else changes)
+            size = sum(len(p) for p in self._partitions.values())
+
+        # Les suppressions ne sont pas visibles via updated_at : recharger si les volumes divergent
+        if not full:
+            total = db.scalar(select(func.count()).select_from(ComparablePool).where(ComparablePool.geom.isnot(None)))
+            if total != size:
+                return self.refresh(db, full=True)
+
+        self._refreshed_at = time.monotonic()
+
+    def refresh_in_background(self):
+        """Lance un rafraichissement dans un thread (un seul a la fois)."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_job, daemon=True).start()
+
+    def _refresh_job(self):
+        db = SessionLocal()
+        try:
+            self.refresh(db)
+        except Exception as e:
+            print(f"Erreur rafraichissement de l'index memoire du pool: {e}")
+        finally:
+            db.close()
+            self._refreshing = False
+
+    def apply(self, items: Iterable[Any]):
+        """Applique les ecritures du processus courant (no-op si le snapshot n'est pas charge)."""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._apply_locked([item for item in items if item.geom is not None])
+
+    def remove(self, ids: Iterable[int]):
+        """Retire des biens supprimes du pool (no-op si le snapshot n'est pas charge)."""
+        if not self.loaded:
+            return
+        ids = list(ids)
+        with self._lock:
+            for partition in self._partitions.values():
+                partition.remove(ids)
+
+    def _apply_locked(self, rows: List[Any]):
+        by_type: Dict[str, List[Any]] = {}
+        for row in rows:
+            by_type.setdefault(row.property_type, []).append(row)
+
+        for ptype, partition_rows in by_type.items():
+            # Un bien dont le type change quitte son ancienne partition
+            ids = [row.id for row in partition_rows]
+            for other_type, partition in self._partitions.items():
+                if other_type != ptype:
+                    partition.remove(ids)
+            partition = self._partitions.get(ptype)
+            if partition is None:
+                self._partitions[ptype] = _Partition(partition_rows)
+            else:
+                partition.apply(partition_rows)
+
+    def query(
+        self,
+        property_type: str,
+        center_lat: float,
+        center_lng: float,
+        radius_km: float,
+        params: Any,
+        agglomeration_codes: Optional[Iterable[str]] = None
+    ) -> Optional[PoolHits]:
+        """
+        Recherche par rayon et filtres attributaires (memes regles que la requete SQL).
+        Avec agglomeration_codes, les biens de ces communes sont inclus meme hors
+        rayon et signales par in_agglomeration.
+        Retourne None si le snapshot est perime : l'appelant doit utiliser PostGIS.
+        """
+        if not self.is_fresh():
+            return None
+
+        partition = self._partitions.get(property_type)
+        if partition is None:
+            return PoolHits(
+                distance_km=np.empty(0), lat=np.empty(0), lng=np.empty(0),
+                is_rent=np.empty(0, dtype=bool),
+                price_per_m2=np.empty(0), transaction_day=np.empty(0, dtype=np.int32),
+                city=[], records=[],
+                in_agglomeration=np.empty(0, dtype=bool) if agglomeration_codes is not None else None,
+            )
+
+        with self._lock:
+            positions = partition.candidates(center_lat, center_lng, radius_km)
+            if agglomeration_codes is not None:
+                positions = np.union1d(positions, partition.in_communes(agglomeration_codes))
+            cols = {name: values[positions] for name, values in partition.columns.items()}
+            records = partition.records
+            cities = partition.cities
+
+        mask = np.ones(len(positions), dtype=bool)
+        if params.surface_min:
+            mask &= cols["surface"] >= params.surface_min
+        if params.surface_max:
+            mask &= cols["surface"] <= params.surface_max
+        if params.year_min:
+            mask &= cols["year"] >= params.year_min
+        if params.year_max:
+            mask &= cols["year"] <= params.year_max
+        if params.source and params.source != "all":
+            if params.source in {s.value for s in ComparableSource}:
+                mask &= cols["source"] == _SOURCE_CODES[ComparableSource(params.source)]
+        if params.status and params.status != "all":
+            mask &= cols["status"] == params.status
+
+        distances = haversine_km(center_lat, center_lng, cols["lat"], cols["lng"])
+        in_agglomeration = None
+        if agglomeration_codes is not None:
+            in_agglomeration = np.isin(cols["insee"], list(agglomeration_codes))
+            mask &= (distances <= radius_km) | in_agglomeration
+        else:
+            mask &= distances <= radius_km
+
+        selected = np.flatnonzero(mask)
+        selected = selected[np.argsort(distances[selected], kind="stable")]
+        return PoolHits(
+            distance_km=distances[selected],
+            lat=cols["lat"][selected],
+            lng=cols["lng"][selected],
+            is_rent=cols["is_rent"][selected],
+            price_per_m2=cols["price_per_m2"][selected],
+            transaction_day=cols["day"][selected],
+            city=[cities[positions[i]] for i in selected],
+            records=[records[positions[i]] for i in selected],
+            in_agglomeration=in_agglomeration[selected] if in_agglomeration is not None else None,
+        )
+
+
+# Instance partagee par le processus
+pool_index = ComparablePoolIndex()
+
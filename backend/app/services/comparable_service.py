@@ -1,66 +1,71 @@
 """
 Service de gestion des biens comparables
 """
-from typing import Optional, List, Dict, Any, Tuple
-from dataclasses import dataclass
+import threading
+from typing import Optional, List, Dict, Any, Sequence, Tuple
+from dataclasses import dataclass, field
 from datetime import date
+from math import radians, sin, cos, sqrt, atan2
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func, select, cast, type_coerce, values, column, and_, or_, any_, false, true, Float, Integer, String, Select
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, array
+from geoalchemy2 import Geography
+import numpy as np
+from app.config import settings
+from app.database import SessionLocal
 from app.models import ComparablePool, ComparableSource, TransactionType, ComparableStatus, Project, PropertyInfo, Comparable
-
-
-def geocode_address(address: str) -> Optional[Tuple[float, float]]:
-    """
-    Geocode une adresse en coordonnees lat/lng via Nominatim (OpenStreetMap).
-    Retourne (latitude, longitude) ou None si echec.
-    """
-    try:
-        geolocator = Nominatim(user_agent="oryem-app", timeout=10)
-        location = geolocator.geocode(address, country_codes="fr")
-        if location:
-            return (location.latitude, location.longitude)
-        return None
-    except (GeocoderTimedOut, GeocoderServiceError) as e:
-        print(f"Erreur geocodage pour '{address}': {e}")
-        return None
-
-
-def ensure_property_coordinates(db: Session, project_id: int) -> Optional[Tuple[float, float]]:
-    """
-    S'assure que le PropertyInfo du projet a des coordonnees.
-    Si non, geocode l'adresse du projet et sauvegarde.
-    Retourne (lat, lng) ou None.
-    """
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project or not project.address:
-        return None
-
-    property_info = db.query(PropertyInfo).filter(
-        PropertyInfo.project_id == project_id
-    ).first()
-
-    # Creer PropertyInfo si inexistant
-    if not property_info:
-        property_info = PropertyInfo(project_id=project_id)
-        db.add(property_info)
-        db.flush()
-
-    # Si deja des coordonnees, les retourner
-    if property_info.latitude and property_info.longitude:
-        return (property_info.latitude, property_info.longitude)
-
-    # Geocoder l'adresse du projet
-    coords = geocode_address(project.address)
-    if coords:
-        property_info.latitude = coords[0]
-        property_info.longitude = coords[1]
-        db.commit()
-        db.refresh(property_info)
-        return coords
-
-    return None
+from app.services.comparable_index import pool_index, KM_PER_DEG_LAT
+from app.services.comparable_tiles import invalidate_tiles
+from app.services.communes import locate_insee_code, load_agglomerations
+from app.services.geocoding import geocode_address
+from app.utils.cache import TTLCache
+from app.services.comparable_stats import (
+    haversine_km,
+    perimeter_price_stats,
+    price_stats,
+    comparable_arrays,
+    grid_clusters,
+    similarity_scores,
+    top_k,
+    to_day_array,
+    empty_distribution,
+    DEFAULT_RANK_WEIGHTS,
+    DISTRIBUTION_QUANTILES,
+)
+
+
+# Rayons des perimetres geographiques (en km)
+AGGLOMERATION_RADIUS_KM = 15.0
+SECTOR_RADIUS_KM = 5.0
+
+# Moteurs de recherche disponibles
+SEARCH_ENGINE_POSTGIS = "postgis"  # Une seule requete SQL (distances + agregats en base)
+SEARCH_ENGINE_PYTHON = "python"    # Historique : distances et stats calculees en Python
+SEARCH_ENGINE_MEMORY = "memory"    # Snapshot NumPy en memoire, repli sur PostGIS si perime
+
+_GEOGRAPHY_POINT = Geography(geometry_type="POINT", srid=4326)
+
+# Cache des resultats de recherche (LRU + TTL), invalide a chaque ecriture du pool
+SEARCH_CACHE_CENTER_PRECISION = 4  # decimales de lat/lng (~10 m)
+search_cache = TTLCache(
+    maxsize=settings.COMPARABLE_SEARCH_CACHE_SIZE,
+    ttl=settings.COMPARABLE_SEARCH_CACHE_TTL_SECONDS,
+)
+
+# Generation des ecritures du pool par type de bien : un resultat calcule avant
+# une ecriture n'est pas mis en cache apres son invalidation. Les ecritures des
+# autres processus (scripts) ne sont couvertes que par le TTL du cache.
+_pool_generations: Dict[str, int] = {}
+_pool_generations_lock = threading.Lock()
+
+# Colonnes du pool renvoyees par le moteur PostGIS (geom exclue)
+_POOL_RESPONSE_COLUMNS = (
+    "id", "address", "postal_code", "city", "latitude", "longitude",
+    "property_type", "surface", "construction_year", "transaction_type",
+    "price", "price_per_m2", "transaction_date", "source", "source_reference",
+    "photo_url", "status",
+)
 
 
 @dataclass
@@ -73,6 +78,35 @@ class ComparableSearchParams:
     distance_km: float = 5.0
     source: Optional[str] = "all"
     status: Optional[str] = "all"
+    engine: Optional[str] = None  # None = settings.COMPARABLE_SEARCH_ENGINE
+    cluster_zoom: Optional[int] = None  # Niveau de zoom de la carte (mode clusters)
+    cluster_grid_m: Optional[float] = None  # Taille de cellule explicite en metres (prioritaire)
+    top_k: Optional[int] = None  # Mode classement : k biens les plus similaires
+    rank_weights: Optional[Dict[str, float]] = None  # Surcharge de DEFAULT_RANK_WEIGHTS
+
+    def cluster_grid_deg(self) -> Optional[float]:
+        """
+        Taille des cellules de regroupement en degres, None si mode clusters inactif.
+        Le mode classement porte sur tous les biens du rayon : il desactive les clusters.
+        """
+        if self.top_k:
+            return None
+        if self.cluster_grid_m:
+            return self.cluster_grid_m / (KM_PER_DEG_LAT * 1000)
+        if self.cluster_zoom is not None:
+            # Largeur en degres de COMPARABLE_CLUSTER_CELL_PX pixels (tuiles 256 px)
+            return 360.0 * settings.COMPARABLE_CLUSTER_CELL_PX / (256 * 2 ** self.cluster_zoom)
+        return None
+
+
+@dataclass
+class _EngineResult:
+    """Resultat d'un moteur de recherche (avant mise en forme de la reponse)"""
+    comparables: List[Dict[str, Any]]
+    stats: Dict[str, Any]  # Rayon utilisateur (= perimetre Proximite)
+    agglo_stats: Dict[str, Any]
+    sector_stats: Dict[str, Any]
+    clusters: List[Dict[str, Any]] = field(default_factory=list)
 
 
 @dataclass
@@ -96,6 +130,9 @@ def search_comparables(
     Recherche des biens comparables dans le pool selon les filtres.
     Le filtre par type de bien est automatique (meme type que le projet).
     Retourne les stats pour 3 perimetres geographiques.
+    En mode clusters (cluster_zoom ou cluster_grid_m), les biens du rayon sont
+    regroupes par cellule de grille : seules les cellules de moins de
+    COMPARABLE_CLUSTER_MIN_POINTS biens sont detaillees dans comparables.
 
     Args:
         db: Session de base de donnees
@@ -103,166 +140,871 @@ def search_comparables(
         params: Parametres de recherche
 
     Returns:
-        Dict avec comparables, stats, perimeter_stats et center
+        Dict avec comparables, clusters, stats, perimeter_stats et center
+    """
+    # Recuperer le projet, ses coordonnees et sa ville
+    site = _load_search_sites(db, [project_id]).get(project_id)
+    if site is None:
+        return _empty_search_result()
+
+    center_lat = site.lat
+    center_lng = site.lng
+    project_city = site.city
+    property_type = site.property_type
+    center = site.center()
+
+    # Resultat en cache pour les memes filtres (invalide par notify_pool_write)
+    cache_key = _search_cache_key(site, params)
+    generation = _pool_generation(property_type)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "center": center}
+
+    engine = params.engine or settings.COMPARABLE_SEARCH_ENGINE
+    result = None
+    if engine == SEARCH_ENGINE_MEMORY:
+        result = _search_memory(
+            property_type, center_lat, center_lng, project_city, params, site.agglomeration_codes
+        )
+        if result is None:
+            # Snapshot absent ou perime : repli sur PostGIS et rafraichissement en tache de fond
+            pool_index.refresh_in_background()
+    elif engine == SEARCH_ENGINE_PYTHON:
+        result = _search_python(
+            db, property_type, center_lat, center_lng, project_city, params, site.agglomeration_codes
+        )
+    if result is None:
+        result = _search_postgis(
+            db, property_type, center_lat, center_lng, project_city, params, site.agglomeration_codes
+        )
+
+    result = _search_response(result, site, params)
+    _cache_search_result(cache_key, property_type, generation, result)
+
+    return {**result, "center": center}
+
+
+def search_comparables_batch(
+    db: Session,
+    project_ids: List[int],
+    params: ComparableSearchParams
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Recherche des comparables pour plusieurs projets (mandats de portefeuille).
+    Les projets sont traites par paquets de COMPARABLE_BATCH_CHUNK_SIZE : une
+    requete LATERAL par paquet (ou le snapshot memoire si actif et a jour),
+    paquets repartis sur un pool de threads au-dela de
+    COMPARABLE_BATCH_PARALLEL_THRESHOLD projets a calculer.
+
+    Args:
+        db: Session de base de donnees
+        project_ids: IDs des projets
+        params: Parametres de recherche communs a tous les projets
+
+    Returns:
+        Dict project_id -> resultat au format de search_comparables
+    """
+    sites = _load_search_sites(db, project_ids)
+    generations = {site.property_type: _pool_generation(site.property_type) for site in sites.values()}
+    results: Dict[int, Dict[str, Any]] = {}
+    pending: List[_SearchSite] = []
+
+    for project_id in dict.fromkeys(project_ids):
+        site = sites.get(project_id)
+        if site is None:
+            results[project_id] = _empty_search_result()
+            continue
+        cached = search_cache.get(_search_cache_key(site, params))
+        if cached is not None:
+            results[project_id] = {**cached, "center": site.center()}
+        else:
+            pending.append(site)
+
+    chunk_size = max(1, settings.COMPARABLE_BATCH_CHUNK_SIZE)
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+
+    if len(pending) > settings.COMPARABLE_BATCH_PARALLEL_THRESHOLD and len(chunks) > 1:
+        # Une session par thread : une Session SQLAlchemy n'est pas thread-safe
+        with ThreadPoolExecutor(max_workers=settings.COMPARABLE_BATCH_WORKERS) as executor:
+            chunk_results = list(executor.map(lambda chunk: _search_batch_chunk(None, chunk, params), chunks))
+    else:
+        chunk_results = [_search_batch_chunk(db, chunk, params) for chunk in chunks]
+
+    for chunk, engine_results in zip(chunks, chunk_results):
+        for site, engine_result in zip(chunk, engine_results):
+            result = _search_response(engine_result, site, params)
+            _cache_search_result(
+                _search_cache_key(site, params), site.property_type, generations[site.property_type], result
+            )
+            results[site.project_id] = {**result, "center": site.center()}
+
+    return {project_id: results[project_id] for project_id in dict.fromkeys(project_ids)}
+
+
+@dataclass
+class _SearchSite:
+    """Bien evalue d'un projet : point de depart d'une recherche de comparables"""
+    project_id: int
+    property_type: str
+    lat: float
+    lng: float
+    city: Optional[str]
+    surface: Optional[float] = None  # Cibles du mode classement
+    construction_year: Optional[int] = None
+    # Perimetre agglomeration par contours de communes (None : repli sur la ville)
+    agglomeration_name: Optional[str] = None
+    agglomeration_codes: Optional[Tuple[str, ...]] = None
+
+    def center(self) -> Dict[str, float]:
+        return {"lat": self.lat, "lng": self.lng}
+
+
+def _load_search_sites(db: Session, project_ids: List[int]) -> Dict[int, _SearchSite]:
+    """
+    Charge en une requete les projets et leurs coordonnees, puis en une seconde
+    les perimetres agglomeration (EPCI) de leurs communes.
+    Les projets inexistants ou sans coordonnees sont absents du resultat.
+    """
+    rows = (
+        db.query(Project, PropertyInfo)
+        .join(PropertyInfo, PropertyInfo.project_id == Project.id)
+        .filter(Project.id.in_(project_ids))
+        .all()
+    )
+    agglomerations = load_agglomerations(db, (property_info.insee_code for _, property_info in rows))
+
+    sites = {}
+    for project, property_info in rows:
+        if not property_info.latitude or not property_info.longitude:
+            continue
+
+        # Recuperer la ville du projet pour le perimetre agglomeration
+        project_city = None
+        if property_info.city:
+            project_city = property_info.city
+        elif project.address:
+            # Extraire la ville de l'adresse si possible
+            project_city = _extract_city_from_address(project.address)
+
+        agglomeration = agglomerations.get(property_info.insee_code)
+        sites[project.id] = _SearchSite(
+            project_id=project.id,
+            property_type=project.property_type.value,
+            lat=property_info.latitude,
+            lng=property_info.longitude,
+            city=project_city,
+            surface=property_info.total_surface,
+            construction_year=property_info.construction_year,
+            agglomeration_name=agglomeration.name if agglomeration else None,
+            agglomeration_codes=agglomeration.insee_codes if agglomeration else None,
+        )
+    return sites
+
+
+def _search_batch_chunk(
+    db: Optional[Session],
+    sites: List[_SearchSite],
+    params: ComparableSearchParams
+) -> List[_EngineResult]:
+    """
+    Resultats moteur d'un paquet de projets (meme ordre que sites).
+    Snapshot memoire si configure et a jour, sinon une requete LATERAL unique
+    chargeant les candidats de tous les projets. db None : session dediee.
+    """
+    engine = params.engine or settings.COMPARABLE_SEARCH_ENGINE
+    if engine == SEARCH_ENGINE_MEMORY:
+        results = [
+            _search_memory(site.property_type, site.lat, site.lng, site.city, params, site.agglomeration_codes)
+            for site in sites
+        ]
+        if all(result is not None for result in results):
+            return results
+        pool_index.refresh_in_background()
+
+    session = db or SessionLocal()
+    try:
+        rows = session.execute(build_batch_search_statement(sites, params)).all()
+    finally:
+        if db is None:
+            session.close()
+
+    candidates: Dict[int, List[Any]] = {site.project_id: [] for site in sites}
+    for row in rows:
+        candidates[row.project_id].append(row)
+    return [
+        _engine_result_from_pool(
+            candidates[site.project_id], site.lat, site.lng, site.city, params, site.agglomeration_codes
+        )
+        for site in sites
+    ]
+
+
+def build_batch_search_statement(sites: List[_SearchSite], params: ComparableSearchParams) -> Select:
     """
-    empty_result = {
-        "comparables": [], "stats": _empty_stats(),
+    Requete LATERAL du mode lot : pour chaque projet (table VALUES), les biens
+    du rayon max de son type, via l'index GIST de geog, plus ceux des communes
+    de son agglomeration (tableau de codes INSEE, vide si inconnu).
+    """
+    max_radius_km = max(params.distance_km, AGGLOMERATION_RADIUS_KM)
+    site_values = (
+        values(
+            column("project_id", Integer),
+            column("lat", Float),
+            column("lng", Float),
+            column("property_type", String),
+            column("agglomeration_codes", ARRAY(String)),
+            name="sites",
+        )
+        .data([
+            (site.project_id, site.lat, site.lng, site.property_type, list(site.agglomeration_codes or ()))
+            for site in sites
+        ])
+    )
+    center = cast(
+        func.ST_SetSRID(func.ST_MakePoint(site_values.c.lng, site_values.c.lat), 4326),
+        _GEOGRAPHY_POINT,
+    )
+    candidates = (
+        select(*[ComparablePool.__table__.c[name] for name in _POOL_RESPONSE_COLUMNS], ComparablePool.insee_code)
+        .where(
+            *_pool_filters(site_values.c.property_type, params),
+            or_(
+                func.ST_DWithin(ComparablePool.geog, center, max_radius_km * 1000),
+                ComparablePool.insee_code == any_(site_values.c.agglomeration_codes),
+            ),
+        )
+        .lateral("candidates")
+    )
+    return (
+        select(site_values.c.project_id, candidates)
+        .select_from(site_values.join(candidates, true()))
+    )
+
+
+def _empty_search_result() -> Dict[str, Any]:
+    """Resultat de recherche vide (projet introuvable ou sans coordonnees)."""
+    return {
+        "comparables": [], "clusters": [], "stats": _empty_stats(),
         "perimeter_stats": _empty_perimeter_stats(),
         "center": None
     }
 
-    # Recuperer le projet et ses infos
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        return empty_result
-
-    property_info = db.query(PropertyInfo).filter(
-        PropertyInfo.project_id == project_id
-    ).first()
 
-    if not property_info or not property_info.latitude or not property_info.longitude:
-        return empty_result
+def _search_response(result: _EngineResult, site: _SearchSite, params: ComparableSearchParams) -> Dict[str, Any]:
+    """
+    Met en forme le resultat d'un moteur (sans center) : stats, perimetres et,
+    en mode classement, les top_k biens les plus similaires au bien evalue.
+    """
+    comparables = result.comparables
+    if params.top_k:
+        comparables = _rank_comparables(comparables, site, params)
 
-    # Coordonnees du bien evalue
-    center_lat = property_info.latitude
-    center_lng = property_info.longitude
+    perimeter_stats = [
+        _perimeter_entry(
+            f"Agglomeration — {site.agglomeration_name or site.city or 'N/A'}", result.agglo_stats
+        ),
+        _perimeter_entry(f"Secteur — {SECTOR_RADIUS_KM:g} km", result.sector_stats),
+        _perimeter_entry(f"Proximite — {params.distance_km} km", result.stats),
+    ]
+    return {
+        "comparables": comparables,
+        "clusters": result.clusters,
+        "stats": result.stats,
+        "perimeter_stats": perimeter_stats,
+    }
 
-    # Rayon max pour couvrir les 3 perimetres (agglomeration = 15km)
-    max_radius_km = max(params.distance_km, 15.0)
-    max_distance_meters = max_radius_km * 1000
 
-    # Construire la requete de base avec filtre par type de bien (AUTOMATIQUE)
-    query = db.query(ComparablePool).filter(
-        ComparablePool.property_type == project.property_type.value
+def _rank_comparables(
+    comparables: List[Dict[str, Any]],
+    site: _SearchSite,
+    params: ComparableSearchParams
+) -> List[Dict[str, Any]]:
+    """
+    Classe les biens par score de similarite (noyau vectorise) et ne garde que
+    les top_k meilleurs, chacun annote de son score.
+    """
+    if not comparables:
+        return []
+
+    n = len(comparables)
+    weights = {**DEFAULT_RANK_WEIGHTS, **(params.rank_weights or {})}
+    scores = similarity_scores(
+        surface=np.fromiter((c["surface"] for c in comparables), dtype=np.float64, count=n),
+        year=np.fromiter(
+            (c["construction_year"] if c["construction_year"] is not None else np.nan for c in comparables),
+            dtype=np.float64, count=n,
+        ),
+        distance_km=np.fromiter((c["distance_km"] for c in comparables), dtype=np.float64, count=n),
+        transaction_day=to_day_array(
+            date.fromisoformat(c["transaction_date"]) if c["transaction_date"] else None
+            for c in comparables
+        ),
+        is_external=np.fromiter(
+            (c["source"] != ComparableSource.ARTHUR_LOYD.value for c in comparables), dtype=bool, count=n
+        ),
+        target_surface=site.surface,
+        target_year=site.construction_year,
+        max_distance_km=params.distance_km,
+        today_day=date.today().toordinal(),
+        weights=weights,
     )
+    return [
+        {**comparables[i], "score": round(float(scores[i]), 4)}
+        for i in top_k(scores, params.top_k)
+    ]
+
+
+def _pool_generation(property_type: str) -> int:
+    with _pool_generations_lock:
+        return _pool_generations.get(property_type, 0)
+
 
-    # Filtre spatial avec PostGIS — rayon max pour couvrir tous les perimetres
-    query = query.filter(
-        text("ST_DWithin(geom::geography, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography, :dist)")
-        .bindparams(lng=center_lng, lat=center_lat, dist=max_distance_meters)
+def _cache_search_result(key: Tuple, property_type: str, generation: int, result: Dict[str, Any]):
+    """Met le resultat en cache, sauf si le pool de ce type a ete ecrit pendant le calcul."""
+    with _pool_generations_lock:
+        if _pool_generations.get(property_type, 0) == generation:
+            search_cache.set(key, result)
+
+
+def _invalidate_search_cache(property_types: set):
+    """
+    Nouvelle generation puis invalidation : un calcul concurrent soit voit la
+    generation changer et ne met pas en cache, soit est invalide ensuite.
+    """
+    with _pool_generations_lock:
+        for property_type in property_types:
+            _pool_generations[property_type] = _pool_generations.get(property_type, 0) + 1
+    search_cache.invalidate(lambda key: key[0] in property_types)
+
+
+def _search_cache_key(site: _SearchSite, params: ComparableSearchParams) -> Tuple:
+    """
+    Cle du cache de recherche. Le type de bien est toujours en premiere position
+    (utilise par l'invalidation). Le centre est arrondi a ~10 m.
+    """
+    return (
+        site.property_type,
+        round(site.lat, SEARCH_CACHE_CENTER_PRECISION),
+        round(site.lng, SEARCH_CACHE_CENTER_PRECISION),
+        (site.city or "").lower(),
+        site.agglomeration_codes,
+        params.surface_min, params.surface_max,
+        params.year_min, params.year_max,
+        params.distance_km,
+        params.source or "all",
+        params.status or "all",
+        params.cluster_grid_deg(),
+        # Mode classement : cibles du bien evalue et poids
+        params.top_k,
+        (site.surface, site.construction_year) if params.top_k else None,
+        tuple(sorted((params.rank_weights or {}).items())),
     )
 
-    # Appliquer les filtres de surface
+
+def _pool_filters(property_type: str, params: ComparableSearchParams) -> List[Any]:
+    """
+    Construit les filtres attributaires communs a tous les moteurs de recherche
+    (type de bien, surface, annee de construction, source, statut).
+    """
+    filters = [ComparablePool.property_type == property_type]
+
+    # Filtres de surface
     if params.surface_min:
-        query = query.filter(ComparablePool.surface >= params.surface_min)
+        filters.append(ComparablePool.surface >= params.surface_min)
     if params.surface_max:
-        query = query.filter(ComparablePool.surface <= params.surface_max)
+        filters.append(ComparablePool.surface <= params.surface_max)
 
-    # Appliquer les filtres d'annee de construction
+    # Filtres d'annee de construction
     if params.year_min:
-        query = query.filter(ComparablePool.construction_year >= params.year_min)
+        filters.append(ComparablePool.construction_year >= params.year_min)
     if params.year_max:
-        query = query.filter(ComparablePool.construction_year <= params.year_max)
+        filters.append(ComparablePool.construction_year <= params.year_max)
 
-    # Appliquer le filtre de source
+    # Filtre de source
     if params.source and params.source != "all":
         if params.source == "arthur_loyd":
-            query = query.filter(ComparablePool.source == ComparableSource.ARTHUR_LOYD)
+            filters.append(ComparablePool.source == ComparableSource.ARTHUR_LOYD)
         elif params.source == "concurrence":
-            query = query.filter(ComparablePool.source == ComparableSource.CONCURRENCE)
+            filters.append(ComparablePool.source == ComparableSource.CONCURRENCE)
 
-    # Appliquer le filtre de statut
+    # Filtre de statut
     if params.status and params.status != "all":
-        query = query.filter(ComparablePool.status == params.status)
+        filters.append(ComparablePool.status == params.status)
+
+    return filters
 
-    # Executer la requete
-    all_comparables = query.all()
 
-    # Calculer la distance pour chaque comparable et construire les dicts
-    comparables_with_distance = []
-    for comp in all_comparables:
-        dist_km = calculate_distance(
-            center_lat, center_lng,
-            comp.latitude, comp.longitude
+def _pool_item_to_dict(comp: Any, distance_km: float) -> Dict[str, Any]:
+    """Serialise un comparable du pool (objet ORM ou ligne SQL) pour la reponse API."""
+    return {
+        "id": comp.id,
+        "address": comp.address,
+        "postal_code": comp.postal_code,
+        "city": comp.city,
+        "latitude": comp.latitude,
+        "longitude": comp.longitude,
+        "property_type": comp.property_type,
+        "surface": comp.surface,
+        "construction_year": comp.construction_year,
+        "transaction_type": comp.transaction_type.value if hasattr(comp.transaction_type, 'value') else comp.transaction_type,
+        "price": comp.price,
+        "price_per_m2": comp.price_per_m2,
+        "transaction_date": comp.transaction_date.isoformat() if comp.transaction_date else None,
+        "source": comp.source.value if hasattr(comp.source, 'value') else comp.source,
+        "source_reference": comp.source_reference,
+        "photo_url": comp.photo_url,
+        "status": comp.status if isinstance(comp.status, str) else (comp.status.value if hasattr(comp.status, 'value') else "transaction"),
+        "distance_km": round(distance_km, 2)
+    }
+
+
+def _perimeter_entry(label: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Construit l'entree de reponse d'un perimetre a partir de ses stats."""
+    return {
+        "label": label,
+        "avg_rent_per_m2": stats["avg_rent_per_m2"],
+        "avg_sale_per_m2": stats["avg_sale_per_m2"],
+        "total_count": stats["total_count"],
+        "rent_distribution": stats["rent_distribution"],
+        "sale_distribution": stats["sale_distribution"],
+    }
+
+
+def _search_python(
+    db: Session,
+    property_type: str,
+    center_lat: float,
+    center_lng: float,
+    project_city: Optional[str],
+    params: ComparableSearchParams,
+    agglomeration_codes: Optional[Sequence[str]] = None
+) -> _EngineResult:
+    """
+    Moteur historique : charge tous les biens du rayon agglomeration en ORM
+    puis calcule distances et statistiques en Python.
+    """
+    # Rayon max pour couvrir les 3 perimetres (agglomeration = 15km)
+    max_radius_km = max(params.distance_km, AGGLOMERATION_RADIUS_KM)
+    max_distance_meters = max_radius_km * 1000
+
+    query = db.query(ComparablePool).filter(*_pool_filters(property_type, params))
+
+    # Filtre spatial avec PostGIS — rayon max pour couvrir tous les perimetres,
+    # plus les communes de l'agglomeration (index sur insee_code)
+    query = query.filter(_spatial_filter(
+        func.ST_DWithin(ComparablePool.geog, _geography_point(center_lat, center_lng), max_distance_meters),
+        agglomeration_codes,
+    ))
+
+    return _engine_result_from_pool(
+        query.all(), center_lat, center_lng, project_city, params, agglomeration_codes
+    )
+
+
+def _engine_result_from_pool(
+    all_comparables: List[Any],
+    center_lat: float,
+    center_lng: float,
+    project_city: Optional[str],
+    params: ComparableSearchParams,
+    agglomeration_codes: Optional[Sequence[str]] = None
+) -> _EngineResult:
+    """
+    Distances, statistiques des 3 perimetres et clusters (noyau vectorise) a
+    partir des biens du rayon max charges en base (objets ORM ou lignes SQL).
+    """
+    # Distances et statistiques vectorisees sur l'ensemble des biens charges
+    arrays = comparable_arrays(all_comparables)
+    distances = haversine_km(center_lat, center_lng, arrays["lat"], arrays["lng"])
+    if agglomeration_codes is not None:
+        codes = set(agglomeration_codes)
+        in_agglo = np.fromiter(
+            (c.insee_code in codes for c in all_comparables), dtype=bool, count=len(all_comparables)
         )
-        comp._calc_distance_km = dist_km  # stocker temporairement pour les stats
-        comp_dict = {
-            "id": comp.id,
-            "address": comp.address,
-            "postal_code": comp.postal_code,
-            "city": comp.city,
-            "latitude": comp.latitude,
-            "longitude": comp.longitude,
-            "property_type": comp.property_type,
-            "surface": comp.surface,
-            "construction_year": comp.construction_year,
-            "transaction_type": comp.transaction_type.value if hasattr(comp.transaction_type, 'value') else comp.transaction_type,
-            "price": comp.price,
-            "price_per_m2": comp.price_per_m2,
-            "transaction_date": comp.transaction_date.isoformat() if comp.transaction_date else None,
-            "source": comp.source.value if hasattr(comp.source, 'value') else comp.source,
-            "source_reference": comp.source_reference,
-            "photo_url": comp.photo_url,
-            "status": comp.status if isinstance(comp.status, str) else (comp.status.value if hasattr(comp.status, 'value') else "transaction"),
-            "distance_km": round(dist_km, 2)
-        }
-        comparables_with_distance.append(comp_dict)
-
-    # Filtrer pour la carte : uniquement les biens dans le rayon utilisateur
-    filtered_comparables = [
-        c for c in comparables_with_distance if c["distance_km"] <= params.distance_km
+    else:
+        city = project_city.lower() if project_city else None
+        in_agglo = np.fromiter(
+            (bool(c.city) and city is not None and c.city.lower() == city for c in all_comparables),
+            dtype=bool, count=len(all_comparables),
+        )
+    stats, agglo_stats, sector_stats = perimeter_price_stats(
+        arrays["is_rent"], arrays["price_per_m2"], arrays["transaction_day"],
+        np.vstack([
+            distances <= params.distance_km,      # Proximite : rayon utilisateur
+            in_agglo,                             # Agglomeration : communes de l'EPCI (ou meme ville)
+            distances <= SECTOR_RADIUS_KM,        # Secteur : rayon 5km
+        ]),
+    )
+
+    # Uniquement les biens dans le rayon utilisateur pour la carte, tries par distance
+    in_radius = np.flatnonzero(distances <= params.distance_km)
+    in_radius = in_radius[np.argsort(distances[in_radius], kind="stable")]
+    clusters, isolated = _cluster_points(
+        arrays["lat"][in_radius], arrays["lng"][in_radius],
+        arrays["is_rent"][in_radius], arrays["price_per_m2"][in_radius], params,
+    )
+    comparables = [
+        _pool_item_to_dict(all_comparables[i], float(distances[i]))
+        for i in in_radius[isolated]
     ]
 
-    # Calculer les stats globales (sur les biens filtres par distance utilisateur)
-    filtered_pool = [c for c in all_comparables if c._calc_distance_km <= params.distance_km]
-    stats = calculate_stats(filtered_pool)
+    return _EngineResult(comparables, stats, agglo_stats, sector_stats, clusters)
 
-    # Calculer les stats par perimetre
-    # Recuperer la ville du projet pour le perimetre agglomeration
-    project_city = None
-    if property_info and hasattr(property_info, 'city') and property_info.city:
-        project_city = property_info.city
-    elif project.address:
-        # Extraire la ville de l'adresse si possible
-        project_city = _extract_city_from_address(project.address)
 
-    # Agglomeration : meme ville
-    agglo_comps = [c for c in all_comparables if c.city and project_city and c.city.lower() == project_city.lower()]
-    agglo_stats = calculate_stats(agglo_comps)
+def _search_postgis(
+    db: Session,
+    property_type: str,
+    center_lat: float,
+    center_lng: float,
+    project_city: Optional[str],
+    params: ComparableSearchParams,
+    agglomeration_codes: Optional[Sequence[str]] = None
+) -> _EngineResult:
+    """
+    Moteur PostGIS : une seule requete calcule les distances (ST_Distance),
+    les agregats des 3 perimetres (agregats FILTER), les clusters eventuels
+    (ST_SnapToGrid) et ne renvoie que les biens situes dans le rayon utilisateur.
+    """
+    stmt = build_postgis_search_statement(
+        property_type, center_lat, center_lng, project_city, params, agglomeration_codes
+    )
+    rows = db.execute(stmt).all()
 
-    # Secteur : rayon 5km
-    sector_comps = [c for c in all_comparables if c._calc_distance_km <= 5.0]
-    sector_stats = calculate_stats(sector_comps)
+    comparables = [
+        _pool_item_to_dict(row, row.distance_km)
+        for row in rows if row.id is not None
+    ]
+    head = rows[0]._mapping if rows else {}
+    return _EngineResult(
+        comparables,
+        _stats_from_aggregates(head, "radius"),
+        _stats_from_aggregates(head, "agglo"),
+        _stats_from_aggregates(head, "sector"),
+        [_cluster_from_row(cluster) for cluster in head.get("clusters") or []],
+    )
 
-    # Proximite : rayon du filtre distance utilisateur
-    proximity_comps = filtered_pool
-    proximity_stats = calculate_stats(proximity_comps)
 
-    perimeter_stats = [
-        {
-            "label": f"Agglomeration — {project_city or 'N/A'}",
-            "avg_rent_per_m2": agglo_stats["avg_rent_per_m2"],
-            "avg_sale_per_m2": agglo_stats["avg_sale_per_m2"],
-            "total_count": agglo_stats["total_count"]
-        },
-        {
-            "label": "Secteur — 5 km",
-            "avg_rent_per_m2": sector_stats["avg_rent_per_m2"],
-            "avg_sale_per_m2": sector_stats["avg_sale_per_m2"],
-            "total_count": sector_stats["total_count"]
-        },
-        {
-            "label": f"Proximite — {params.distance_km} km",
-            "avg_rent_per_m2": proximity_stats["avg_rent_per_m2"],
-            "avg_sale_per_m2": proximity_stats["avg_sale_per_m2"],
-            "total_count": proximity_stats["total_count"]
-        }
+def _search_memory(
+    property_type: str,
+    center_lat: float,
+    center_lng: float,
+    project_city: Optional[str],
+    params: ComparableSearchParams,
+    agglomeration_codes: Optional[Sequence[str]] = None
+) -> Optional[_EngineResult]:
+    """
+    Moteur memoire : recherche dans le snapshot NumPy du pool (index grille).
+    Retourne None si le snapshot est perime ou non charge.
+    """
+    max_radius_km = max(params.distance_km, AGGLOMERATION_RADIUS_KM)
+    hits = pool_index.query(
+        property_type, center_lat, center_lng, max_radius_km, params, agglomeration_codes
+    )
+    if hits is None:
+        return None
+
+    in_radius = hits.distance_km <= params.distance_km
+    if hits.in_agglomeration is not None:
+        in_agglo = hits.in_agglomeration
+    else:
+        city = project_city.lower() if project_city else None
+        in_agglo = np.array([c is not None and c == city for c in hits.city], dtype=bool)
+
+    stats, agglo_stats, sector_stats = perimeter_price_stats(
+        hits.is_rent, hits.price_per_m2, hits.transaction_day,
+        np.vstack([in_radius, in_agglo, hits.distance_km <= SECTOR_RADIUS_KM]),
+    )
+    # Les hits sont tries par distance : le rayon utilisateur en est un prefixe
+    radius_count = int(in_radius.sum())
+    clusters, isolated = _cluster_points(
+        hits.lat[:radius_count], hits.lng[:radius_count],
+        hits.is_rent[:radius_count], hits.price_per_m2[:radius_count], params,
+    )
+    shown = np.zeros(len(in_radius), dtype=bool)
+    shown[:radius_count] = isolated
+    return _EngineResult(hits.to_dicts(shown), stats, agglo_stats, sector_stats, clusters)
+
+
+def _cluster_points(
+    lat: np.ndarray,
+    lng: np.ndarray,
+    is_rent: np.ndarray,
+    price_per_m2: np.ndarray,
+    params: ComparableSearchParams
+) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Clusters des biens du rayon utilisateur (moteurs python et memoire) et
+    masque des biens a detailler. Sans mode clusters, tous les biens sont detailles.
+    """
+    grid_deg = params.cluster_grid_deg()
+    if grid_deg is None:
+        return [], np.ones(len(lat), dtype=bool)
+    return grid_clusters(
+        lat, lng, is_rent, price_per_m2, grid_deg, settings.COMPARABLE_CLUSTER_MIN_POINTS
+    )
+
+
+def build_postgis_search_statement(
+    property_type: str,
+    center_lat: float,
+    center_lng: float,
+    project_city: Optional[str],
+    params: ComparableSearchParams,
+    agglomeration_codes: Optional[Sequence[str]] = None
+) -> Select:
+    """
+    Construit la requete unique du moteur PostGIS.
+    Le predicat spatial porte sur la colonne geography indexee (geog) pour que
+    le planificateur utilise idx_comparable_pool_geog (verifiable via EXPLAIN).
+    Avec agglomeration_codes, les biens des communes de l'agglomeration sont
+    ajoutes aux candidats (index insee_code) quelle que soit leur distance.
+    En mode clusters, les biens du rayon sont regroupes par cellule
+    ST_SnapToGrid : les cellules assez peuplees sont renvoyees agregees dans la
+    colonne JSON clusters et leurs biens ne sont plus detailles.
+    """
+    max_radius_km = max(params.distance_km, AGGLOMERATION_RADIUS_KM)
+    center = _geography_point(center_lat, center_lng)
+    grid_deg = params.cluster_grid_deg()
+
+    cell_columns = []
+    if grid_deg is not None:
+        cell = func.ST_SnapToGrid(ComparablePool.geom, grid_deg)
+        cell_columns = [func.ST_X(cell).label("cell_x"), func.ST_Y(cell).label("cell_y")]
+
+    agglo_columns = []
+    if agglomeration_codes is not None:
+        agglo_columns = [
+            func.coalesce(ComparablePool.insee_code.in_(agglomeration_codes), false()).label("in_agglomeration")
+        ]
+
+    # Candidats : tous les biens du rayon max avec leur distance calculee en base
+    candidates = (
+        select(
+            *[ComparablePool.__table__.c[name] for name in _POOL_RESPONSE_COLUMNS],
+            (func.ST_Distance(ComparablePool.geog, center) / 1000.0).label("distance_km"),
+            *cell_columns,
+            *agglo_columns,
+        )
+        .where(
+            *_pool_filters(property_type, params),
+            _spatial_filter(
+                func.ST_DWithin(ComparablePool.geog, center, max_radius_km * 1000),
+                agglomeration_codes,
+            ),
+        )
+        .cte("candidates")
+    )
+    c = candidates.c
+
+    in_radius = c.distance_km <= params.distance_km
+    in_sector = c.distance_km <= SECTOR_RADIUS_KM
+    if agglomeration_codes is not None:
+        in_agglo = c.in_agglomeration
+    else:
+        in_agglo = func.lower(c.city) == project_city.lower() if project_city else false()
+
+    perimeters = [(in_radius, "radius"), (in_sector, "sector"), (in_agglo, "agglo")]
+    perimeter_columns = [
+        column
+        for condition, prefix in perimeters
+        for column in _perimeter_aggregates(c, condition, prefix, detailed=prefix == "radius")
     ]
+    points = candidates
+    shown = in_radius
+
+    if grid_deg is not None:
+        min_points = settings.COMPARABLE_CLUSTER_MIN_POINTS
+        cells = _cluster_cells(c, in_radius)
+        perimeter_columns.append(
+            select(
+                func.json_agg(
+                    aggregate_order_by(
+                        func.json_build_object(*[
+                            part for name in _CLUSTER_FIELDS for part in (name, cells.c[name])
+                        ]),
+                        cells.c["count"].desc(),
+                    )
+                )
+            )
+            .where(cells.c["count"] >= min_points)
+            .scalar_subquery()
+            .label("clusters")
+        )
+        # Seuls les biens des cellules peu peuplees restent detailles
+        points = candidates.join(cells, and_(cells.c.cell_x == c.cell_x, cells.c.cell_y == c.cell_y))
+        shown = and_(in_radius, cells.c["count"] < min_points)
+
+    aggregates = select(*perimeter_columns).select_from(candidates).cte("aggregates")
+
+    # Moyennes tronquees : bornes P10/P90 issues des agregats
+    trimmed = (
+        select(*[
+            column
+            for condition, prefix in perimeters
+            for column in _trimmed_means(c, aggregates.c, condition, prefix)
+        ])
+        .select_from(candidates.join(aggregates, true()))
+        .cte("trimmed")
+    )
 
+    # Une ligne par bien du rayon utilisateur, agregats repetes ;
+    # une seule ligne (colonnes bien a NULL) si aucun bien ne correspond.
+    return (
+        select(candidates, aggregates, trimmed)
+        .select_from(aggregates.join(trimmed, true()).outerjoin(points, shown))
+        .order_by(c.distance_km)
+    )
+
+
+# Champs d'un cluster (colonnes de la CTE cells et cles JSON)
+_CLUSTER_FIELDS = (
+    "latitude", "longitude", "count", "avg_price_per_m2",
+    "rent_count", "avg_rent_per_m2", "sale_count", "avg_sale_per_m2",
+)
+
+
+def _cluster_cells(c: Any, in_radius: Any) -> Any:
+    """CTE des cellules de grille du rayon utilisateur : centroide, effectif et prix moyens."""
+    is_rent = c.transaction_type == TransactionType.RENT
+    is_sale = c.transaction_type == TransactionType.SALE
+    return (
+        select(
+            c.cell_x,
+            c.cell_y,
+            func.avg(c.latitude).label("latitude"),
+            func.avg(c.longitude).label("longitude"),
+            func.count().label("count"),
+            func.avg(c.price_per_m2).label("avg_price_per_m2"),
+            func.count().filter(is_rent).label("rent_count"),
+            func.avg(c.price_per_m2).filter(is_rent).label("avg_rent_per_m2"),
+            func.count().filter(is_sale).label("sale_count"),
+            func.avg(c.price_per_m2).filter(is_sale).label("avg_sale_per_m2"),
+        )
+        .where(in_radius)
+        .group_by(c.cell_x, c.cell_y)
+        .cte("cells")
+    )
+
+
+def _cluster_from_row(cluster: Dict[str, Any]) -> Dict[str, Any]:
+    """Arrondit les moyennes d'un cluster renvoye par PostGIS (format de grid_clusters)."""
     return {
-        "comparables": filtered_comparables,
-        "stats": stats,
-        "perimeter_stats": perimeter_stats,
-        "center": {"lat": center_lat, "lng": center_lng}
+        **cluster,
+        **{
+            name: round(float(cluster[name]), 2) if cluster[name] is not None else None
+            for name in ("avg_price_per_m2", "avg_rent_per_m2", "avg_sale_per_m2")
+        },
     }
 
 
+def _spatial_filter(within_radius: Any, agglomeration_codes: Optional[Sequence[str]]) -> Any:
+    """Predicat spatial des candidats : rayon max, ou communes de l'agglomeration si connues."""
+    if agglomeration_codes is None:
+        return within_radius
+    return or_(within_radius, ComparablePool.insee_code.in_(agglomeration_codes))
+
+
+def _geography_point(lat: float, lng: float) -> Any:
+    """Point geography (WGS84) pour les predicats ST_DWithin/ST_Distance sur geog."""
+    return cast(func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326), _GEOGRAPHY_POINT)
+
+
+def _perimeter_aggregates(c: Any, condition: Any, prefix: str, detailed: bool = False) -> List[Any]:
+    """
+    Agregats FILTER d'un perimetre : moyennes, comptages, quantiles
+    (percentile_cont) et ecarts-types location/vente, plus la derniere vente si detailed.
+    """
+    is_rent = and_(condition, c.transaction_type == TransactionType.RENT)
+    is_sale = and_(condition, c.transaction_type == TransactionType.SALE)
+    quantiles = type_coerce(array([q for _, q in DISTRIBUTION_QUANTILES]), ARRAY(Float))
+    columns = [
+        func.avg(c.price_per_m2).filter(is_rent).label(f"{prefix}_avg_rent"),
+        func.count().filter(is_rent).label(f"{prefix}_rent_count"),
+        func.avg(c.price_per_m2).filter(is_sale).label(f"{prefix}_avg_sale"),
+        func.count().filter(is_sale).label(f"{prefix}_sale_count"),
+        func.count().filter(condition).label(f"{prefix}_total_count"),
+    ]
+    for kind, is_kind in (("rent", is_rent), ("sale", is_sale)):
+        columns += [
+            type_coerce(
+                func.percentile_cont(quantiles).within_group(c.price_per_m2).filter(is_kind),
+                ARRAY(Float),
+            ).label(f"{prefix}_{kind}_quantiles"),
+            func.stddev_samp(c.price_per_m2).filter(is_kind).label(f"{prefix}_{kind}_stddev"),
+        ]
+    if detailed:
+        latest_sales = type_coerce(
+            func.array_agg(
+                aggregate_order_by(c.price_per_m2, c.transaction_date.desc())
+            ).filter(is_sale),
+            ARRAY(Float),
+        )
+        columns += [
+            latest_sales[1].label(f"{prefix}_latest_sale"),
+            func.max(c.transaction_date).filter(is_sale).label(f"{prefix}_latest_sale_date"),
+        ]
+    return columns
+
+
+def _trimmed_means(c: Any, agg: Any, condition: Any, prefix: str) -> List[Any]:
+    """Moyennes location/vente d'un perimetre restreintes aux prix compris entre P10 et P90."""
+    columns = []
+    for kind, transaction_type in (("rent", TransactionType.RENT), ("sale", TransactionType.SALE)):
+        bounds = agg[f"{prefix}_{kind}_quantiles"]
+        kept = and_(
+            condition,
+            c.transaction_type == transaction_type,
+            c.price_per_m2.between(bounds[1], bounds[len(DISTRIBUTION_QUANTILES)]),
+        )
+        columns.append(func.avg(c.price_per_m2).filter(kept).label(f"{prefix}_{kind}_trimmed_mean"))
+    return columns
+
+
+def _distribution_from_aggregates(row: Any, prefix: str) -> Dict[str, Optional[float]]:
+    """Distribution de prix (format de price_distribution) a partir des agregats SQL."""
+    distribution = empty_distribution()
+    quantiles = row[f"{prefix}_quantiles"]
+    if quantiles:
+        for (name, _), value in zip(DISTRIBUTION_QUANTILES, quantiles):
+            distribution[name] = round(float(value), 2)
+    for name in ("stddev", "trimmed_mean"):
+        value = row[f"{prefix}_{name}"]
+        if value is not None:
+            distribution[name] = round(float(value), 2)
+    return distribution
+
+
+def _stats_from_aggregates(row: Any, prefix: str) -> Dict[str, Any]:
+    """Convertit les agregats SQL d'un perimetre au format de calculate_stats."""
+    stats = _empty_stats()
+    if not row:
+        return stats
+
+    avg_rent = row[f"{prefix}_avg_rent"]
+    avg_sale = row[f"{prefix}_avg_sale"]
+    stats.update({
+        "avg_rent_per_m2": round(float(avg_rent), 2) if avg_rent is not None else None,
+        "rent_count": row[f"{prefix}_rent_count"],
+        "avg_sale_per_m2": round(float(avg_sale), 2) if avg_sale is not None else None,
+        "sale_count": row[f"{prefix}_sale_count"],
+        "total_count": row[f"{prefix}_total_count"],
+        "rent_distribution": _distribution_from_aggregates(row, f"{prefix}_rent"),
+        "sale_distribution": _distribution_from_aggregates(row, f"{prefix}_sale"),
+    })
+
+    latest_date = row.get(f"{prefix}_latest_sale_date")
+    if latest_date:
+        stats["latest_sale_per_m2"] = row[f"{prefix}_latest_sale"]
+        stats["latest_sale_date"] = latest_date.isoformat()
+
+    return stats
+
+
 def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """
     Calcule la distance en km entre deux points (formule de Haversine simplifiee).
+    Pour plusieurs points, utiliser comparable_stats.haversine_km (vectorise).
     """
-    from math import radians, sin, cos, sqrt, atan2
-
     R = 6371  # Rayon de la Terre en km
 
     lat1_rad = radians(lat1)
@@ -278,37 +1020,10 @@ def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> fl
 
 def calculate_stats(comparables: List[ComparablePool]) -> Dict[str, Any]:
     """
-    Calcule les statistiques de prix des comparables.
+    Calcule les statistiques de prix des comparables (noyau vectorise).
     """
-    rentals = [c for c in comparables if c.transaction_type == TransactionType.RENT]
-    sales = [c for c in comparables if c.transaction_type == TransactionType.SALE]
-
-    stats = {
-        "avg_rent_per_m2": None,
-        "rent_count": len(rentals),
-        "avg_sale_per_m2": None,
-        "sale_count": len(sales),
-        "latest_sale_per_m2": None,
-        "latest_sale_date": None,
-        "total_count": len(comparables)
-    }
-
-    if rentals:
-        stats["avg_rent_per_m2"] = round(
-            sum(c.price_per_m2 for c in rentals) / len(rentals), 2
-        )
-
-    if sales:
-        stats["avg_sale_per_m2"] = round(
-            sum(c.price_per_m2 for c in sales) / len(sales), 2
-        )
-        # Trouver la vente la plus recente
-        latest_sale = max(sales, key=lambda x: x.transaction_date or date.min)
-        if latest_sale.transaction_date:
-            stats["latest_sale_per_m2"] = latest_sale.price_per_m2
-            stats["latest_sale_date"] = latest_sale.transaction_date.isoformat()
-
-    return stats
+    arrays = comparable_arrays(comparables)
+    return price_stats(arrays["is_rent"], arrays["price_per_m2"], arrays["transaction_day"])
 
 
 def _empty_stats() -> Dict[str, Any]:
@@ -320,7 +1035,9 @@ def _empty_stats() -> Dict[str, Any]:
         "sale_count": 0,
         "latest_sale_per_m2": None,
         "latest_sale_date": None,
-        "total_count": 0
+        "total_count": 0,
+        "rent_distribution": empty_distribution(),
+        "sale_distribution": empty_distribution(),
     }
 
 
@@ -356,11 +1073,13 @@ def quick_add_comparable(
     address: str,
     surface: float,
     price: float,
-    construction_year: Optional[int] = None
+    construction_year: Optional[int] = None,
+    coords: Optional[Tuple[float, float]] = None
 ) -> Optional[ComparablePool]:
     """
     Ajout rapide d'un bien comparable au pool.
-    Geocode l'adresse, cree un ComparablePool avec source Arthur Loyd.
+    Geocode l'adresse (sauf si coords est fourni, ex. geocodage async deja fait),
+    cree un ComparablePool avec source Arthur Loyd.
 
     Returns:
         Le ComparablePool cree ou None si geocodage echoue
@@ -371,7 +1090,8 @@ def quick_add_comparable(
         return None
 
     # Geocoder l'adresse
-    coords = geocode_address(address)
+    if coords is None:
+        coords = geocode_address(address)
     if not coords:
         return None
 
@@ -383,7 +1103,7 @@ def quick_add_comparable(
         address=address,
         latitude=lat,
         longitude=lng,
-        geom=func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326),
+        insee_code=locate_insee_code(db, lat, lng),
         property_type=project.property_type.value,
         surface=surface,
         construction_year=construction_year,
@@ -398,10 +1118,34 @@ def quick_add_comparable(
     db.add(new_comparable)
     db.commit()
     db.refresh(new_comparable)
+    notify_pool_write([new_comparable])
 
     return new_comparable
 
 
+def notify_pool_write(items: List[ComparablePool], previous: Sequence[Any] = ()) -> None:
+    """
+    Propage les insertions/mises a jour de comparable_pool aux structures derivees
+    du processus (snapshot memoire, cache de recherche, tuiles vectorielles).
+    previous : property_type, latitude et longitude des biens mis a jour avant
+    l'ecriture (biens deplaces : tuiles de l'ancienne position invalidees aussi).
+    A appeler apres le commit de toute ecriture du pool.
+    """
+    pool_index.apply(items)
+    _invalidate_search_cache({item.property_type for item in [*items, *previous]})
+    invalidate_tiles([*items, *previous])
+
+
+def notify_pool_delete(items: List[Any]) -> None:
+    """
+    Pendant de notify_pool_write pour les suppressions : items porte id,
+    property_type, latitude et longitude des biens supprimes (apres commit).
+    """
+    pool_index.remove(item.id for item in items)
+    _invalidate_search_cache({item.property_type for item in items})
+    invalidate_tiles(items)
+
+
 def get_selected_comparables(db: Session, project_id: int) -> List[Comparable]:
     """
     Recupere les comparables selectionnes pour un projet.
@@ -433,64 +1177,96 @@ def select_comparable_from_pool(
     Returns:
         Le Comparable cree ou None si erreur
     """
-    # Recuperer le comparable du pool
-    pool_item = db.query(ComparablePool).filter(
-        ComparablePool.id == pool_id
-    ).first()
+    selected = select_comparables_from_pool(db, project_id, [pool_id], adjustment, notes)
+    return selected[0] if selected else None
 
-    if not pool_item:
-        return None
 
-    # Verifier si ce comparable n'est pas deja selectionne
-    existing = db.query(Comparable).filter(
-        Comparable.project_id == project_id,
-        Comparable.source_reference == str(pool_id)
-    ).first()
+def select_comparables_from_pool(
+    db: Session,
+    project_id: int,
+    pool_ids: List[int],
+    adjustment: float = 0.0,
+    notes: Optional[str] = None
+) -> List[Comparable]:
+    """
+    Selectionne plusieurs comparables du pool pour un projet (ex : top_k du
+    mode classement) en un seul aller-retour et un seul commit.
+    Les IDs absents du pool sont ignores ; les biens deja selectionnes sont
+    renvoyes tels quels.
 
-    if existing:
-        return existing
+    Args:
+        db: Session de base de donnees
+        project_id: ID du projet
+        pool_ids: IDs des comparables dans le pool
+        adjustment: Ajustement en pourcentage (applique a chaque bien)
+        notes: Notes de validation
 
-    # Calculer le prix ajuste
-    adjusted_price = pool_item.price_per_m2 * (1 + adjustment / 100)
+    Returns:
+        Les Comparable selectionnes, dans l'ordre de pool_ids
+    """
+    pool_ids = list(dict.fromkeys(pool_ids))
+    pool_items = {
+        item.id: item
+        for item in db.query(ComparablePool).filter(ComparablePool.id.in_(pool_ids)).all()
+    }
+    if not pool_items:
+        return []
+
+    # Comparables deja selectionnes pour ce projet
+    existing = {
+        comparable.source_reference: comparable
+        for comparable in db.query(Comparable).filter(
+            Comparable.project_id == project_id,
+            Comparable.source_reference.in_([str(pool_id) for pool_id in pool_items])
+        ).all()
+    }
 
-    # Calculer la distance par rapport au bien evalue
-    distance_km = None
     property_info = db.query(PropertyInfo).filter(
         PropertyInfo.project_id == project_id
     ).first()
-    if property_info and property_info.latitude and property_info.longitude:
-        distance_km = round(calculate_distance(
-            property_info.latitude, property_info.longitude,
-            pool_item.latitude, pool_item.longitude
-        ), 2)
 
-    # Creer le comparable
-    comparable = Comparable(
-        project_id=project_id,
-        address=pool_item.address,
-        postal_code=pool_item.postal_code,
-        city=pool_item.city,
-        surface=pool_item.surface,
-        price=pool_item.price,
-        price_per_m2=pool_item.price_per_m2,
-        latitude=pool_item.latitude,
-        longitude=pool_item.longitude,
-        transaction_date=pool_item.transaction_date,
-        construction_year=pool_item.construction_year,
-        distance=distance_km,
-        adjustment=adjustment,
-        adjusted_price_per_m2=round(adjusted_price, 2),
-        validated=True,
-        validation_notes=notes,
-        source=pool_item.source.value,
-        source_reference=str(pool_item.id)
-    )
+    # Distances par rapport au bien evalue (vectorisees)
+    new_items = [pool_items[pool_id] for pool_id in pool_ids if pool_id in pool_items and str(pool_id) not in existing]
+    distances = [None] * len(new_items)
+    if new_items and property_info and property_info.latitude and property_info.longitude:
+        arrays = comparable_arrays(new_items)
+        distances = np.round(haversine_km(
+            property_info.latitude, property_info.longitude, arrays["lat"], arrays["lng"]
+        ), 2).tolist()
+
+    for pool_item, distance_km in zip(new_items, distances):
+        # Calculer le prix ajuste
+        adjusted_price = pool_item.price_per_m2 * (1 + adjustment / 100)
+
+        comparable = Comparable(
+            project_id=project_id,
+            address=pool_item.address,
+            postal_code=pool_item.postal_code,
+            city=pool_item.city,
+            surface=pool_item.surface,
+            price=pool_item.price,
+            price_per_m2=pool_item.price_per_m2,
+            latitude=pool_item.latitude,
+            longitude=pool_item.longitude,
+            transaction_date=pool_item.transaction_date,
+            construction_year=pool_item.construction_year,
+            distance=distance_km,
+            adjustment=adjustment,
+            adjusted_price_per_m2=round(adjusted_price, 2),
+            validated=True,
+            validation_notes=notes,
+            source=pool_item.source.value,
+            source_reference=str(pool_item.id)
+        )
+        db.add(comparable)
+        existing[comparable.source_reference] = comparable
 
-    db.add(comparable)
-    db.commit()
-    db.refresh(comparable)
+    if new_items:
+        db.commit()
+        for pool_item in new_items:
+            db.refresh(existing[str(pool_item.id)])
 
-    return comparable
+    return [existing[str(pool_id)] for pool_id in pool_ids if str(pool_id) in existing]
 
 
 def deselect_comparable(db: Session, project_id: int, comparable_id: int) -> bool:
@@ -0,0 +1,280 @@
+"""
+Noyau vectorise (NumPy) de calcul des distances et statistiques de prix des comparables
+Utilise par les moteurs de recherche, la selection de comparables et les traitements par lot.
+"""
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Valeur sentinelle des jours ordinaux pour les lignes exclues du calcul de la derniere vente
+_NO_DAY = np.iinfo(np.int64).min
+
+# Quantiles des distributions de prix (interpolation lineaire, comme percentile_cont)
+DISTRIBUTION_QUANTILES = (("p10", 0.10), ("p25", 0.25), ("median", 0.50), ("p75", 0.75), ("p90", 0.90))
+# La moyenne tronquee ne garde que les prix compris entre P10 et P90
+DISTRIBUTION_FIELDS = tuple(name for name, _ in DISTRIBUTION_QUANTILES) + ("stddev", "trimmed_mean")
+
+
+def haversine_km(lat: Any, lng: Any, lats: Any, lngs: Any) -> np.ndarray:
+    """
+    Distance Haversine (km) entre un point (ou un tableau de points) et un tableau de points.
+    Accepte des scalaires ou des tableaux NumPy (broadcasting).
+    """
+    lat_rad = np.radians(lat)
+    lats_rad = np.radians(lats)
+    a = (
+        np.sin((lats_rad - lat_rad) / 2) ** 2
+        + np.cos(lat_rad) * np.cos(lats_rad) * np.sin(np.radians(np.subtract(lngs, lng)) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def to_day_array(dates: Iterable[Optional[date]]) -> np.ndarray:
+    """Convertit des dates en jours ordinaux (date.toordinal), sentinelle si absente."""
+    return np.fromiter(
+        (d.toordinal() if d else _NO_DAY for d in dates), dtype=np.int64
+    )
+
+
+def perimeter_price_stats(
+    is_rent: np.ndarray,
+    price_per_m2: np.ndarray,
+    transaction_day: np.ndarray,
+    masks: np.ndarray
+) -> List[Dict[str, Any]]:
+    """
+    Statistiques de prix de plusieurs perimetres en une seule passe vectorisee.
+
+    Args:
+        is_rent: True pour une location, False pour une vente (N)
+        price_per_m2: Prix au m2 (N)
+        transaction_day: Date de transaction en jours ordinaux (N)
+        masks: Appartenance de chaque bien a chaque perimetre (P x N ou N)
+
+    Returns:
+        Une entree par perimetre, au format de calculate_stats (moyennes,
+        comptages, derniere vente et distributions location/vente)
+    """
+    masks = np.atleast_2d(np.asarray(masks, dtype=bool))
+    prices = np.asarray(price_per_m2, dtype=np.float64)
+    days = np.asarray(transaction_day, dtype=np.int64)
+
+    rent = masks & is_rent
+    sale = masks & ~np.asarray(is_rent, dtype=bool)
+
+    # Comptages et sommes de tous les perimetres via produits matriciels
+    rent_count = rent.sum(axis=1)
+    sale_count = sale.sum(axis=1)
+    total_count = masks.sum(axis=1)
+    rent_sum = rent.astype(np.float64) @ prices if len(prices) else np.zeros(len(masks))
+    sale_sum = sale.astype(np.float64) @ prices if len(prices) else np.zeros(len(masks))
+
+    # Derniere vente : premier argmax des dates (meme resultat que max() sur la liste)
+    sale_days = np.where(sale, days, _NO_DAY)
+    latest = np.argmax(sale_days, axis=1) if len(prices) else np.zeros(len(masks), dtype=np.int64)
+
+    results = []
+    for p in range(len(masks)):
+        stats = {
+            "avg_rent_per_m2": None,
+            "rent_count": int(rent_count[p]),
+            "avg_sale_per_m2": None,
+            "sale_count": int(sale_count[p]),
+            "latest_sale_per_m2": None,
+            "latest_sale_date": None,
+            "total_count": int(total_count[p]),
+            "rent_distribution": price_distribution(prices[rent[p]]),
+            "sale_distribution": price_distribution(prices[sale[p]]),
+        }
+        if rent_count[p]:
+            stats["avg_rent_per_m2"] = round(float(rent_sum[p] / rent_count[p]), 2)
+        if sale_count[p]:
+            stats["avg_sale_per_m2"] = round(float(sale_sum[p] / sale_count[p]), 2)
+            latest_day = sale_days[p, latest[p]]
+            if latest_day != _NO_DAY:
+                stats["latest_sale_per_m2"] = float(prices[latest[p]])
+                stats["latest_sale_date"] = date.fromordinal(int(latest_day)).isoformat()
+        results.append(stats)
+
+    return results
+
+
+def empty_distribution() -> Dict[str, Optional[float]]:
+    """Distribution de prix vide (aucun bien)."""
+    return dict.fromkeys(DISTRIBUTION_FIELDS)
+
+
+def price_distribution(values: np.ndarray) -> Dict[str, Optional[float]]:
+    """
+    Mediane, P10/P25/P75/P90, ecart-type (echantillon) et moyenne tronquee
+    (prix entre P10 et P90) d'un ensemble de prix au m2.
+    """
+    distribution = empty_distribution()
+    if not len(values):
+        return distribution
+
+    quantiles = np.quantile(values, [q for _, q in DISTRIBUTION_QUANTILES])
+    for (name, _), value in zip(DISTRIBUTION_QUANTILES, quantiles):
+        distribution[name] = round(float(value), 2)
+    if len(values) > 1:
+        distribution["stddev"] = round(float(np.std(values, ddof=1)), 2)
+    kept = values[(values >= quantiles[0]) & (values <= quantiles[-1])]
+    distribution["trimmed_mean"] = round(float(kept.mean()), 2)
+    return distribution
+
+
+def price_stats(
+    is_rent: np.ndarray,
+    price_per_m2: np.ndarray,
+    transaction_day: np.ndarray,
+    mask: Optional[np.ndarray] = None
+) -> Dict[str, Any]:
+    """Statistiques de prix d'un seul ensemble de biens (tous si mask est None)."""
+    if mask is None:
+        mask = np.ones(len(price_per_m2), dtype=bool)
+    return perimeter_price_stats(is_rent, price_per_m2, transaction_day, mask)[0]
+
+
+def comparable_arrays(comparables: List[Any]) -> Dict[str, np.ndarray]:
+    """
+    Colonnes NumPy (lat, lng, is_rent, price_per_m2, transaction_day) d'une liste
+    d'objets comparables (ORM ou equivalents).
+    """
+    n = len(comparables)
+    return {
+        "lat": np.fromiter((c.latitude for c in comparables), dtype=np.float64, count=n),
+        "lng": np.fromiter((c.longitude for c in comparables), dtype=np.float64, count=n),
+        "is_rent": np.fromiter(
+            (getattr(c.transaction_type, "value", c.transaction_type) == "rent" for c in comparables),
+            dtype=bool, count=n,
+        ),
+        "price_per_m2": np.fromiter((c.price_per_m2 for c in comparables), dtype=np.float64, count=n),
+        "transaction_day": to_day_array(c.transaction_date for c in comparables),
+    }
+
+
+def grid_clusters(
+    lat: np.ndarray,
+    lng: np.ndarray,
+    is_rent: np.ndarray,
+    price_per_m2: np.ndarray,
+    grid_deg: float,
+    min_points: int
+) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Regroupe les biens par cellule de grille (meme arrondi que ST_SnapToGrid).
+
+    Args:
+        lat, lng: Coordonnees des biens (N)
+        is_rent: True pour une location, False pour une vente (N)
+        price_per_m2: Prix au m2 (N)
+        grid_deg: Taille d'une cellule en degres
+        min_points: Nombre minimal de biens d'une cellule pour former un cluster
+
+    Returns:
+        (clusters, isolated) : la liste des clusters (centroide, effectif,
+        prix moyens) et le masque des biens restant affiches individuellement
+    """
+    n = len(lat)
+    if not n:
+        return [], np.zeros(0, dtype=bool)
+
+    cells = np.stack([np.round(np.asarray(lat) / grid_deg), np.round(np.asarray(lng) / grid_deg)], axis=1)
+    _, cell_of, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    cell_of = cell_of.ravel()
+    isolated = counts[cell_of] < min_points
+
+    is_rent = np.asarray(is_rent, dtype=bool)
+    prices = np.asarray(price_per_m2, dtype=np.float64)
+    n_cells = len(counts)
+    sum_lat = np.bincount(cell_of, weights=lat, minlength=n_cells)
+    sum_lng = np.bincount(cell_of, weights=lng, minlength=n_cells)
+    sum_price = np.bincount(cell_of, weights=prices, minlength=n_cells)
+    rent_count = np.bincount(cell_of, weights=is_rent, minlength=n_cells)
+    rent_sum = np.bincount(cell_of, weights=prices * is_rent, minlength=n_cells)
+    sale_sum = sum_price - rent_sum
+
+    clusters = []
+    for cell in np.flatnonzero(counts >= min_points):
+        count = int(counts[cell])
+        rents = int(rent_count[cell])
+        sales = count - rents
+        clusters.append({
+            "latitude": float(sum_lat[cell] / count),
+            "longitude": float(sum_lng[cell] / count),
+            "count": count,
+            "avg_price_per_m2": round(float(sum_price[cell] / count), 2),
+            "rent_count": rents,
+            "avg_rent_per_m2": round(float(rent_sum[cell] / rents), 2) if rents else None,
+            "sale_count": sales,
+            "avg_sale_per_m2": round(float(sale_sum[cell] / sales), 2) if sales else None,
+        })
+    clusters.sort(key=lambda cluster: cluster["count"], reverse=True)
+
+    return clusters, isolated
+
+
+# Poids par defaut du score de similarite (score faible = bien proche du bien evalue)
+DEFAULT_RANK_WEIGHTS = {
+    "surface": 1.0,   # Ecart relatif de surface
+    "year": 0.5,      # Ecart d'annee de construction (par decennie)
+    "distance": 1.0,  # Distance rapportee au rayon de recherche
+    "recency": 0.5,   # Anciennete de la transaction (par an)
+    "source": 0.25,   # Penalite des sources externes (hors base Arthur Loyd)
+}
+YEAR_GAP_SCALE = 10.0
+RECENCY_SCALE_DAYS = 365.0
+
+
+def similarity_scores(
+    surface: np.ndarray,
+    year: np.ndarray,
+    distance_km: np.ndarray,
+    transaction_day: np.ndarray,
+    is_external: np.ndarray,
+    target_surface: Optional[float],
+    target_year: Optional[int],
+    max_distance_km: float,
+    today_day: int,
+    weights: Dict[str, float]
+) -> np.ndarray:
+    """
+    Score de similarite pondere de chaque bien (somme ponderee d'ecarts normalises).
+    Les criteres sans valeur cible (surface ou annee du bien evalue inconnue) sont ignores ;
+    une annee de construction inconnue (NaN) compte comme un ecart d'une decennie,
+    une date de transaction inconnue (_NO_DAY) comme une anciennete d'un an.
+
+    Args:
+        surface, year, distance_km, transaction_day, is_external: Colonnes des biens (N)
+        target_surface, target_year: Caracteristiques du bien evalue
+        max_distance_km: Rayon de recherche (normalisation de la distance)
+        today_day: Date de reference en jours ordinaux
+        weights: Poids par critere (cles de DEFAULT_RANK_WEIGHTS)
+
+    Returns:
+        Scores (N), le plus faible etant le plus similaire
+    """
+    scores = weights.get("distance", 0.0) * np.asarray(distance_km, dtype=np.float64) / max(max_distance_km, 1e-9)
+    if target_surface:
+        scores += weights.get("surface", 0.0) * np.abs(np.asarray(surface, dtype=np.float64) - target_surface) / target_surface
+    if target_year:
+        year_gap = np.abs(np.asarray(year, dtype=np.float64) - target_year) / YEAR_GAP_SCALE
+        scores += weights.get("year", 0.0) * np.nan_to_num(year_gap, nan=1.0)
+    days = np.asarray(transaction_day, dtype=np.int64)
+    age_days = np.where(
+        days == _NO_DAY, RECENCY_SCALE_DAYS, np.clip(today_day - days.astype(np.float64), 0.0, None)
+    )
+    scores += weights.get("recency", 0.0) * age_days / RECENCY_SCALE_DAYS
+    scores += weights.get("source", 0.0) * np.asarray(is_external, dtype=np.float64)
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions des k meilleurs scores (les plus faibles), triees par score croissant."""
+    if k >= len(scores):
+        return np.argsort(scores, kind="stable")
+    best = np.argpartition(scores, k - 1)[:k]
+    return best[np.argsort(scores[best], kind="stable")]
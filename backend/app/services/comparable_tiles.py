@@ -0,0 +1,246 @@
+"""
+Tuiles vectorielles (Mapbox Vector Tile) du pool de comparables
+Les tuiles sont generees par PostGIS (ST_AsMVT) et conservees dans un cache
+disque, invalide tuile par tuile a chaque ecriture du pool (vide entierement
+au-dela de TILE_INVALIDATE_MAX_ITEMS biens ecrits). Une tuile en cache expire
+apres COMPARABLE_TILE_CACHE_MAX_AGE_SECONDS : une tuile generee avant une
+ecriture concurrente et stockee apres son invalidation n'est pas servie indefiniment.
+"""
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from math import floor, log, pi, radians, tan, cos
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+# Nom de la couche MVT et parametres de generation (unites de tuile)
+TILE_LAYER = "comparables"
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_TILE_ZOOM = 22
+
+TILE_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+# Biens ecrits au-dela desquels le cache est vide plutot qu'invalide tuile par
+# tuile (imports en masse : des millions de suppressions sinon)
+TILE_INVALIDATE_MAX_ITEMS = 200
+
+# Zones desservies, pour le prechauffage du cache (sud, ouest, nord, est)
+PREWARM_AREAS = {
+    "valence": (44.80, 4.75, 45.10, 5.10),
+    "avignon": (43.85, 4.70, 44.05, 5.00),
+}
+
+# Une seule requete : enveloppe de la tuile en 3857, filtre spatial sur l'index
+# GIST de geom (enveloppe reprojetee en 4326), geometries decoupees par ST_AsMVTGeom.
+_TILE_SQL = text("""
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(:z, :x, :y) AS envelope,
+               ST_Transform(ST_TileEnvelope(:z, :x, :y, margin => :margin), 4326) AS envelope_4326
+    ),
+    features AS (
+        SELECT
+            p.id,
+            p.property_type,
+            p.transaction_type::text AS transaction_type,
+            p.price_per_m2,
+            p.surface,
+            p.source::text AS source,
+            p.status,
+            p.transaction_date::text AS transaction_date,
+            ST_AsMVTGeom(ST_Transform(p.geom, 3857), bounds.envelope, :extent, :buffer, true) AS geom
+        FROM comparable_pool AS p, bounds
+        WHERE p.geom && bounds.envelope_4326
+          AND (CAST(:property_type AS text) IS NULL OR p.property_type = :property_type)
+          AND (CAST(:transaction_type AS text) IS NULL OR p.transaction_type::text = :transaction_type)
+          AND (CAST(:source AS text) IS NULL OR p.source::text = :source)
+          AND (CAST(:status AS text) IS NULL OR p.status = :status)
+    )
+    SELECT ST_AsMVT(features, :layer, :extent, 'geom') FROM features WHERE geom IS NOT NULL
+""")
+
+
+@dataclass(frozen=True)
+class TileFilters:
+    """Filtres attributaires d'une tuile (None = pas de filtre)"""
+    property_type: Optional[str] = None
+    transaction_type: Optional[str] = None
+    source: Optional[str] = None
+    status: Optional[str] = None
+
+    def cache_key(self) -> str:
+        """Nom du repertoire de cache de cette combinaison de filtres."""
+        return "-".join(value or "all" for value in (
+            self.property_type, self.transaction_type, self.source, self.status
+        ))
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    """Verifie que (z, x, y) designe une tuile existante du schema XYZ."""
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def get_tile(db: Session, z: int, x: int, y: int, filters: TileFilters) -> bytes:
+    """
+    Retourne la tuile MVT (z, x, y), depuis le cache disque si possible (et
+    plus recente que COMPARABLE_TILE_CACHE_MAX_AGE_SECONDS). Les tuiles
+    au-dela de COMPARABLE_TILE_CACHE_MAX_ZOOM ne sont pas mises en cache.
+    """
+    cacheable = z <= settings.COMPARABLE_TILE_CACHE_MAX_ZOOM
+    path = _tile_path(filters.cache_key(), z, x, y)
+    if cacheable:
+        try:
+            if time.time() - path.stat().st_mtime <= settings.COMPARABLE_TILE_CACHE_MAX_AGE_SECONDS:
+                return path.read_bytes()
+        except FileNotFoundError:
+            pass
+
+    tile = render_tile(db, z, x, y, filters)
+    if cacheable:
+        try:
+            _write_atomic(path, tile)
+        except FileNotFoundError:
+            pass  # Cache vide pendant l'ecriture : la tuile sera regeneree
+    return tile
+
+
+def render_tile(db: Session, z: int, x: int, y: int, filters: TileFilters) -> bytes:
+    """Genere la tuile MVT (z, x, y) avec ST_AsMVT, sans passer par le cache."""
+    tile = db.execute(_TILE_SQL, {
+        "z": z, "x": x, "y": y,
+        "margin": TILE_BUFFER / TILE_EXTENT,
+        "extent": TILE_EXTENT,
+        "buffer": TILE_BUFFER,
+        "layer": TILE_LAYER,
+        "property_type": filters.property_type,
+        "transaction_type": filters.transaction_type,
+        "source": filters.source,
+        "status": filters.status,
+    }).scalar()
+    return bytes(tile) if tile else b""
+
+
+def invalidate_tiles(items: Iterable[Any]) -> int:
+    """
+    Supprime du cache disque les tuiles contenant les biens ecrits (tous zooms
+    mis en cache, toutes combinaisons de filtres, tuiles voisines si le bien
+    est dans la marge) ; items porte latitude et longitude (anciennes et
+    nouvelles positions d'un bien deplace). Au-dela de TILE_INVALIDATE_MAX_ITEMS biens, vide tout
+    le cache. Retourne le nombre de tuiles supprimees, ou de repertoires de
+    filtres si le cache a ete vide.
+    """
+    root = Path(settings.COMPARABLE_TILE_CACHE_DIR)
+    if not root.is_dir():
+        return 0
+    filter_dirs = [path for path in root.iterdir() if path.is_dir() and not path.name.startswith(".")]
+    if not filter_dirs:
+        return 0
+
+    tiles = set()
+    located = 0
+    for item in items:
+        if item.latitude is None or item.longitude is None:
+            continue
+        located += 1
+        if located > TILE_INVALIDATE_MAX_ITEMS:
+            return _drop_cache(root, filter_dirs)
+        for z in range(settings.COMPARABLE_TILE_CACHE_MAX_ZOOM + 1):
+            tiles.update(tiles_for_point(item.latitude, item.longitude, z))
+
+    removed = 0
+    for filter_dir in filter_dirs:
+        for z, x, y in tiles:
+            try:
+                (filter_dir / str(z) / str(x) / f"{y}.mvt").unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def _drop_cache(root: Path, filter_dirs: List[Path]) -> int:
+    """
+    Vide le cache : chaque repertoire de filtres est renomme (atomique, les
+    lecteurs regenerent leurs tuiles) puis supprime.
+    """
+    dropped = 0
+    for filter_dir in filter_dirs:
+        trash = root / f".drop-{uuid.uuid4().hex}"
+        try:
+            filter_dir.rename(trash)
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(trash, ignore_errors=True)
+        dropped += 1
+    return dropped
+
+
+def tiles_for_point(lat: float, lng: float, z: int) -> List[Tuple[int, int, int]]:
+    """Tuiles du zoom z dont l'emprise (marge TILE_BUFFER incluse) contient le point."""
+    fx, fy = _tile_fraction(lat, lng, z)
+    margin = TILE_BUFFER / TILE_EXTENT
+    last = 2 ** z - 1
+    xs = range(max(0, floor(fx - margin)), min(last, floor(fx + margin)) + 1)
+    ys = range(max(0, floor(fy - margin)), min(last, floor(fy + margin)) + 1)
+    return [(z, x, y) for x in xs for y in ys]
+
+
+def tiles_for_bbox(
+    south: float, west: float, north: float, east: float, z: int
+) -> Iterator[Tuple[int, int, int]]:
+    """Tuiles du zoom z couvrant une emprise geographique."""
+    x_min, y_min = (int(v) for v in _tile_fraction(north, west, z))
+    x_max, y_max = (int(v) for v in _tile_fraction(south, east, z))
+    last = 2 ** z - 1
+    for x in range(max(0, x_min), min(last, x_max) + 1):
+        for y in range(max(0, y_min), min(last, y_max) + 1):
+            yield z, x, y
+
+
+def prewarm_tiles(
+    db: Session,
+    bbox: Tuple[float, float, float, float],
+    zooms: Iterable[int],
+    filters: TileFilters
+) -> int:
+    """Genere et met en cache toutes les tuiles d'une emprise. Retourne le nombre de tuiles."""
+    count = 0
+    for zoom in zooms:
+        for z, x, y in tiles_for_bbox(*bbox, zoom):
+            _write_atomic(_tile_path(filters.cache_key(), z, x, y), render_tile(db, z, x, y, filters))
+            count += 1
+    return count
+
+
+def _tile_fraction(lat: float, lng: float, z: int) -> Tuple[float, float]:
+    """Coordonnees de tuile fractionnaires (Web Mercator, schema XYZ)."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    fx = (lng + 180.0) / 360.0 * n
+    fy = (1.0 - log(tan(radians(lat)) + 1.0 / cos(radians(lat))) / pi) / 2.0 * n
+    return fx, fy
+
+
+def _tile_path(filter_key: str, z: int, x: int, y: int) -> Path:
+    return Path(settings.COMPARABLE_TILE_CACHE_DIR) / filter_key / str(z) / str(x) / f"{y}.mvt"
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Ecrit le fichier via un fichier temporaire pour ne jamais servir de tuile partielle."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,166 @@
+"""
+Analyses de marche DVF sur le cache Parquet (services/dvf_parquet.py)
+Les fichiers sont lus en memoire projetee par pyarrow : dataset Hive elague sur
+les partitions departement/annee et sur les statistiques des groupes de lignes,
+colonnes utiles seulement, puis agregations vectorisees (group_by Arrow). Aucune
+requete sur la base transactionnelle : les rapports pluriannuels ne concurrencent
+pas les recherches interactives.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from app.services.dvf_parquet import DVF_PARQUET_PARTITIONING, dvf_parquet_root
+from app.services.dvf_promotion import DVF_SALE_NATURES
+
+DVF_ANALYTICS_GROUPS = ("departement", "code_commune", "type_local")
+DVF_ANALYTICS_PERIODS = ("year", "quarter")
+
+# Quantiles du prix au m2 par groupe (t-digest : approximation a moins de 1 %)
+_QUANTILES = (0.25, 0.5, 0.75)
+
+_SCAN_COLUMNS = (
+    "departement", "mutation_id", "mutation_date", "valeur_fonciere",
+    "surface_reelle_bati", "code_commune", "type_local",
+)
+
+
+def dvf_parquet_available() -> bool:
+    return os.path.isdir(dvf_parquet_root())
+
+
+def open_dvf_dataset() -> ds.Dataset:
+    """Dataset Parquet DVF (fichiers projetes en memoire) ; leve FileNotFoundError si le cache est absent."""
+    root = dvf_parquet_root()
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"Cache Parquet DVF absent : {root}")
+    return ds.dataset(
+        os.path.abspath(root),
+        format="parquet",
+        partitioning=DVF_PARQUET_PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        exclude_invalid_files=True,
+    )
+
+
+def load_dvf_mutations(
+    departements: Optional[Sequence[str]] = None,
+    insee_codes: Optional[Sequence[str]] = None,
+    type_local: Optional[Sequence[str]] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    dataset: Optional[ds.Dataset] = None,
+) -> pa.Table:
+    """
+    Ventes DVF filtrees, une ligne par mutation : prix de la mutation, surfaces
+    baties cumulees, prix au m2. Les mutations melant plusieurs types de locaux
+    batis sont ecartees (prix non attribuable a un type).
+    Colonnes : departement, mutation_id, mutation_date, code_commune, type_local,
+    price, surface, price_per_m2.
+    """
+    dataset = dataset or open_dvf_dataset()
+    expression = (
+        ds.field("nature_mutation").isin(list(DVF_SALE_NATURES))
+        & (ds.field("surface_reelle_bati") > 0)
+        & ds.field("type_local").is_valid()
+    )
+    if departements:
+        expression &= ds.field("departement").isin([d.strip().upper() for d in departements])
+    if year_min is not None:
+        expression &= ds.field("year") >= year_min
+    if year_max is not None:
+        expression &= ds.field("year") <= year_max
+    if insee_codes:
+        expression &= ds.field("code_commune").isin([code.strip().upper() for code in insee_codes])
+
+    lines = dataset.to_table(columns=list(_SCAN_COLUMNS), filter=expression)
+    mutations = lines.group_by(["departement", "mutation_id"]).aggregate([
+        ("mutation_date", "min"),
+        ("valeur_fonciere", "max"),  # Repetee sur chaque ligne de la mutation
+        ("surface_reelle_bati", "sum"),
+        ("code_commune", "min"),
+        ("type_local", "min"),
+        ("type_local", "count_distinct"),
+    ])
+    mutations = mutations.filter(
+        pc.and_(pc.equal(mutations["type_local_count_distinct"], 1), pc.greater(mutations["valeur_fonciere_max"], 0))
+    )
+    # Filtre de type apres regroupement : une mutation mixte filtree par ligne
+    # garderait son prix total rapporte a la surface d'une partie des locaux
+    if type_local:
+        mutations = mutations.filter(pc.is_in(mutations["type_local_min"], value_set=pa.array(list(type_local))))
+    price = mutations["valeur_fonciere_max"]
+    surface = mutations["surface_reelle_bati_sum"]
+    return pa.table({
+        "departement": mutations["departement"],
+        "mutation_id": mutations["mutation_id"],
+        "mutation_date": mutations["mutation_date_min"],
+        "code_commune": mutations["code_commune_min"],
+        "type_local": mutations["type_local_min"],
+        "price": price,
+        "surface": surface,
+        "price_per_m2": pc.divide(price, surface),
+    })
+
+
+def price_evolution(
+    group_by: Sequence[str] = ("departement",),
+    period: str = "year",
+    departements: Optional[Sequence[str]] = None,
+    insee_codes: Optional[Sequence[str]] = None,
+    type_local: Optional[Sequence[str]] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Evolution du prix au m2 par groupe (departement, commune, type de local) et
+    par annee ou trimestre : nombre de mutations, moyenne, quartiles et mediane.
+    Leve ValueError si un groupe ou la periode est invalide.
+    """
+    unknown = [key for key in group_by if key not in DVF_ANALYTICS_GROUPS]
+    if unknown or period not in DVF_ANALYTICS_PERIODS:
+        raise ValueError(f"Regroupement invalide : {', '.join(unknown) or period}")
+
+    started_at = time.perf_counter()
+    mutations = load_dvf_mutations(departements, insee_codes, type_local, year_min, year_max)
+
+    keys = list(dict.fromkeys(group_by))
+    columns = {key: mutations[key] for key in keys}
+    columns["year"] = pc.year(mutations["mutation_date"])
+    period_keys = ["year"]
+    if period == "quarter":
+        columns["quarter"] = pc.quarter(mutations["mutation_date"])
+        period_keys.append("quarter")
+    columns["price_per_m2"] = mutations["price_per_m2"]
+
+    stats = pa.table(columns).group_by(keys + period_keys).aggregate([
+        ("price_per_m2", "count"),
+        ("price_per_m2", "mean"),
+        ("price_per_m2", "tdigest", pc.TDigestOptions(q=list(_QUANTILES))),
+    ])
+    stats = stats.sort_by([(key, "ascending") for key in keys + period_keys])
+
+    rows: List[Dict[str, Any]] = []
+    for row in stats.to_pylist():
+        p25, median, p75 = row["price_per_m2_tdigest"]
+        entry = {key: row[key] for key in keys}
+        entry["period"] = f"{row['year']}-Q{row['quarter']}" if period == "quarter" else str(row["year"])
+        entry.update({
+            "count": row["price_per_m2_count"],
+            "mean_price_per_m2": round(row["price_per_m2_mean"], 2),
+            "p25_price_per_m2": round(p25, 2),
+            "median_price_per_m2": round(median, 2),
+            "p75_price_per_m2": round(p75, 2),
+        })
+        rows.append(entry)
+
+    return {
+        "rows": rows,
+        "mutations": mutations.num_rows,
+        "seconds": round(time.perf_counter() - started_at, 3),
+    }
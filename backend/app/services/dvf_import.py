@@ -0,0 +1,529 @@
+"""
+Import des fichiers DVF (Demandes de Valeurs Foncieres) dans dvf_records
+Lecture en flux par paquets pandas, normalisation vectorisee, puis COPY FROM
+STDIN (geom compris, en EWKT) dans une table de transit fusionnee dans
+dvf_records. Un fichier = une transaction ; seuls les fichiers nouveaux ou
+modifies (empreinte enregistree dans dvf_import_files) sont recharges, ce qui
+rend une mise a jour semestrielle incrementale et un import interrompu reprenable.
+
+Formats acceptes (detectes sur l'en-tete) :
+  - DVF geolocalisees Etalab (full.csv[.gz], AAAA/departements/XX.csv.gz), CSV ','
+  - Fichiers bruts DGFiP (valeursfoncieres-AAAA.txt[.zip]), '|' sans coordonnees
+"""
+import glob
+import gzip
+import hashlib
+import io
+import os
+import time
+import zipfile
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import DvfImportFile, DvfWatermark
+from app.services.dvf_parquet import export_dvf_parquet
+from app.services.dvf_partitions import ensure_dvf_partitions
+from app.services.dvf_promotion import promote_dvf_mutations
+from app.services.jobs import Job
+
+DVF_FORMAT_ETALAB = "etalab"
+DVF_FORMAT_DGFIP = "dgfip"
+
+# Lignes lues (et envoyees par COPY) a la fois : memoire bornee quel que soit le fichier
+DVF_CHUNK_ROWS = 100_000
+
+DVF_FILE_PATTERNS = ("*.csv", "*.csv.gz", "*.txt", "*.txt.gz", "*.zip")
+
+_COPY_COLUMNS = (
+    "mutation_id", "mutation_date", "numero_disposition", "nature_mutation", "valeur_fonciere",
+    "adresse", "code_postal", "commune", "code_commune", "departement",
+    "type_local", "code_type_local", "surface_reelle_bati", "surface_terrain",
+    "nombre_pieces_principales", "latitude", "longitude", "geom", "lot_key", "source_file",
+)
+
+# Colonnes lues dans chaque format (les autres ne sont jamais chargees en memoire)
+_SOURCE_COLUMNS = {
+    DVF_FORMAT_ETALAB: (
+        "id_mutation", "date_mutation", "numero_disposition", "nature_mutation", "valeur_fonciere",
+        "adresse_numero", "adresse_suffixe", "adresse_nom_voie", "code_postal", "code_commune",
+        "nom_commune", "code_departement", "code_type_local", "type_local", "surface_reelle_bati",
+        "nombre_pieces_principales", "surface_terrain", "longitude", "latitude",
+        "id_parcelle", "lot1_numero",
+    ),
+    DVF_FORMAT_DGFIP: (
+        "No disposition", "Date mutation", "Nature mutation", "Valeur fonciere", "No voie", "B/T/Q",
+        "Type de voie", "Voie", "Code postal", "Commune", "Code departement", "Code commune",
+        "Code type local", "Type local", "Surface reelle bati", "Nombre pieces principales",
+        "Surface terrain", "Prefixe de section", "Section", "No plan", "1er lot",
+    ),
+}
+
+# Cle de fusion : une ligne par local (lot_key) de chaque disposition ; departement
+# et mutation_date sont les cles de partitionnement (dvf_partitions.py), obligatoires
+# dans tout index unique de la table partitionnee
+_MERGE_KEY = ("mutation_id", "numero_disposition", "lot_key", "departement", "mutation_date")
+
+# Colonnes comparees pour ne reecrire que les lignes changees (geom derive des coordonnees)
+_COMPARED_COLUMNS = tuple(name for name in _COPY_COLUMNS if name != "geom")
+
+# Table de transit de la session, supprimee au commit (ou a l'annulation)
+_CREATE_STAGING_SQL = text(f"""
+    CREATE TEMP TABLE dvf_staging ON COMMIT DROP AS
+    SELECT {', '.join(_COPY_COLUMNS)} FROM dvf_records WITH NO DATA
+""")
+
+# Une ligne par local de chaque disposition : les fichiers repetent un local sur
+# autant de lignes que de natures de culture de sa parcelle (surface batie
+# identique) ; on garde celle de plus grande surface de terrain. Chaque local
+# conserve sa ligne : les surfaces baties se cumulent par mutation.
+# Les lignes identiques ne sont pas reecrites.
+_MERGE_SQL = text(f"""
+    WITH merged AS (
+        INSERT INTO dvf_records ({', '.join(_COPY_COLUMNS)})
+        SELECT DISTINCT ON (mutation_id, numero_disposition, lot_key) {', '.join(_COPY_COLUMNS)}
+        FROM dvf_staging
+        ORDER BY mutation_id, numero_disposition, lot_key, surface_terrain DESC NULLS LAST
+        ON CONFLICT ({', '.join(_MERGE_KEY)}) DO UPDATE SET
+            {', '.join(f"{name} = EXCLUDED.{name}" for name in _COPY_COLUMNS if name not in _MERGE_KEY)}
+        WHERE ({', '.join(f"dvf_records.{name}" for name in _COMPARED_COLUMNS)})
+            IS DISTINCT FROM ({', '.join(f"EXCLUDED.{name}" for name in _COMPARED_COLUMNS)})
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted) AS inserted,
+           count(*) FILTER (WHERE NOT inserted) AS updated
+    FROM merged
+""")
+
+# Mutations retirees de la nouvelle version du fichier, comptees par partition
+# (departement, annee) : export Parquet des partitions videes (services/dvf_parquet.py)
+_DELETE_STALE_SQL = text("""
+    WITH deleted AS (
+        DELETE FROM dvf_records r
+        WHERE r.source_file = :file_name
+          AND NOT EXISTS (
+              SELECT 1 FROM dvf_staging s
+              WHERE s.mutation_id = r.mutation_id
+                AND s.numero_disposition IS NOT DISTINCT FROM r.numero_disposition
+                AND s.lot_key = r.lot_key
+                AND s.departement = r.departement
+                AND s.mutation_date = r.mutation_date
+          )
+        RETURNING r.departement, r.mutation_date
+    )
+    SELECT departement, extract(year FROM mutation_date)::int AS year, count(*) AS rows
+    FROM deleted
+    GROUP BY departement, year
+""")
+
+_STAGED_PARTITIONS_SQL = text("""
+    SELECT DISTINCT departement, extract(year FROM mutation_date)::int AS year FROM dvf_staging
+""")
+
+# Lignes des annees archivees (partition detachee, scripts/dvf_partitions.py)
+_DROP_DETACHED_SQL = text("""
+    DELETE FROM dvf_staging
+    WHERE (departement, extract(year FROM mutation_date)::int) IN (
+        SELECT * FROM unnest(CAST(:departements AS text[]), CAST(:years AS int[]))
+    )
+""")
+
+_WATERMARK_SQL = text("""
+    INSERT INTO dvf_watermarks (departement, max_mutation_date, updated_at)
+    SELECT departement, max(mutation_date), now() AT TIME ZONE 'utc'
+    FROM dvf_staging
+    GROUP BY departement
+    ON CONFLICT (departement) DO UPDATE SET
+        max_mutation_date = GREATEST(dvf_watermarks.max_mutation_date, EXCLUDED.max_mutation_date),
+        updated_at = EXCLUDED.updated_at
+""")
+
+Progress = Optional[Callable[[int, Optional[int]], None]]
+
+
+@dataclass
+class DvfImportReport:
+    """Bilan de l'import d'un fichier DVF"""
+    file_name: str
+    file_format: Optional[str]
+    rows: int      # Lignes lues dans le fichier
+    skipped: int   # Lignes inexploitables (date illisible, departement absent, annee archivee)
+    seconds: float
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: bool = False  # Fichier ignore : empreinte identique au dernier import
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "rows_per_second": round(self.rows_per_second)}
+
+
+def list_dvf_files(path: Optional[str] = None) -> List[str]:
+    """Fichiers DVF d'un repertoire (DVF_DATA_PATH par defaut), tries par nom, ou le fichier lui-meme."""
+    path = path or settings.DVF_DATA_PATH
+    if os.path.isfile(path):
+        return [path]
+    files = set()
+    for pattern in DVF_FILE_PATTERNS:
+        files.update(glob.glob(os.path.join(path, "**", pattern), recursive=True))
+    return sorted(files)
+
+
+def dvf_file_key(path: str) -> str:
+    """Identifiant d'un fichier : chemin relatif a DVF_DATA_PATH (les millesimes Etalab partagent les noms)."""
+    root = os.path.abspath(settings.DVF_DATA_PATH)
+    path = os.path.abspath(path)
+    if os.path.commonpath([root, path]) == root:
+        return os.path.relpath(path, root)
+    return os.path.basename(path)
+
+
+def import_dvf_file(
+    db: Session,
+    path: str,
+    chunk_rows: int = DVF_CHUNK_ROWS,
+    force: bool = False,
+    progress: Progress = None
+) -> DvfImportReport:
+    """
+    Importe un fichier DVF nouveau ou modifie (empreinte SHA-256) : COPY par
+    paquets de chunk_rows lignes dans une table de transit, puis fusion dans
+    dvf_records par (mutation_id, numero_disposition, lot_key) avec INSERT ... ON
+    CONFLICT, apres creation des partitions (departement, annee) manquantes.
+    Seules les lignes changees sont reecrites et les mutations retirees du
+    fichier sont supprimees. Tout se fait dans une transaction :
+    les lecteurs voient l'ancienne version jusqu'au commit, sans verrou de table.
+    Un fichier d'empreinte inchangee est ignore sauf si force.
+    progress(lignes lues, None) est appele apres chaque paquet.
+    """
+    start = time.perf_counter()
+    file_name = dvf_file_key(path)
+    checksum = file_checksum(path)
+    previous = db.get(DvfImportFile, file_name)
+    if not force and previous is not None and previous.checksum == checksum:
+        return DvfImportReport(file_name, previous.file_format, 0, 0, 0.0, unchanged=True)
+
+    file_format = detect_dvf_format(path)
+    cursor = db.connection().connection.cursor()
+    rows = skipped = 0
+    buffer = io.StringIO()
+
+    try:
+        db.execute(_CREATE_STAGING_SQL)
+        for chunk in read_dvf_chunks(path, file_format, chunk_rows):
+            frame = normalize_dvf_chunk(chunk, file_format)
+            # Date et departement obligatoires (cles de partitionnement)
+            valid = frame["mutation_date"].notna() & frame["departement"].notna()
+            skipped += int((~valid).sum())
+            frame = frame[valid]
+            if frame.empty:
+                continue
+            frame["source_file"] = file_name
+            frame.to_csv(buffer, header=False, index=False, columns=list(_COPY_COLUMNS), date_format="%Y-%m-%d")
+            _copy_buffer(cursor, buffer)
+            rows += len(frame)
+            if progress:
+                progress(rows, None)
+
+        db.execute(text("ANALYZE dvf_staging"))
+        staged = [(row.departement, row.year) for row in db.execute(_STAGED_PARTITIONS_SQL)]
+        detached = ensure_dvf_partitions(staged)
+        if detached:
+            archived = db.execute(_DROP_DETACHED_SQL, {
+                "departements": [departement for departement, _year in detached],
+                "years": [year for _departement, year in detached],
+            }).rowcount
+            rows -= archived
+            skipped += archived
+        merged = db.execute(_MERGE_SQL).one()
+        stale = db.execute(_DELETE_STALE_SQL, {"file_name": file_name}).all() if previous else []
+        deleted = sum(row.rows for row in stale)
+        # Partitions a reexporter en Parquet, cumulees jusqu'au prochain export
+        touched = set(staged) - set(detached)
+        touched |= {(row.departement, row.year) for row in stale}
+        touched |= {tuple(pair) for pair in (previous.parquet_partitions or [])} if previous else set()
+        db.execute(_WATERMARK_SQL)
+
+        seconds = time.perf_counter() - start
+        record = {
+            "file_name": file_name, "file_format": file_format, "checksum": checksum,
+            "size_bytes": os.path.getsize(path), "rows": rows, "skipped": skipped,
+            "inserted": merged.inserted, "updated": merged.updated, "deleted": deleted,
+            "parquet_partitions": [list(pair) for pair in sorted(touched)],
+            "seconds": seconds, "loaded_at": datetime.utcnow(),
+        }
+        stmt = insert(DvfImportFile).values(record)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[DvfImportFile.file_name],
+            set_={name: stmt.excluded[name] for name in record if name != "file_name"},
+        ))
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return DvfImportReport(
+        file_name, file_format, rows, skipped, seconds,
+        inserted=merged.inserted, updated=merged.updated, deleted=deleted,
+    )
+
+
+def import_dvf_files(
+    db: Session,
+    paths: List[str],
+    chunk_rows: int = DVF_CHUNK_ROWS,
+    force: bool = False,
+    progress: Progress = None
+) -> List[DvfImportReport]:
+    """Importe des fichiers l'un apres l'autre ; progress recoit le cumul des lignes lues."""
+    reports: List[DvfImportReport] = []
+    loaded = 0
+    for path in paths:
+        def file_progress(rows: int, _total: Optional[int], offset: int = loaded):
+            progress(offset + rows, None)
+
+        report = import_dvf_file(db, path, chunk_rows, force, file_progress if progress else None)
+        loaded += report.rows
+        reports.append(report)
+    return reports
+
+
+def run_dvf_import_job(job: Job, paths: List[str], force: bool = False) -> Dict[str, Any]:
+    """
+    Point d'entree des taches de fond : session dediee, lignes lues reportees
+    dans job, promotion des mutations importees dans le pool puis export
+    Parquet des partitions touchees.
+    """
+    db = SessionLocal()
+    try:
+        reports = import_dvf_files(db, paths, force=force, progress=job.report)
+        promotion = promote_dvf_mutations(db)
+        export = export_dvf_parquet(db)
+    finally:
+        db.close()
+    return {
+        "rows": sum(report.rows for report in reports),
+        "inserted": sum(report.inserted for report in reports),
+        "updated": sum(report.updated for report in reports),
+        "deleted": sum(report.deleted for report in reports),
+        "files": [report.as_dict() for report in reports],
+        "promotion": promotion,
+        "export": export,
+    }
+
+
+def dvf_refresh_status(db: Session) -> Dict[str, Any]:
+    """Fichiers charges (empreinte, bilan de fusion) et date de mutation max par departement."""
+    files = db.query(DvfImportFile).order_by(DvfImportFile.file_name).all()
+    watermarks = db.query(DvfWatermark).order_by(DvfWatermark.departement).all()
+    return {
+        "files": [
+            {
+                "file_name": f.file_name, "file_format": f.file_format, "checksum": f.checksum,
+                "size_bytes": f.size_bytes, "rows": f.rows, "skipped": f.skipped,
+                "inserted": f.inserted, "updated": f.updated, "deleted": f.deleted,
+                "seconds": f.seconds, "loaded_at": f.loaded_at.isoformat(),
+                "promoted_at": f.promoted_at.isoformat() if f.promoted_at else None,
+                "exported_at": f.exported_at.isoformat() if f.exported_at else None,
+            }
+            for f in files
+        ],
+        "departements": [
+            {
+                "departement": w.departement,
+                "max_mutation_date": w.max_mutation_date.isoformat(),
+                "updated_at": w.updated_at.isoformat(),
+            }
+            for w in watermarks
+        ],
+    }
+
+
+def file_checksum(path: str) -> str:
+    """Empreinte SHA-256 du fichier, lu par blocs de 1 Mo."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_dvf_format(path: str) -> str:
+    """Format du fichier d'apres sa ligne d'en-tete ; leve ValueError si inconnu."""
+    with _open_text(path) as f:
+        header = f.readline()
+    if "id_mutation" in header:
+        return DVF_FORMAT_ETALAB
+    if "Date mutation" in header and "|" in header:
+        return DVF_FORMAT_DGFIP
+    raise ValueError(f"Format DVF non reconnu : {os.path.basename(path)}")
+
+
+def read_dvf_chunks(path: str, file_format: str, chunk_rows: int = DVF_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Paquets de lignes brutes (texte), limites aux colonnes utiles."""
+    wanted = set(_SOURCE_COLUMNS[file_format])
+    with _open_text(path) as f:
+        reader = pd.read_csv(
+            f,
+            sep="|" if file_format == DVF_FORMAT_DGFIP else ",",
+            dtype=str,
+            usecols=lambda name: name in wanted,
+            chunksize=chunk_rows,
+        )
+        for chunk in reader:
+            # Colonnes absentes de certains millesimes
+            yield chunk.reindex(columns=_SOURCE_COLUMNS[file_format])
+
+
+def normalize_dvf_chunk(chunk: pd.DataFrame, file_format: str) -> pd.DataFrame:
+    """Colonnes de dvf_records (hors source_file) ; mutation_date NaT si date illisible."""
+    if file_format == DVF_FORMAT_DGFIP:
+        frame = _normalize_dgfip(chunk)
+    else:
+        frame = _normalize_etalab(chunk)
+
+    frame["surface_reelle_bati"] = _to_float(frame["surface_reelle_bati"])
+    frame["surface_terrain"] = _to_float(frame["surface_terrain"])
+    frame["nombre_pieces_principales"] = pd.to_numeric(
+        frame["nombre_pieces_principales"], errors="coerce"
+    ).astype("Int64")
+    frame["numero_disposition"] = _strip_leading_zeros(frame["numero_disposition"])
+    # Local de la disposition : parcelle, type, premier lot et surface batie
+    # (pas d'identifiant de local dans les fichiers publics)
+    frame["lot_key"] = _lot_key(
+        frame.pop("parcelle"), frame["code_type_local"], frame.pop("lot"),
+        frame["surface_reelle_bati"], frame["nombre_pieces_principales"],
+    )
+
+    # geom en EWKT, converti par PostGIS pendant le COPY
+    located = frame["latitude"].notna() & frame["longitude"].notna()
+    frame["geom"] = None
+    frame.loc[located, "geom"] = (
+        "SRID=4326;POINT(" + frame.loc[located, "longitude"].astype(str)
+        + " " + frame.loc[located, "latitude"].astype(str) + ")"
+    )
+    return frame
+
+
+def _normalize_etalab(chunk: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "mutation_id": chunk["id_mutation"],
+        "mutation_date": pd.to_datetime(chunk["date_mutation"], format="%Y-%m-%d", errors="coerce"),
+        "numero_disposition": chunk["numero_disposition"],
+        "nature_mutation": chunk["nature_mutation"],
+        "valeur_fonciere": _to_float(chunk["valeur_fonciere"]),
+        "adresse": _join_words(chunk["adresse_numero"], chunk["adresse_suffixe"], chunk["adresse_nom_voie"]),
+        "code_postal": chunk["code_postal"].str.zfill(5),
+        "commune": chunk["nom_commune"],
+        "code_commune": chunk["code_commune"],
+        "departement": chunk["code_departement"].str.upper(),
+        "type_local": chunk["type_local"],
+        "code_type_local": chunk["code_type_local"],
+        "surface_reelle_bati": chunk["surface_reelle_bati"],
+        "surface_terrain": chunk["surface_terrain"],
+        "nombre_pieces_principales": chunk["nombre_pieces_principales"],
+        "latitude": _to_float(chunk["latitude"]),
+        "longitude": _to_float(chunk["longitude"]),
+        "parcelle": chunk["id_parcelle"],
+        "lot": chunk["lot1_numero"],
+    })
+
+
+def _normalize_dgfip(chunk: pd.DataFrame) -> pd.DataFrame:
+    departement = chunk["Code departement"].str.zfill(2).str.upper()
+    frame = pd.DataFrame({
+        "mutation_date": pd.to_datetime(chunk["Date mutation"], format="%d/%m/%Y", errors="coerce"),
+        "numero_disposition": chunk["No disposition"],
+        "nature_mutation": chunk["Nature mutation"],
+        "valeur_fonciere": _to_float(chunk["Valeur fonciere"]),
+        "adresse": _join_words(chunk["No voie"], chunk["B/T/Q"], chunk["Type de voie"], chunk["Voie"]),
+        "code_postal": chunk["Code postal"].str.split(".").str[0].str.zfill(5),
+        "commune": chunk["Commune"],
+        # Code INSEE : 2 premiers caracteres du departement (971 -> 97) + code commune sur 3
+        "code_commune": departement.str[:2] + chunk["Code commune"].str.zfill(3),
+        "departement": departement,
+        "type_local": chunk["Type local"],
+        "code_type_local": chunk["Code type local"],
+        "surface_reelle_bati": chunk["Surface reelle bati"],
+        "surface_terrain": chunk["Surface terrain"],
+        "nombre_pieces_principales": chunk["Nombre pieces principales"],
+        "latitude": float("nan"),
+        "longitude": float("nan"),
+        # Identifiant cadastral de la parcelle, comme id_parcelle des fichiers Etalab
+        "parcelle": (
+            departement.str[:2] + chunk["Code commune"].str.zfill(3)
+            + chunk["Prefixe de section"].fillna("").str.zfill(3)
+            + chunk["Section"].fillna("").str.zfill(2)
+            + chunk["No plan"].fillna("").str.zfill(4)
+        ),
+        "lot": chunk["1er lot"],
+    })
+    # Pas d'identifiant de mutation dans les fichiers bruts : identifiant synthetique
+    # (meme date, nature, valeur et commune = meme mutation, regle des fichiers Etalab)
+    key = frame[["mutation_date", "nature_mutation", "valeur_fonciere", "code_commune"]]
+    frame.insert(0, "mutation_id", "dgfip-" + pd.util.hash_pandas_object(key, index=False).astype(str))
+    return frame
+
+
+def _to_float(series: pd.Series) -> pd.Series:
+    """Nombre decimal, virgule ou point ; NaN si illisible."""
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.str.replace(",", ".", regex=False)
+    return pd.to_numeric(series, errors="coerce")
+
+
+def _lot_key(*parts: pd.Series) -> pd.Series:
+    """Parties du local jointes par '|' (vides si absentes) ; jamais NULL."""
+    key = parts[0].astype("string").fillna("")
+    for part in parts[1:]:
+        key = key + "|" + part.astype("string").fillna("")
+    return key.astype(object)
+
+
+def _strip_leading_zeros(series: pd.Series) -> pd.Series:
+    """'000001' -> '1' : meme numero de disposition quel que soit le format."""
+    stripped = series.str.strip().str.lstrip("0")
+    return stripped.mask(stripped == "", "0")
+
+
+def _join_words(*parts: pd.Series) -> pd.Series:
+    """Concatenation des morceaux d'adresse non vides, separes par un espace."""
+    joined = parts[0].fillna("")
+    for part in parts[1:]:
+        joined = joined + " " + part.fillna("")
+    joined = joined.str.split().str.join(" ")
+    return joined.mask(joined == "")
+
+
+def _open_text(path: str):
+    """Fichier texte, decompresse a la volee (.gz, .zip a un seul fichier)."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.endswith(".zip"):
+        archive = zipfile.ZipFile(path)
+        return io.TextIOWrapper(archive.open(archive.namelist()[0]), encoding="utf-8", newline="")
+    return open(path, "rt", encoding="utf-8", newline="")
+
+
+def _copy_buffer(cursor, buffer: io.StringIO):
+    """Envoie le tampon CSV dans la table de transit par COPY FROM STDIN puis le vide."""
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY dvf_staging ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    buffer.seek(0)
+    buffer.truncate()
@@ -0,0 +1,187 @@
+"""
+Export de dvf_records en Parquet pour les analyses de marche (services/dvf_analytics.py)
+Arborescence Hive sous DVF_DATA_PATH/parquet : departement=XX/year=AAAA/part-0.parquet,
+un fichier par partition (departement, annee) de dvf_records. Chaque partition est
+lue par COPY TO STDOUT (une seule partition PostgreSQL parcourue), convertie en
+table Arrow typee, triee par commune et date, puis ecrite (zstd) dans un fichier
+temporaire renomme : un lecteur ne voit jamais de fichier partiel.
+Incremental : seules les partitions ecrites ou videes par les imports depuis le
+dernier export (dvf_import_files.parquet_partitions) sont reecrites. Les annees detachees de dvf_records
+(scripts/dvf_partitions.py) restent dans le cache.
+"""
+import io
+import os
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.dvf_partitions import departement_partition_name
+from app.services.jobs import Job
+
+DVF_PARQUET_DIR = "parquet"  # Sous-repertoire de DVF_DATA_PATH
+DVF_PARQUET_ROW_GROUP = 64_000  # Lignes par groupe (statistiques min/max pour l'elagage)
+DVF_PARQUET_COMPRESSION = "zstd"
+
+# Colonnes des fichiers ; departement et year sont portes par les repertoires
+DVF_PARQUET_SCHEMA = pa.schema([
+    ("mutation_id", pa.string()),
+    ("mutation_date", pa.date32()),
+    ("numero_disposition", pa.string()),
+    ("nature_mutation", pa.string()),
+    ("valeur_fonciere", pa.float64()),
+    ("adresse", pa.string()),
+    ("code_postal", pa.string()),
+    ("commune", pa.string()),
+    ("code_commune", pa.string()),
+    ("type_local", pa.string()),
+    ("code_type_local", pa.string()),
+    ("surface_reelle_bati", pa.float64()),
+    ("surface_terrain", pa.float64()),
+    ("nombre_pieces_principales", pa.int32()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+])
+
+DVF_PARQUET_PARTITIONING = ds.partitioning(
+    pa.schema([("departement", pa.string()), ("year", pa.int32())]), flavor="hive"
+)
+
+_PENDING_FILES_SQL = text("""
+    SELECT file_name, parquet_partitions FROM dvf_import_files
+    WHERE exported_at IS NULL OR exported_at < loaded_at
+    ORDER BY file_name
+""")
+
+_PAIRS_SQL = """
+    SELECT DISTINCT departement, extract(year FROM mutation_date)::int AS year
+    FROM dvf_records {where}
+    ORDER BY departement, year
+"""
+
+_MARK_EXPORTED_SQL = text("""
+    UPDATE dvf_import_files SET exported_at = :now, parquet_partitions = NULL WHERE file_name = ANY(:files)
+""")
+
+# Tri des lignes : groupes de lignes compacts par commune (elagage des filtres code_commune)
+_COPY_PARTITION_SQL = (
+    "COPY (SELECT {columns} FROM dvf_records"
+    " WHERE departement = %s AND mutation_date >= %s AND mutation_date < %s"
+    " ORDER BY code_commune, mutation_date) TO STDOUT WITH (FORMAT csv, HEADER true)"
+)
+
+
+def dvf_parquet_root() -> str:
+    return os.path.join(settings.DVF_DATA_PATH, DVF_PARQUET_DIR)
+
+
+def parquet_partition_path(departement: str, year: int) -> str:
+    """Fichier Parquet d'une partition ; leve ValueError si le departement est invalide."""
+    departement_partition_name(departement)
+    return os.path.join(
+        dvf_parquet_root(), f"departement={departement.strip().upper()}", f"year={int(year)}", "part-0.parquet"
+    )
+
+
+def export_dvf_partition(db: Session, departement: str, year: int) -> Tuple[int, int]:
+    """
+    Reecrit le fichier Parquet d'une partition (departement, annee) depuis
+    dvf_records ; le supprime si la partition est vide. Retourne (lignes, octets).
+    """
+    path = parquet_partition_path(departement, year)
+    cursor = db.connection().connection.cursor()
+    sql = cursor.mogrify(
+        _COPY_PARTITION_SQL.format(columns=", ".join(DVF_PARQUET_SCHEMA.names)),
+        (departement.strip().upper(), date(year, 1, 1), date(year + 1, 1, 1)),
+    ).decode()
+    buffer = io.BytesIO()
+    cursor.copy_expert(sql, buffer)
+    buffer.seek(0)
+
+    table = pa_csv.read_csv(
+        buffer,
+        convert_options=pa_csv.ConvertOptions(column_types=DVF_PARQUET_SCHEMA, strings_can_be_null=True),
+    )
+    if not table.num_rows:
+        if os.path.exists(path):
+            os.remove(path)
+        return 0, 0
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(
+        table.select(DVF_PARQUET_SCHEMA.names).cast(DVF_PARQUET_SCHEMA),
+        tmp_path,
+        compression=DVF_PARQUET_COMPRESSION,
+        row_group_size=DVF_PARQUET_ROW_GROUP,
+    )
+    os.replace(tmp_path, path)
+    return table.num_rows, os.path.getsize(path)
+
+
+def export_dvf_parquet(
+    db: Session,
+    full: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Exporte en Parquet les partitions touchees (lignes ecrites ou supprimees) par
+    les fichiers DVF importes (ou reimportes) depuis le dernier export, ou toutes si full.
+    progress(partitions ecrites, total) est appele apres chaque partition.
+    """
+    started_at = time.perf_counter()
+    if full:
+        files = list(db.execute(text("SELECT file_name FROM dvf_import_files")).scalars())
+        # Toutes les partitions, y compris les lignes anterieures au suivi des fichiers
+        pairs = [(row.departement, row.year) for row in db.execute(text(_PAIRS_SQL.format(where="")))]
+    else:
+        pending = db.execute(_PENDING_FILES_SQL).all()
+        files = [row.file_name for row in pending]
+        touched = {tuple(pair) for row in pending for pair in (row.parquet_partitions or [])}
+        # Fichiers importes avant le suivi des partitions : lignes encore presentes
+        untracked = [row.file_name for row in pending if row.parquet_partitions is None]
+        if untracked:
+            touched |= {
+                (row.departement, row.year)
+                for row in db.execute(text(_PAIRS_SQL.format(where="WHERE source_file = ANY(:files)")),
+                                      {"files": untracked})
+            }
+        pairs = sorted(touched)
+    report = {"files": len(files), "partitions": 0, "rows": 0, "size_bytes": 0, "seconds": 0.0}
+    if not files and not full:
+        return report
+
+    now = datetime.utcnow()
+    try:
+        for done, (departement, year) in enumerate(pairs, start=1):
+            rows, size = export_dvf_partition(db, departement, year)
+            report["rows"] += rows
+            report["size_bytes"] += size
+            if progress:
+                progress(done, len(pairs))
+        db.execute(_MARK_EXPORTED_SQL, {"now": now, "files": files})
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+    report["partitions"] = len(pairs)
+    report["seconds"] = round(time.perf_counter() - started_at, 3)
+    return report
+
+
+def run_dvf_parquet_export_job(job: Job, full: bool = False) -> Dict[str, Any]:
+    """Point d'entree des taches de fond : session dediee, partitions ecrites reportees dans job."""
+    db = SessionLocal()
+    try:
+        return export_dvf_parquet(db, full=full, progress=job.report)
+    finally:
+        db.close()
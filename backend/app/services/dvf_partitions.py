@@ -0,0 +1,145 @@
+"""
+Partitions de dvf_records : par departement (LIST) puis par annee de mutation (RANGE)
+Les partitions sont creees a la demande avant chaque fusion d'import. Les index
+declares sur la table mere (BRIN sur mutation_date, GIST sur geom, cle de fusion)
+sont crees automatiquement sur chaque partition. Une annee ancienne se detache
+(ou se supprime) partition par partition, sans reecrire la table ; une table
+detachee (archive) n'est ni recreee ni rattachee par les imports suivants.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+
+DVF_PARENT_TABLE = "dvf_records"
+
+# Codes departement admis dans un nom de table (01..95, 2a, 2b, 971..976)
+_DEPARTEMENT_PATTERN = re.compile(r"^[0-9][0-9ab][0-9]?$")
+
+_PARTITIONS_SQL = text("""
+    SELECT child.relname AS name,
+           pg_get_expr(child.relpartbound, child.oid) AS bound,
+           parent.relname AS parent,
+           child.relkind = 'p' AS partitioned,
+           child.reltuples::bigint AS estimated_rows,
+           pg_total_relation_size(child.oid) AS size_bytes
+    FROM pg_inherits i
+    JOIN pg_class child ON child.oid = i.inhrelid
+    JOIN pg_class parent ON parent.oid = i.inhparent
+    WHERE parent.relname = :parent
+       OR parent.oid IN (
+           SELECT inhrelid FROM pg_inherits
+           WHERE inhparent = (:parent)::regclass
+       )
+    ORDER BY child.relname
+""")
+
+
+def departement_partition_name(departement: str) -> str:
+    """Nom de la partition d'un departement ; leve ValueError si le code est invalide."""
+    code = departement.strip().lower()
+    if not _DEPARTEMENT_PATTERN.match(code):
+        raise ValueError(f"Code departement invalide : {departement!r}")
+    return f"{DVF_PARENT_TABLE}_{code}"
+
+
+def year_partition_name(departement: str, year: int) -> str:
+    return f"{departement_partition_name(departement)}_{int(year)}"
+
+
+def ensure_dvf_partitions(pairs: Iterable[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """
+    Cree les partitions (departement, annee) manquantes dans une transaction
+    courte et separee. CREATE TABLE (LIKE) puis ATTACH PARTITION ne prennent
+    qu'un verrou SHARE UPDATE EXCLUSIVE sur la table mere : ni les lecteurs ni
+    un import en cours (table de transit ouverte) ne sont bloques.
+    Retourne les couples (departement, annee) dont la table existe mais est
+    detachee (annee archivee par detach_dvf_year) : aucune partition pour leurs lignes.
+    """
+    years_by_departement: Dict[str, set] = {}
+    for departement, year in pairs:
+        departement_partition_name(departement)
+        years_by_departement.setdefault(departement.strip().upper(), set()).add(int(year))
+    if not years_by_departement:
+        return []
+
+    detached: List[Tuple[str, int]] = []
+    db = SessionLocal()
+    try:
+        for departement, years in sorted(years_by_departement.items()):
+            parent = departement_partition_name(departement)
+            if _table_exists(db, parent) and not _is_attached(db, parent, DVF_PARENT_TABLE):
+                detached += [(departement, year) for year in sorted(years)]
+                continue
+            if not _table_exists(db, parent):
+                db.execute(text(
+                    f"CREATE TABLE {parent} (LIKE {DVF_PARENT_TABLE} INCLUDING DEFAULTS) "
+                    f"PARTITION BY RANGE (mutation_date)"
+                ))
+                db.execute(text(
+                    f"ALTER TABLE {DVF_PARENT_TABLE} ATTACH PARTITION {parent} "
+                    f"FOR VALUES IN ('{departement}')"
+                ))
+            for year in sorted(years):
+                name = year_partition_name(departement, year)
+                if _table_exists(db, name):
+                    if not _is_attached(db, name, parent):
+                        detached.append((departement, year))
+                    continue
+                db.execute(text(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS)"))
+                db.execute(text(
+                    f"ALTER TABLE {parent} ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+                ))
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return detached
+
+
+def list_dvf_partitions(db: Session) -> List[Dict[str, Any]]:
+    """Partitions departement et annee avec leurs bornes, lignes estimees et taille disque."""
+    return [dict(row._mapping) for row in db.execute(_PARTITIONS_SQL, {"parent": DVF_PARENT_TABLE})]
+
+
+def detach_dvf_year(db: Session, year: int, drop: bool = False) -> List[str]:
+    """
+    Detache de tous les departements la partition de l'annee : les lignes
+    quittent dvf_records sans reecriture (table conservee pour archivage,
+    pg_dump...), ou sont supprimees si drop. Retourne les tables traitees.
+    """
+    suffix = f"_{int(year)}"
+    names = [
+        (row["parent"], row["name"]) for row in list_dvf_partitions(db)
+        if row["parent"] != DVF_PARENT_TABLE and row["name"].endswith(suffix)
+    ]
+    try:
+        for parent, name in names:
+            db.execute(text(f"ALTER TABLE {parent} DETACH PARTITION {name}"))
+            if drop:
+                db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return [name for _parent, name in names]
+
+
+def _table_exists(db: Session, name: str) -> bool:
+    return db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def _is_attached(db: Session, name: str, parent: str) -> bool:
+    """Table attachee comme partition de parent (une table detachee existe encore)."""
+    return db.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_inherits
+            WHERE inhrelid = to_regclass(:name) AND inhparent = to_regclass(:parent)
+        )
+    """), {"name": name, "parent": parent}).scalar()
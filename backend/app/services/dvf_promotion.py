@@ -0,0 +1,234 @@
+"""
+Promotion des mutations DVF dans le pool de comparables
+Pipeline ensembliste en SQL : regroupement des lots par mutation, filtrage des
+locaux professionnels, prix au m2, exclusion des valeurs aberrantes par
+departement et type, puis insertion ou mise a jour dans comparable_pool
+(source concurrence, source_reference = mutation_id). Incremental : seules les
+mutations des fichiers importes depuis la derniere promotion sont traitees.
+"""
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ComparablePool, PropertyType
+from app.services.comparable_service import notify_pool_delete, notify_pool_write
+from app.services.jobs import Job
+
+# code_type_local DVF -> type de bien du pool. DVF ne distingue pas bureaux,
+# commerces et activite : un seul code professionnel (4)
+DVF_PROPERTY_TYPES = {
+    "4": PropertyType.MIXED.value,  # Local industriel. commercial ou assimile
+}
+
+# Natures de mutation retenues (hors adjudications, echanges, expropriations)
+DVF_SALE_NATURES = ("Vente", "Vente en l'état futur d'achèvement")
+
+DVF_MIN_SURFACE = 10.0    # m2 batis cumules de la mutation
+DVF_MIN_PRICE = 1000.0    # EUR
+
+# Valeurs aberrantes : ln(prix/m2) hors [Q1 - k.IQR, Q3 + k.IQR] par (departement, type)
+DVF_OUTLIER_IQR_FACTOR = 1.5
+DVF_OUTLIER_MIN_GROUP = 20  # En dessous, pas d'exclusion statistique
+
+_PROPERTY_TYPE_CASE = "CASE main_code {} END".format(
+    " ".join(f"WHEN '{code}' THEN '{ptype}'" for code, ptype in DVF_PROPERTY_TYPES.items())
+)
+
+_PENDING_FILES_SQL = text("""
+    SELECT file_name FROM dvf_import_files
+    WHERE promoted_at IS NULL OR promoted_at < loaded_at
+    ORDER BY file_name
+""")
+
+_DEPARTEMENTS_SQL = text("""
+    SELECT DISTINCT departement FROM dvf_records WHERE source_file = ANY(:files)
+""")
+
+# Une ligne par mutation (toutes ses dispositions professionnelles), sur les
+# departements concernes : l'historique complet sert au calcul des bornes
+_CANDIDATES_SQL = text(f"""
+    CREATE TEMP TABLE dvf_candidates ON COMMIT DROP AS
+    SELECT mutation_id, source_file, departement, transaction_date, price, surface, lots,
+           address, postal_code, city, insee_code, latitude, longitude,
+           {_PROPERTY_TYPE_CASE} AS property_type,
+           price / surface AS price_per_m2
+    FROM (
+        SELECT mutation_id,
+               min(source_file) AS source_file,
+               min(departement) AS departement,
+               min(mutation_date) AS transaction_date,
+               max(valeur_fonciere) AS price,  -- Repetee sur chaque ligne de la mutation
+               sum(surface_reelle_bati) AS surface,
+               count(*) AS lots,
+               (array_agg(code_type_local ORDER BY surface_reelle_bati DESC NULLS LAST))[1] AS main_code,
+               (array_agg(adresse ORDER BY surface_reelle_bati DESC NULLS LAST))[1] AS address,
+               (array_agg(code_postal ORDER BY surface_reelle_bati DESC NULLS LAST))[1] AS postal_code,
+               (array_agg(commune ORDER BY surface_reelle_bati DESC NULLS LAST))[1] AS city,
+               (array_agg(code_commune ORDER BY surface_reelle_bati DESC NULLS LAST))[1] AS insee_code,
+               avg(latitude) AS latitude,
+               avg(longitude) AS longitude
+        FROM dvf_records
+        WHERE departement = ANY(:departements)
+          AND nature_mutation = ANY(:natures)
+        GROUP BY mutation_id
+        HAVING bool_and(code_type_local = ANY(:codes))
+           AND sum(surface_reelle_bati) >= :min_surface
+           AND max(valeur_fonciere) >= :min_price
+           AND avg(latitude) IS NOT NULL AND avg(longitude) IS NOT NULL
+    ) mutations
+""")
+
+# Mutations des fichiers traites, hors valeurs aberrantes
+_PROMOTABLE_SQL = text("""
+    CREATE TEMP TABLE dvf_promotable ON COMMIT DROP AS
+    WITH fences AS (
+        SELECT departement, property_type, count(*) AS n,
+               percentile_cont(0.25) WITHIN GROUP (ORDER BY ln(price_per_m2)) AS q1,
+               percentile_cont(0.75) WITHIN GROUP (ORDER BY ln(price_per_m2)) AS q3
+        FROM dvf_candidates
+        GROUP BY departement, property_type
+    )
+    SELECT c.*
+    FROM dvf_candidates c
+    JOIN fences f USING (departement, property_type)
+    WHERE c.source_file = ANY(:files)
+      AND (f.n < :min_group
+           OR ln(c.price_per_m2) BETWEEN f.q1 - :k * (f.q3 - f.q1) AND f.q3 + :k * (f.q3 - f.q1))
+""")
+
+_UPSERT_SQL = text("""
+    WITH updated AS (
+        UPDATE comparable_pool p SET
+            address = coalesce(c.address, c.city),
+            postal_code = c.postal_code,
+            city = c.city,
+            insee_code = c.insee_code,
+            latitude = c.latitude,
+            longitude = c.longitude,
+            property_type = c.property_type,
+            surface = c.surface,
+            price = c.price,
+            price_per_m2 = c.price_per_m2,
+            transaction_date = c.transaction_date,
+            updated_at = :now
+        FROM dvf_promotable c
+        JOIN dvf_promotions m ON m.mutation_id = c.mutation_id
+        -- Valeurs d'avant la mise a jour : tuiles de l'ancienne position a invalider
+        JOIN comparable_pool old ON old.id = m.pool_id
+        WHERE p.id = m.pool_id
+          AND (p.latitude, p.longitude, p.property_type, p.surface, p.price, p.transaction_date, p.address)
+              IS DISTINCT FROM (c.latitude, c.longitude, c.property_type, c.surface, c.price,
+                                c.transaction_date, coalesce(c.address, c.city))
+        RETURNING p.id, old.property_type AS old_property_type,
+                  old.latitude AS old_latitude, old.longitude AS old_longitude
+    ),
+    inserted AS (
+        INSERT INTO comparable_pool (
+            address, postal_code, city, insee_code, latitude, longitude,
+            property_type, surface, transaction_type, price, price_per_m2, transaction_date,
+            source, source_reference, status, created_at, updated_at
+        )
+        SELECT coalesce(c.address, c.city), c.postal_code, c.city, c.insee_code, c.latitude, c.longitude,
+               c.property_type, c.surface, 'sale'::transactiontype, c.price, c.price_per_m2, c.transaction_date,
+               'concurrence'::comparablesource, c.mutation_id, 'transaction', :now, :now
+        FROM dvf_promotable c
+        WHERE NOT EXISTS (SELECT 1 FROM dvf_promotions m WHERE m.mutation_id = c.mutation_id)
+          -- Mutations fusionnees comme doublons d'un autre bien (services/comparable_dedup.py)
+          AND NOT EXISTS (
+              SELECT 1 FROM comparable_pool_merges g
+              WHERE g.source_reference = c.mutation_id AND g.source = 'concurrence'
+          )
+        RETURNING id, source_reference
+    ),
+    ledger AS (
+        INSERT INTO dvf_promotions (mutation_id, pool_id, source_file, promoted_at)
+        SELECT i.source_reference, i.id, c.source_file, :now
+        FROM inserted i
+        JOIN dvf_promotable c ON c.mutation_id = i.source_reference
+    )
+    -- Biens mis a jour : type et position d'avant l'ecriture
+    SELECT id, false AS inserted, old_property_type AS property_type,
+           old_latitude AS latitude, old_longitude AS longitude
+    FROM updated
+    UNION ALL
+    SELECT id, true AS inserted, NULL, NULL, NULL FROM inserted
+""")
+
+# Mutations promues qui ne sont plus retenues (retirees de DVF, devenues aberrantes...) :
+# la ligne de dvf_promotions suit par ON DELETE CASCADE
+_DELETE_WITHDRAWN_SQL = text("""
+    DELETE FROM comparable_pool p
+    USING dvf_promotions m
+    WHERE m.pool_id = p.id
+      AND m.source_file = ANY(:files)
+      AND NOT EXISTS (SELECT 1 FROM dvf_promotable c WHERE c.mutation_id = m.mutation_id)
+    RETURNING p.id, p.property_type, p.latitude, p.longitude
+""")
+
+_MARK_PROMOTED_SQL = text("""
+    UPDATE dvf_import_files SET promoted_at = :now WHERE file_name = ANY(:files)
+""")
+
+
+def promote_dvf_mutations(db: Session, full: bool = False) -> Dict[str, Any]:
+    """
+    Promeut dans comparable_pool les mutations des fichiers DVF importes (ou
+    reimportes) depuis la derniere promotion, ou de tous les fichiers si full.
+    Une seule transaction ; caches et snapshot du pool mis a jour apres commit.
+    """
+    if full:
+        files = list(db.execute(text("SELECT file_name FROM dvf_import_files")).scalars())
+    else:
+        files = list(db.execute(_PENDING_FILES_SQL).scalars())
+    report = {"files": len(files), "candidates": 0, "promotable": 0, "inserted": 0, "updated": 0, "deleted": 0}
+    if not files:
+        return report
+
+    now = datetime.utcnow()
+    try:
+        departements = list(db.execute(_DEPARTEMENTS_SQL, {"files": files}).scalars())
+        db.execute(_CANDIDATES_SQL, {
+            "departements": departements,
+            "natures": list(DVF_SALE_NATURES),
+            "codes": list(DVF_PROPERTY_TYPES),
+            "min_surface": DVF_MIN_SURFACE,
+            "min_price": DVF_MIN_PRICE,
+        })
+        db.execute(_PROMOTABLE_SQL, {"files": files, "min_group": DVF_OUTLIER_MIN_GROUP, "k": DVF_OUTLIER_IQR_FACTOR})
+        report["candidates"] = db.execute(
+            text("SELECT count(*) FROM dvf_candidates WHERE source_file = ANY(:files)"), {"files": files}
+        ).scalar()
+        report["promotable"] = db.execute(text("SELECT count(*) FROM dvf_promotable")).scalar()
+
+        written = db.execute(_UPSERT_SQL, {"now": now}).all()
+        deleted = db.execute(_DELETE_WITHDRAWN_SQL, {"files": files}).all()
+        db.execute(_MARK_PROMOTED_SQL, {"now": now, "files": files})
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+    report["inserted"] = sum(1 for row in written if row.inserted)
+    report["updated"] = len(written) - report["inserted"]
+    report["deleted"] = len(deleted)
+
+    # Structures derivees (snapshot memoire, cache de recherche, tuiles)
+    if written:
+        ids = [row.id for row in written]
+        previous = [row for row in written if not row.inserted]
+        notify_pool_write(db.query(ComparablePool).filter(ComparablePool.id.in_(ids)).all(), previous)
+    if deleted:
+        notify_pool_delete(deleted)
+    return report
+
+
+def run_dvf_promotion_job(job: Job, full: bool = False) -> Dict[str, Any]:
+    """Point d'entree des taches de fond : session dediee."""
+    db = SessionLocal()
+    try:
+        return promote_dvf_mutations(db, full=full)
+    finally:
+        db.close()
@@ -0,0 +1,231 @@
+"""
+Recherche des mutations DVF et agregats de marche calcules en base
+Un critere de localisation est obligatoire (rayon, emprise ou commune) : index
+GIST de geom par partition, ou code_commune. Les partitions sont elaguees sur
+la date et sur le departement (communes du perimetre ou code INSEE). Les lignes
+d'une meme mutation (lots) sont regroupees : prix de la mutation, surfaces
+baties cumulees.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+from geoalchemy2 import Geography, Geometry
+from sqlalchemy import Date, DateTime, and_, cast, func, literal_column, select, type_coerce
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.orm import Session
+
+from app.models import Commune, DVFRecord
+
+_GEOGRAPHY = Geography(geometry_type="POINT", srid=4326, spatial_index=False)
+_GEOGRAPHY_AREA = Geography(srid=4326, spatial_index=False)
+_GEOMETRY_AREA = Geometry(srid=4326, spatial_index=False)
+
+
+@dataclass
+class DvfSearchParams:
+    """Criteres de recherche ; un seul critere de localisation est retenu (rayon, emprise puis commune)"""
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    radius_m: Optional[float] = None
+    min_lat: Optional[float] = None
+    min_lng: Optional[float] = None
+    max_lat: Optional[float] = None
+    max_lng: Optional[float] = None
+    insee_code: Optional[str] = None
+    type_local: Optional[Sequence[str]] = None
+    date_min: Optional[date] = None
+    date_max: Optional[date] = None
+    surface_min: Optional[float] = None
+    surface_max: Optional[float] = None
+
+    @property
+    def has_radius(self) -> bool:
+        return None not in (self.latitude, self.longitude, self.radius_m)
+
+    @property
+    def has_bbox(self) -> bool:
+        return None not in (self.min_lat, self.min_lng, self.max_lat, self.max_lng)
+
+    @property
+    def has_location(self) -> bool:
+        return self.has_radius or self.has_bbox or bool(self.insee_code)
+
+
+def insee_departement(insee_code: str) -> str:
+    """Departement d'un code INSEE (3 caracteres outre-mer, 2A/2B en Corse)."""
+    code = insee_code.strip().upper()
+    return code[:3] if code.startswith("97") else code[:2]
+
+
+def search_dvf(db: Session, params: DvfSearchParams, page: int = 1, page_size: int = 50) -> Dict[str, Any]:
+    """
+    Mutations correspondant aux criteres (plus recentes d'abord, paginees) et
+    agregats sur l'ensemble du resultat : nombre de mutations, mediane du prix
+    au m2 et serie trimestrielle. Deux requetes sur le meme sous-ensemble filtre.
+    """
+    mutations = _mutations_query(db, params).cte("mutations")
+
+    price_per_m2 = mutations.c.price / mutations.c.surface
+    priced = and_(mutations.c.price > 0, mutations.c.surface > 0)
+    median = func.percentile_cont(0.5).within_group(price_per_m2).filter(priced)
+    quarter = cast(func.date_trunc("quarter", cast(mutations.c.mutation_date, DateTime)), Date)
+    # GROUPING SETS : une ligne par trimestre et une ligne de total (quarter NULL)
+    aggregates = db.execute(
+        select(
+            quarter.label("quarter"),
+            func.count().label("count"),
+            median.label("median_price_per_m2"),
+        )
+        .group_by(func.grouping_sets(quarter, literal_column("()")))
+        .order_by(quarter)
+    ).all()
+
+    total, overall_median, quarterly = 0, None, []
+    for row in aggregates:
+        if row.quarter is None:
+            total, overall_median = row.count, _round(row.median_price_per_m2)
+            continue
+        quarterly.append({
+            "quarter": f"{row.quarter.year}-Q{(row.quarter.month - 1) // 3 + 1}",
+            "start_date": row.quarter.isoformat(),
+            "count": row.count,
+            "median_price_per_m2": _round(row.median_price_per_m2),
+        })
+
+    items = []
+    if total > (page - 1) * page_size:
+        columns = [mutations]
+        if params.has_radius:
+            point = _geography_point(params.latitude, params.longitude)
+            columns.append(func.ST_Distance(cast(func.ST_SetSRID(
+                func.ST_MakePoint(mutations.c.longitude, mutations.c.latitude), 4326
+            ), _GEOGRAPHY), point).label("distance_m"))
+        rows = db.execute(
+            select(*columns)
+            .order_by(mutations.c.mutation_date.desc(), mutations.c.mutation_id)
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        ).all()
+        items = [_mutation_to_dict(row) for row in rows]
+
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (total + page_size - 1) // page_size,
+        "stats": {
+            "count": total,
+            "median_price_per_m2": overall_median,
+            "quarterly": quarterly,
+        },
+    }
+
+
+def _mutations_query(db: Session, params: DvfSearchParams) -> Any:
+    """Une ligne par mutation (departement, mutation_id) parmi les lignes DVF filtrees."""
+    d = DVFRecord
+    conditions = []
+    if params.has_radius:
+        point = _geography_point(params.latitude, params.longitude)
+        conditions.append(func.ST_DWithin(d.geom, point, params.radius_m))
+        departements = _area_departements(db, cast(func.ST_Buffer(point, params.radius_m), _GEOMETRY_AREA))
+    elif params.has_bbox:
+        envelope = func.ST_MakeEnvelope(params.min_lng, params.min_lat, params.max_lng, params.max_lat, 4326)
+        conditions.append(d.geom.op("&&")(cast(envelope, _GEOGRAPHY_AREA)))
+        departements = _area_departements(db, envelope)
+    else:
+        conditions.append(d.code_commune == params.insee_code.strip().upper())
+        departements = [insee_departement(params.insee_code)]
+    # Liste litterale : elagage des partitions departement a la planification
+    if departements:
+        conditions.append(d.departement.in_(departements))
+
+    if params.date_min:
+        conditions.append(d.mutation_date >= params.date_min)
+    if params.date_max:
+        conditions.append(d.mutation_date <= params.date_max)
+
+    by_surface = d.surface_reelle_bati.desc().nullslast()
+    surface = func.sum(d.surface_reelle_bati)
+    query = (
+        select(
+            d.mutation_id,
+            d.departement,
+            func.min(d.mutation_date).label("mutation_date"),
+            func.min(d.nature_mutation).label("nature_mutation"),
+            func.max(d.valeur_fonciere).label("price"),  # Repetee sur chaque ligne de la mutation
+            surface.label("surface"),
+            func.count().label("lots"),
+            _first(d.type_local, by_surface).label("type_local"),
+            _first(d.adresse, by_surface).label("address"),
+            _first(d.code_postal, by_surface).label("postal_code"),
+            _first(d.commune, by_surface).label("city"),
+            _first(d.code_commune, by_surface).label("insee_code"),
+            func.avg(d.latitude).label("latitude"),
+            func.avg(d.longitude).label("longitude"),
+        )
+        .where(*conditions)
+        .group_by(d.departement, d.mutation_id)
+    )
+    # Type filtre sur les locaux batis de la mutation entiere : son prix les couvre
+    # tous ; dependances (cave, parking) et terrain seul sans surface batie ignores,
+    # comme dans dvf_analytics
+    if params.type_local:
+        query = query.having(
+            func.bool_and(d.type_local.in_(list(params.type_local))).filter(d.surface_reelle_bati > 0)
+        )
+    if params.surface_min is not None:
+        query = query.having(surface >= params.surface_min)
+    if params.surface_max is not None:
+        query = query.having(surface <= params.surface_max)
+    return query
+
+
+def _area_departements(db: Session, area: Any) -> List[str]:
+    """
+    Departements des communes intersectant le perimetre (index GIST des contours).
+    Liste vide si les contours ne sont pas charges : pas d'elagage.
+    """
+    return list(db.execute(
+        select(Commune.departement).distinct()
+        .where(func.ST_Intersects(Commune.geom, area), Commune.departement.is_not(None))
+    ).scalars())
+
+
+def _geography_point(lat: float, lng: float) -> Any:
+    return cast(func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326), _GEOGRAPHY)
+
+
+def _first(column: Any, order: Any) -> Any:
+    """Valeur de la ligne principale de la mutation (plus grande surface batie)."""
+    return type_coerce(func.array_agg(aggregate_order_by(column, order)), ARRAY(column.type))[1]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+def _mutation_to_dict(row: Any) -> Dict[str, Any]:
+    price_per_m2 = row.price / row.surface if row.price and row.surface else None
+    item = {
+        "mutation_id": row.mutation_id,
+        "mutation_date": row.mutation_date.isoformat() if row.mutation_date else None,
+        "nature_mutation": row.nature_mutation,
+        "type_local": row.type_local,
+        "address": row.address,
+        "postal_code": row.postal_code,
+        "city": row.city,
+        "insee_code": row.insee_code,
+        "departement": row.departement,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "price": row.price,
+        "surface": row.surface,
+        "price_per_m2": _round(price_per_m2),
+        "lots": row.lots,
+    }
+    if "distance_m" in row._fields:
+        item["distance_m"] = _round(row.distance_m)
+    return item
@@ -0,0 +1,335 @@
+"""
+Service de geocodage des adresses
+Trois niveaux : cache memoire LRU, cache persistant (table geocode_cache) puis
+chaine de geocodeurs (GEOCODER_BACKENDS : BAN locale, Nominatim). La cle des
+caches est l'adresse normalisee.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from geopy.geocoders import Nominatim
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import GeocodeCache
+from app.services.ban import ban_lookup
+from app.utils.cache import TTLCache
+from app.utils.address import normalize_address
+from app.utils.rate_limit import TokenBucket
+
+GEOCODE_PROVIDER_NOMINATIM = "nominatim"  # Service distant OpenStreetMap (1 requete/s)
+GEOCODE_PROVIDER_BAN = "ban"              # Base Adresse Nationale locale (table ban_addresses)
+
+# Nombre de latences conservees par niveau pour les percentiles
+_LATENCY_WINDOW = 1000
+
+# Resultats enregistres par requete lors d'un geocodage par lot
+_CACHE_WRITE_BATCH = 200
+
+_MISSING = object()
+
+# Threads des geocodages demandes par les routes async (hors boucle d'evenements)
+_request_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.GEOCODE_REQUEST_WORKERS), thread_name_prefix="geocode"
+)
+
+geocode_memory_cache = TTLCache(
+    maxsize=settings.GEOCODE_MEMORY_CACHE_SIZE,
+    ttl=settings.GEOCODE_MEMORY_CACHE_TTL_SECONDS,
+)
+
+
+
+class NominatimGeocoder:
+    """
+    Geocodeur distant Nominatim (client partage entre les appels). Les appels de
+    tous les threads passent par un seau a jetons (politique d'usage : 1 requete/s).
+    """
+    name = GEOCODE_PROVIDER_NOMINATIM
+
+    def __init__(self):
+        self._client: Optional[Nominatim] = None
+        self._rate_limiter = TokenBucket(settings.NOMINATIM_RATE_PER_SECOND)
+
+    def geocode(self, address: str) -> Optional[Tuple[float, float]]:
+        """None si adresse introuvable ; leve GeocoderServiceError si le service echoue."""
+        if self._client is None:
+            self._client = Nominatim(user_agent="oryem-app", timeout=10)
+        self._rate_limiter.acquire()
+        location = self._client.geocode(address, country_codes="fr")
+        if location:
+            return (location.latitude, location.longitude)
+        return None
+
+
+class BanGeocoder:
+    """Geocodeur hors ligne sur l'extrait BAN charge en base"""
+    name = GEOCODE_PROVIDER_BAN
+
+    def geocode(self, address: str) -> Optional[Tuple[float, float]]:
+        db = SessionLocal()
+        try:
+            return ban_lookup(db, address)
+        finally:
+            db.close()
+
+
+GEOCODER_CLASSES = {
+    GEOCODE_PROVIDER_BAN: BanGeocoder,
+    GEOCODE_PROVIDER_NOMINATIM: NominatimGeocoder,
+}
+
+_geocoders: Optional[List[Any]] = None
+
+
+def get_geocoders() -> List[Any]:
+    """Chaine de geocodeurs configuree (GEOCODER_BACKENDS), instanciee une seule fois."""
+    global _geocoders
+    if _geocoders is None:
+        _geocoders = [GEOCODER_CLASSES[name]() for name in settings.GEOCODER_BACKENDS]
+    return _geocoders
+
+
+class _GeocodeMetrics:
+    """Compteurs par niveau de resolution (memory, database, provider) et latences"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"memory": 0, "database": 0, "provider": 0, "error": 0}
+        self.providers: Dict[str, int] = {}  # Resolutions par geocodeur
+        self.latencies: Dict[str, deque] = {
+            level: deque(maxlen=_LATENCY_WINDOW) for level in ("memory", "database", "provider")
+        }
+
+    def record(self, level: str, started_at: Optional[float], provider: Optional[str] = None, count: int = 1):
+        """started_at None : compteurs seuls (resolutions par lot, latence non significative)."""
+        with self._lock:
+            self.counts[level] += count
+            if provider:
+                self.providers[provider] = self.providers.get(provider, 0) + count
+            if started_at is not None and level in self.latencies:
+                self.latencies[level].append((time.perf_counter() - started_at) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            providers = dict(self.providers)
+            latencies = {level: np.array(values) for level, values in self.latencies.items()}
+        lookups = sum(counts.values())
+        cached = counts["memory"] + counts["database"]
+        return {
+            "lookups": lookups,
+            "memory_hits": counts["memory"],
+            "database_hits": counts["database"],
+            "provider_calls": counts["provider"],
+            "providers": providers,
+            "errors": counts["error"],
+            "hit_rate": round(cached / lookups, 4) if lookups else None,
+            "latency_ms": {
+                level: {
+                    "p50": round(float(np.percentile(values, 50)), 2),
+                    "p95": round(float(np.percentile(values, 95)), 2),
+                } if values.size else None
+                for level, values in latencies.items()
+            },
+        }
+
+
+geocode_metrics = _GeocodeMetrics()
+
+
+def geocode_address(address: str) -> Optional[Tuple[float, float]]:
+    """
+    Geocode une adresse en coordonnees lat/lng.
+    Cache memoire, puis cache persistant, puis chaque geocodeur de la chaine
+    jusqu'au premier resultat. Retourne (latitude, longitude) ou None si echec.
+    """
+    started_at = time.perf_counter()
+    key = normalize_address(address)
+    if not key:
+        return None
+
+    coords = geocode_memory_cache.get(key, _MISSING)
+    if coords is not _MISSING:
+        geocode_metrics.record("memory", started_at)
+        return coords
+
+    coords = _read_persistent_cache([key]).get(key, _MISSING)
+    if coords is not _MISSING:
+        geocode_memory_cache.set(key, coords)
+        geocode_metrics.record("database", started_at)
+        return coords
+
+    coords, provider = _geocode_uncached(address)
+    if provider is None:
+        # Erreur transitoire : l'echec n'est pas mis en cache
+        geocode_metrics.record("error", started_at)
+        return None
+
+    _write_persistent_cache([_cache_row(key, address, coords, provider)])
+    geocode_memory_cache.set(key, coords)
+    geocode_metrics.record("provider", started_at, provider)
+    return coords
+
+
+async def geocode_address_async(address: str) -> Optional[Tuple[float, float]]:
+    """
+    geocode_address pour les routes async : execute dans un pool de threads
+    dedie, la boucle d'evenements n'attend jamais Nominatim.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_request_executor, geocode_address, address)
+
+
+def geocode_batch(
+    addresses: Iterable[str],
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Optional[Tuple[float, float]]]:
+    """
+    Geocode un lot d'adresses : dedoublonnage par adresse normalisee, caches
+    consultes en une requete, puis geocodeurs appeles par un pool borne de
+    GEOCODE_BATCH_WORKERS threads (Nominatim reste limite par son seau a jetons).
+    Les resultats sont enregistres en cache par paquets.
+    progress(traitees, total) est appele au fil de l'eau (adresses uniques).
+    Retourne {adresse brute: (latitude, longitude) ou None}.
+    """
+    addresses = list(addresses)
+    raw_by_key: Dict[str, str] = {}
+    for address in addresses:
+        key = normalize_address(address)
+        if key:
+            raw_by_key.setdefault(key, address)
+
+    resolved: Dict[str, Optional[Tuple[float, float]]] = {}
+    for key in raw_by_key:
+        coords = geocode_memory_cache.get(key, _MISSING)
+        if coords is not _MISSING:
+            resolved[key] = coords
+    memory_hits = len(resolved)
+
+    persisted = _read_persistent_cache([key for key in raw_by_key if key not in resolved])
+    for key, coords in persisted.items():
+        geocode_memory_cache.set(key, coords)
+    resolved.update(persisted)
+    geocode_metrics.record("memory", None, count=memory_hits)
+    geocode_metrics.record("database", None, count=len(persisted))
+
+    total = len(raw_by_key)
+    done = len(resolved)
+    if progress:
+        progress(done, total)
+
+    pending = [key for key in raw_by_key if key not in resolved]
+    rows = []
+    with ThreadPoolExecutor(max_workers=max(1, settings.GEOCODE_BATCH_WORKERS)) as executor:
+        futures = {executor.submit(_geocode_uncached, raw_by_key[key]): key for key in pending}
+        for future in as_completed(futures):
+            key = futures[future]
+            coords, provider = future.result()
+            if provider is None:
+                geocode_metrics.record("error", None)
+            else:
+                resolved[key] = coords
+                geocode_memory_cache.set(key, coords)
+                geocode_metrics.record("provider", None, provider)
+                rows.append(_cache_row(key, raw_by_key[key], coords, provider))
+                if len(rows) >= _CACHE_WRITE_BATCH:
+                    _write_persistent_cache(rows)
+                    rows = []
+            done += 1
+            if progress:
+                progress(done, total)
+    if rows:
+        _write_persistent_cache(rows)
+
+    return {address: resolved.get(normalize_address(address)) for address in addresses}
+
+
+def geocoding_stats() -> Dict[str, Any]:
+    """Taux de hit et latences par niveau, etat du cache memoire."""
+    return {**geocode_metrics.stats(), "memory_cache": geocode_memory_cache.stats()}
+
+
+def _geocode_uncached(address: str) -> Tuple[Optional[Tuple[float, float]], Optional[str]]:
+    """
+    Interroge la chaine de geocodeurs jusqu'au premier resultat.
+    Retourne (coordonnees ou None, geocodeur ayant conclu) ; geocodeur None si
+    aucun resultat et au moins une erreur transitoire (a ne pas mettre en cache).
+    """
+    coords, provider, failed = None, None, False
+    for geocoder in get_geocoders():
+        try:
+            coords = geocoder.geocode(address)
+        except (GeocoderTimedOut, GeocoderServiceError) as e:
+            print(f"Erreur geocodage ({geocoder.name}) pour '{address}': {e}")
+            failed = True
+            continue
+        provider = geocoder.name
+        if coords:
+            return coords, provider
+    return None, (None if failed else provider)
+
+
+def _read_persistent_cache(keys: List[str]) -> Dict[str, Optional[Tuple[float, float]]]:
+    """
+    Coordonnees en cache persistant (None si adresse introuvable), en une requete.
+    Les cles absentes ou expirees sont absentes du resultat.
+    """
+    if not keys:
+        return {}
+    db = SessionLocal()
+    try:
+        entries = db.execute(
+            select(
+                GeocodeCache.normalized_address, GeocodeCache.latitude,
+                GeocodeCache.longitude, GeocodeCache.created_at,
+            )
+            .where(GeocodeCache.normalized_address.in_(keys))
+        ).all()
+    finally:
+        db.close()
+
+    now = datetime.utcnow()
+    found_after = now - timedelta(days=settings.GEOCODE_CACHE_TTL_DAYS)
+    missing_after = now - timedelta(days=settings.GEOCODE_NEGATIVE_CACHE_TTL_DAYS)
+    cached = {}
+    for entry in entries:
+        found = entry.latitude is not None and entry.longitude is not None
+        if entry.created_at >= (found_after if found else missing_after):
+            cached[entry.normalized_address] = (entry.latitude, entry.longitude) if found else None
+    return cached
+
+
+def _cache_row(key: str, address: str, coords: Optional[Tuple[float, float]], provider: str) -> Dict[str, Any]:
+    return {
+        "normalized_address": key,
+        "address": address,
+        "latitude": coords[0] if coords else None,
+        "longitude": coords[1] if coords else None,
+        "provider": provider,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _write_persistent_cache(rows: List[Dict[str, Any]]):
+    """Enregistre (ou rafraichit) des resultats de geocodage en une requete."""
+    stmt = insert(GeocodeCache).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GeocodeCache.normalized_address],
+        set_={name: stmt.excluded[name] for name in rows[0] if name != "normalized_address"},
+    )
+    db = SessionLocal()
+    try:
+        db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
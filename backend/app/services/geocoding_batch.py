@@ -0,0 +1,197 @@
+"""
+Geocodage par lot des biens evalues (projets) et des biens du pool
+Adresses dedoublonnees et resolues par geocode_batch, puis coordonnees et
+commune ecrites par UPDATE ... FROM (VALUES ...) par paquets.
+"""
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, column, func, insert, select, update, values
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ComparablePool, Commune, Project, PropertyInfo
+from app.services.comparable_service import notify_pool_write
+from app.services.geocoding import geocode_batch
+from app.services.jobs import JOB_LANE_INTERACTIVE, Job, job_registry
+
+GEOCODE_TARGET_PROJECTS = "projects"  # Biens evalues sans coordonnees
+GEOCODE_TARGET_POOL = "pool"          # Biens du pool a regeocoder depuis leur adresse
+
+# Lignes par requete UPDATE
+GEOCODE_WRITE_CHUNK = 1000
+
+Progress = Optional[Callable[[int, int], None]]
+
+# Projets dont le geocodage est planifie ou en cours (une seule tache par projet)
+# et projets dont l'adresse a change pendant la tache : replanifies a la fin
+_pending_projects: set = set()
+_requeued_projects: set = set()
+_pending_lock = threading.Lock()
+
+
+def geocode_projects(
+    db: Session,
+    project_ids: Optional[List[int]] = None,
+    limit: Optional[int] = None,
+    progress: Progress = None
+) -> Dict[str, int]:
+    """
+    Geocode les projets (actifs) dont le bien n'a pas de coordonnees, ou ceux
+    de project_ids. Les PropertyInfo manquants sont crees en une requete.
+    """
+    query = (
+        select(Project.id, Project.address, PropertyInfo.id.label("property_info_id"))
+        .outerjoin(PropertyInfo, PropertyInfo.project_id == Project.id)
+        .where(Project.deleted_at.is_(None))
+        .order_by(Project.id)
+    )
+    if project_ids:
+        query = query.where(Project.id.in_(project_ids))
+    else:
+        query = query.where(PropertyInfo.latitude.is_(None))
+    if limit:
+        query = query.limit(limit)
+    rows = db.execute(query).all()
+
+    missing = [row.id for row in rows if row.property_info_id is None]
+    created: Dict[int, int] = {}
+    if missing:
+        now = datetime.utcnow()
+        created = {
+            row.project_id: row.id for row in db.execute(
+                insert(PropertyInfo)
+                .values([{"project_id": pid, "created_at": now, "updated_at": now} for pid in missing])
+                .returning(PropertyInfo.id, PropertyInfo.project_id)
+            )
+        }
+        db.commit()
+
+    coords = geocode_batch((row.address for row in rows), progress)
+    located = [
+        (row.property_info_id or created[row.id], *coords[row.address])
+        for row in rows if coords.get(row.address)
+    ]
+    for start in range(0, len(located), GEOCODE_WRITE_CHUNK):
+        db.execute(_coordinates_update(PropertyInfo, located[start:start + GEOCODE_WRITE_CHUNK]))
+        db.commit()
+
+    return {"requested": len(rows), "geocoded": len(located), "failed": len(rows) - len(located)}
+
+
+def geocode_pool(
+    db: Session,
+    pool_ids: List[int],
+    progress: Progress = None
+) -> Dict[str, int]:
+    """
+    Regeocode des biens du pool depuis leur adresse (coordonnees approximatives
+    d'une source externe...) et met a jour latitude/longitude/commune (geom par trigger).
+    """
+    rows = db.execute(
+        select(
+            ComparablePool.id, ComparablePool.address, ComparablePool.property_type,
+            ComparablePool.latitude, ComparablePool.longitude,
+        ).where(ComparablePool.id.in_(pool_ids))
+    ).all()
+    coords = geocode_batch((row.address for row in rows), progress)
+    located = [(row.id, *coords[row.address]) for row in rows if coords.get(row.address)]
+    for start in range(0, len(located), GEOCODE_WRITE_CHUNK):
+        db.execute(_coordinates_update(ComparablePool, located[start:start + GEOCODE_WRITE_CHUNK]))
+        db.commit()
+
+    # Structures derivees (snapshot memoire, caches) a jour des nouvelles positions,
+    # tuiles des anciennes positions comprises
+    if located:
+        updated = db.query(ComparablePool).filter(ComparablePool.id.in_([row[0] for row in located])).all()
+        notify_pool_write(updated, previous=[row for row in rows if coords.get(row.address)])
+
+    return {"requested": len(rows), "geocoded": len(located), "failed": len(rows) - len(located)}
+
+
+def run_geocode_job(
+    job: Job,
+    target: str,
+    ids: Optional[List[int]] = None,
+    limit: Optional[int] = None
+) -> Dict[str, int]:
+    """Point d'entree des taches de fond : session dediee, avancement reporte dans job."""
+    db = SessionLocal()
+    try:
+        if target == GEOCODE_TARGET_POOL:
+            return geocode_pool(db, ids or [], job.report)
+        return geocode_projects(db, ids, limit, job.report)
+    finally:
+        db.close()
+
+
+def schedule_project_geocoding(
+    project_id: int,
+    owner_id: Optional[int] = None,
+    address_changed: bool = False
+) -> Optional[Job]:
+    """
+    Planifie en tache de fond le geocodage du bien d'un projet (creation,
+    changement d'adresse, recherche sans coordonnees). None si deja planifie ;
+    si address_changed, la tache en cours (peut-etre sur l'ancienne adresse)
+    est suivie d'une nouvelle, qui ecrit en dernier les coordonnees.
+    File interactive : jamais en attente derriere un import ou un geocodage par lot.
+    """
+    with _pending_lock:
+        if project_id in _pending_projects:
+            if address_changed:
+                _requeued_projects.add(project_id)
+            return None
+        _pending_projects.add(project_id)
+    return _submit_project_geocoding(project_id, owner_id)
+
+
+def is_project_geocoding_pending(project_id: int) -> bool:
+    with _pending_lock:
+        return project_id in _pending_projects
+
+
+def _submit_project_geocoding(project_id: int, owner_id: Optional[int]) -> Job:
+    return job_registry.submit(
+        "geocode_project", _run_project_geocoding, project_id, owner_id,
+        owner_id=owner_id, lane=JOB_LANE_INTERACTIVE,
+    )
+
+
+def _run_project_geocoding(job: Job, project_id: int, owner_id: Optional[int]) -> Dict[str, int]:
+    try:
+        return run_geocode_job(job, GEOCODE_TARGET_PROJECTS, [project_id])
+    finally:
+        with _pending_lock:
+            requeue = project_id in _requeued_projects
+            _requeued_projects.discard(project_id)
+            if not requeue:
+                _pending_projects.discard(project_id)
+        # Adresse modifiee pendant la tache : le projet reste en attente
+        if requeue:
+            _submit_project_geocoding(project_id, owner_id)
+
+
+def _coordinates_update(model: Any, rows: List[Tuple[int, float, float]]):
+    """
+    UPDATE ... FROM (VALUES (id, lat, lng) ...) : coordonnees et commune (ST_Contains).
+    La colonne geom du pool suit les coordonnees (trigger comparable_pool_set_geom).
+    """
+    coords = values(
+        column("id", Integer), column("lat", Float), column("lng", Float), name="coords"
+    ).data(rows)
+    point = func.ST_SetSRID(func.ST_MakePoint(coords.c.lng, coords.c.lat), 4326)
+    insee_code = (
+        select(Commune.insee_code)
+        .where(func.ST_Contains(Commune.geom, point))
+        .limit(1)
+        .scalar_subquery()
+    )
+    assignments = {
+        "latitude": coords.c.lat,
+        "longitude": coords.c.lng,
+        "insee_code": insee_code,
+        "updated_at": datetime.utcnow(),
+    }
+    return update(model).where(model.id == coords.c.id).values(**assignments)
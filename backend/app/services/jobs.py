@@ -0,0 +1,117 @@
+"""
+Taches de fond en memoire du processus (geocodage par lot...)
+Chaque tache est executee par le pool de threads borne de sa file : les taches
+interactives (geocodage d'un projet) ne patientent pas derriere les longues
+taches d'administration. Avancement et resultat sont consultables par
+identifiant tant que la tache reste dans le registre.
+"""
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_LANE_BACKGROUND = "background"    # Taches d'administration (imports, geocodage par lot...)
+JOB_LANE_INTERACTIVE = "interactive"  # Taches courtes attendues par un utilisateur
+
+# Taches terminees conservees pour consultation
+MAX_FINISHED_JOBS = 200
+
+
+@dataclass
+class Job:
+    """Tache de fond et son avancement"""
+    id: str
+    kind: str
+    owner_id: Optional[int] = None  # Utilisateur ayant lance la tache
+    status: str = JOB_PENDING
+    done: int = 0
+    total: Optional[int] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    def report(self, done: int, total: Optional[int] = None):
+        """Met a jour l'avancement (utilisable comme callback progress(done, total))."""
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobRegistry:
+    """Registre des taches de fond, execution par un pool de threads borne par file"""
+
+    def __init__(self, workers: int, interactive_workers: int):
+        self._executors = {
+            JOB_LANE_BACKGROUND: ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job"),
+            JOB_LANE_INTERACTIVE: ThreadPoolExecutor(
+                max_workers=max(1, interactive_workers), thread_name_prefix="job-interactive"
+            ),
+        }
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable[..., Any],
+        *args: Any,
+        owner_id: Optional[int] = None,
+        lane: str = JOB_LANE_BACKGROUND
+    ) -> Job:
+        """Planifie func(job, *args) dans la file lane ; sa valeur de retour devient job.result."""
+        job = Job(id=uuid.uuid4().hex, kind=kind, owner_id=owner_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executors[lane].submit(self._run, job, func, args)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, func: Callable[..., Any], args: tuple):
+        job.status = JOB_RUNNING
+        try:
+            job.result = func(job, *args)
+            job.status = JOB_DONE
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    def _prune(self):
+        """Oublie les taches terminees les plus anciennes au-dela de MAX_FINISHED_JOBS."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+job_registry = JobRegistry(settings.BACKGROUND_JOB_WORKERS, settings.INTERACTIVE_JOB_WORKERS)
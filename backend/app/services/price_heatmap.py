@@ -0,0 +1,273 @@
+"""
+Carte de chaleur des prix au m2 precalculee (table price_heatmap_cells)
+Cellules geohash a plusieurs precisions, par couche (pool de comparables, DVF),
+type de bien et trimestre : effectif et quartiles vente/location. La route de
+carte lit une plage de la cle primaire, sans agreger de transactions.
+Recalcul incremental : seules les cellules touchees depuis le dernier passage
+sont recalculees (cles marquees par le trigger du pool dans price_heatmap_dirty,
+fichiers DVF importes depuis le dernier passage).
+"""
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import PriceHeatmapCell, PropertyType
+from app.services.dvf_promotion import DVF_SALE_NATURES
+from app.services.jobs import Job
+
+HEATMAP_SOURCE_POOL = "pool"
+HEATMAP_SOURCE_DVF = "dvf"
+
+# Precisions servies (~39 km, ~4,9 km, ~1,2 km de cote) ; les cles a recalculer
+# sont marquees a HEATMAP_KEY_PRECISION (trigger du pool), qui doit etre superieure
+HEATMAP_PRECISIONS = (4, 5, 6)
+HEATMAP_KEY_PRECISION = 8
+
+# code_type_local DVF -> type de la couche DVF (dependances exclues)
+DVF_HEATMAP_TYPES = {
+    "1": "house",
+    "2": "apartment",
+    "4": PropertyType.MIXED.value,
+}
+
+_DVF_TYPE_CASE = "CASE {column} {cases} END"
+
+
+def _dvf_type_case(column: str, reverse: bool = False) -> str:
+    pairs = ((ptype, code) if reverse else (code, ptype) for code, ptype in DVF_HEATMAP_TYPES.items())
+    return _DVF_TYPE_CASE.format(
+        column=column, cases=" ".join(f"WHEN '{key}' THEN '{value}'" for key, value in pairs)
+    )
+
+
+_PENDING_FILES_SQL = text("""
+    SELECT file_name FROM dvf_import_files
+    WHERE heatmap_at IS NULL OR heatmap_at < loaded_at
+    ORDER BY file_name
+""")
+
+# Reconstruction complete : toutes les cles du pool
+_POOL_KEYS_SQL = text(f"""
+    INSERT INTO price_heatmap_dirty (source, property_type, quarter, geohash)
+    SELECT DISTINCT '{HEATMAP_SOURCE_POOL}', property_type, date_trunc('quarter', transaction_date)::date,
+           ST_GeoHash(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326), {HEATMAP_KEY_PRECISION})
+    FROM comparable_pool
+    ON CONFLICT DO NOTHING
+""")
+
+_DVF_KEYS_SQL = """
+    INSERT INTO price_heatmap_dirty (source, property_type, quarter, geohash)
+    SELECT DISTINCT '{source}', {type_case}, date_trunc('quarter', mutation_date)::date,
+           ST_GeoHash(geom::geometry, {precision})
+    FROM dvf_records
+    WHERE geom IS NOT NULL AND code_type_local = ANY(:codes) {where}
+    ON CONFLICT DO NOTHING
+"""
+
+_CREATE_KEYS_SQL = text("""
+    CREATE TEMP TABLE heatmap_dirty_keys (LIKE price_heatmap_dirty) ON COMMIT DROP
+""")
+
+# Les cles marquees pendant le recalcul (transactions concurrentes) restent pour le passage suivant
+_CLAIM_KEYS_SQL = text("""
+    WITH claimed AS (
+        DELETE FROM price_heatmap_dirty RETURNING source, property_type, quarter, geohash
+    )
+    INSERT INTO heatmap_dirty_keys SELECT * FROM claimed
+""")
+
+# Cellules de chaque precision contenant une cle touchee
+_DIRTY_CELLS_SQL = text("""
+    CREATE TEMP TABLE heatmap_dirty_cells ON COMMIT DROP AS
+    SELECT DISTINCT k.source, k.property_type, p.precision, k.quarter, left(k.geohash, p.precision) AS geohash
+    FROM heatmap_dirty_keys k
+    CROSS JOIN unnest(CAST(:precisions AS smallint[])) AS p(precision)
+""")
+
+_DELETE_CELLS_SQL = text("""
+    DELETE FROM price_heatmap_cells c
+    USING heatmap_dirty_cells d
+    WHERE (c.source, c.property_type, c.precision, c.quarter, c.geohash)
+        = (d.source, d.property_type, d.precision, d.quarter, d.geohash)
+""")
+
+_INSERT_CELLS = """
+    INSERT INTO price_heatmap_cells (
+        source, property_type, precision, quarter, geohash, latitude, longitude,
+        sale_count, sale_p25, sale_median, sale_p75,
+        rent_count, rent_p25, rent_median, rent_p75, updated_at
+    )
+    SELECT source, property_type, precision, quarter, geohash,
+           ST_Y(ST_PointFromGeoHash(geohash)), ST_X(ST_PointFromGeoHash(geohash)),
+           sale_count, sale_q[1], sale_q[2], sale_q[3],
+           rent_count, rent_q[1], rent_q[2], rent_q[3], :now
+    FROM ({cells}) cells
+"""
+
+# Biens du pool de chaque cellule : index GIST de geom sur l'emprise du geohash
+_POOL_CELLS_SQL = text(_INSERT_CELLS.format(cells=f"""
+    SELECT c.source, c.property_type, c.precision, c.quarter, c.geohash,
+           count(*) FILTER (WHERE p.transaction_type = 'sale') AS sale_count,
+           percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY p.price_per_m2)
+               FILTER (WHERE p.transaction_type = 'sale') AS sale_q,
+           count(*) FILTER (WHERE p.transaction_type = 'rent') AS rent_count,
+           percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY p.price_per_m2)
+               FILTER (WHERE p.transaction_type = 'rent') AS rent_q
+    FROM heatmap_dirty_cells c
+    JOIN comparable_pool p
+      ON p.geom && ST_GeomFromGeoHash(c.geohash)
+     AND ST_GeoHash(p.geom, c.precision) = c.geohash
+     AND p.property_type = c.property_type
+     AND p.transaction_date >= c.quarter
+     AND p.transaction_date < (c.quarter + interval '3 months')::date
+     AND p.price_per_m2 > 0
+    WHERE c.source = '{HEATMAP_SOURCE_POOL}'
+    GROUP BY c.source, c.property_type, c.precision, c.quarter, c.geohash
+"""))
+
+# Ventes DVF de chaque cellule, une par mutation (lots batis d'un seul type) ;
+# la partition annuelle est elaguee a l'execution sur le trimestre
+_DVF_CELLS_SQL = text(_INSERT_CELLS.format(cells=f"""
+    SELECT c.source, c.property_type, c.precision, c.quarter, c.geohash,
+           count(*) AS sale_count,
+           percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY m.price_per_m2) AS sale_q,
+           0 AS rent_count,
+           NULL::float8[] AS rent_q
+    FROM heatmap_dirty_cells c
+    CROSS JOIN LATERAL (
+        SELECT max(d.valeur_fonciere) / sum(d.surface_reelle_bati) AS price_per_m2
+        FROM dvf_records d
+        WHERE d.geom && ST_Expand(ST_GeomFromGeoHash(c.geohash), 1e-6)::geography
+          AND ST_GeoHash(d.geom::geometry, c.precision) = c.geohash
+          AND d.mutation_date >= c.quarter
+          AND d.mutation_date < (c.quarter + interval '3 months')::date
+          AND d.nature_mutation = ANY(:natures)
+          AND d.surface_reelle_bati > 0
+        GROUP BY d.departement, d.mutation_id
+        HAVING min(d.code_type_local) = max(d.code_type_local)
+           AND min(d.code_type_local) = {_dvf_type_case('c.property_type', reverse=True)}
+           AND max(d.valeur_fonciere) > 0
+    ) m
+    WHERE c.source = '{HEATMAP_SOURCE_DVF}'
+    GROUP BY c.source, c.property_type, c.precision, c.quarter, c.geohash
+"""))
+
+_MARK_FILES_SQL = text("""
+    UPDATE dvf_import_files SET heatmap_at = :now WHERE file_name = ANY(:files)
+""")
+
+
+def quarter_start(day: date) -> date:
+    return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+
+
+def refresh_price_heatmap(db: Session, full: bool = False) -> Dict[str, Any]:
+    """
+    Recalcule les cellules touchees depuis le dernier passage (ou toutes si
+    full) en une transaction : cellules supprimees puis reinserees a partir
+    des biens du pool et des ventes DVF qu'elles contiennent encore.
+    """
+    started_at = time.perf_counter()
+    if full:
+        files = list(db.execute(text("SELECT file_name FROM dvf_import_files")).scalars())
+    else:
+        files = list(db.execute(_PENDING_FILES_SQL).scalars())
+    now = datetime.utcnow()
+
+    try:
+        dvf_keys = _DVF_KEYS_SQL.format(
+            source=HEATMAP_SOURCE_DVF,
+            type_case=_dvf_type_case("code_type_local"),
+            precision=HEATMAP_KEY_PRECISION,
+            where="" if full else "AND source_file = ANY(:files)",
+        )
+        if full:
+            db.execute(text("DELETE FROM price_heatmap_cells"))
+            db.execute(_POOL_KEYS_SQL)
+        if full or files:
+            db.execute(text(dvf_keys), {"codes": list(DVF_HEATMAP_TYPES), "files": files})
+
+        db.execute(_CREATE_KEYS_SQL)
+        keys = db.execute(_CLAIM_KEYS_SQL).rowcount
+        db.execute(_DIRTY_CELLS_SQL, {"precisions": list(HEATMAP_PRECISIONS)})
+        cells = db.execute(text("SELECT count(*) FROM heatmap_dirty_cells")).scalar()
+        db.execute(_DELETE_CELLS_SQL)
+        written = db.execute(_POOL_CELLS_SQL, {"now": now}).rowcount
+        written += db.execute(_DVF_CELLS_SQL, {"now": now, "natures": list(DVF_SALE_NATURES)}).rowcount
+        if files:
+            db.execute(_MARK_FILES_SQL, {"now": now, "files": files})
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+    return {
+        "dvf_files": len(files),
+        "keys": keys,
+        "cells": cells,
+        "written": written,
+        "emptied": cells - written,
+        "seconds": round(time.perf_counter() - started_at, 3),
+    }
+
+
+def run_price_heatmap_job(job: Job, full: bool = False) -> Dict[str, Any]:
+    """Point d'entree des taches de fond : session dediee."""
+    db = SessionLocal()
+    try:
+        return refresh_price_heatmap(db, full=full)
+    finally:
+        db.close()
+
+
+def get_heatmap_cells(
+    db: Session,
+    source: str,
+    property_type: str,
+    precision: int,
+    quarter: Optional[date] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None
+) -> Dict[str, Any]:
+    """
+    Cellules d'une couche, d'un type et d'une precision pour un trimestre (le
+    plus recent disponible si None), eventuellement limitees a l'emprise
+    bbox = (min_lat, min_lng, max_lat, max_lng). Plage de la cle primaire.
+    """
+    cell = PriceHeatmapCell
+    layer = (cell.source == source, cell.property_type == property_type, cell.precision == precision)
+    if quarter is None:
+        quarter = db.execute(select(cell.quarter).where(*layer).order_by(cell.quarter.desc()).limit(1)).scalar()
+    else:
+        quarter = quarter_start(quarter)
+    if quarter is None:
+        return {"quarter": None, "precision": precision, "cells": []}
+
+    query = select(cell).where(*layer, cell.quarter == quarter)
+    if bbox:
+        min_lat, min_lng, max_lat, max_lng = bbox
+        query = query.where(cell.latitude.between(min_lat, max_lat), cell.longitude.between(min_lng, max_lng))
+
+    return {
+        "quarter": quarter.isoformat(),
+        "precision": precision,
+        "cells": [
+            {
+                "geohash": c.geohash,
+                "latitude": c.latitude,
+                "longitude": c.longitude,
+                "sale_count": c.sale_count,
+                "sale_p25": c.sale_p25,
+                "sale_median": c.sale_median,
+                "sale_p75": c.sale_p75,
+                "rent_count": c.rent_count,
+                "rent_p25": c.rent_p25,
+                "rent_median": c.rent_median,
+                "rent_p75": c.rent_p75,
+            }
+            for c in db.execute(query).scalars()
+        ],
+    }
@@ -0,0 +1,72 @@
+"""
+Normalisation des adresses francaises (cle des caches de geocodage et de la
+Base Adresse Nationale)
+"""
+import re
+import unicodedata
+from typing import Optional, Tuple
+
+# Abreviations courantes des adresses francaises (apres suppression des accents)
+_ABBREVIATIONS = {
+    "av": "avenue", "ave": "avenue",
+    "bd": "boulevard", "bld": "boulevard", "blvd": "boulevard", "boul": "boulevard",
+    "r": "rue",
+    "pl": "place",
+    "ch": "chemin", "chem": "chemin",
+    "rte": "route",
+    "imp": "impasse",
+    "all": "allee",
+    "crs": "cours",
+    "fg": "faubourg", "fbg": "faubourg",
+    "qu": "quai", "qua": "quai",
+    "sq": "square",
+    "res": "residence",
+    "za": "zone artisanale", "zac": "zone d amenagement concerte",
+    "zi": "zone industrielle", "zae": "zone d activites economiques",
+    "st": "saint", "ste": "sainte",
+}
+_POSTAL_CODE = re.compile(r"^\d{5}$")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_address(address: str) -> str:
+    """
+    Forme canonique d'une adresse francaise : minuscules, sans accents ni
+    ponctuation, types de voie developpes, "france" retire, code postal en fin.
+    """
+    text = unicodedata.normalize("NFKD", address or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    tokens = [token for token in _NON_ALNUM.split(text) if token and token != "france"]
+
+    words = []
+    postal_codes = []
+    for token in tokens:
+        if _POSTAL_CODE.match(token):
+            postal_codes.append(token)
+        else:
+            words.append(_ABBREVIATIONS.get(token, token))
+    return " ".join(words + postal_codes)
+
+
+_HOUSE_NUMBER = re.compile(r"^(\d+)([a-z]*)$")
+_REPETITIONS = {"bis", "ter", "quater", "a", "b", "c", "d"}
+
+
+def split_address(normalized: str) -> Tuple[Optional[int], Optional[str], str, Optional[str]]:
+    """
+    Decoupe une adresse normalisee en (numero, indice de repetition, libelle
+    voie + commune, code postal). Ex. "12 bis rue x valence 26000"
+    -> (12, "bis", "rue x valence", "26000").
+    """
+    tokens = normalized.split()
+    postal_code = tokens.pop() if tokens and _POSTAL_CODE.match(tokens[-1]) else None
+
+    number = repetition = None
+    match = _HOUSE_NUMBER.match(tokens[0]) if tokens else None
+    if match:
+        number = int(match.group(1))
+        repetition = match.group(2) or None
+        tokens = tokens[1:]
+        if repetition is None and len(tokens) > 1 and tokens[0] in _REPETITIONS:
+            repetition = tokens.pop(0)
+    return number, repetition, " ".join(tokens), postal_code
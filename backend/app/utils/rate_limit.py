@@ -0,0 +1,34 @@
+"""
+Limiteur de debit (seau a jetons) partage entre threads
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Seau a jetons : `rate` jetons par seconde, au plus `capacity` en reserve.
+    acquire() bloque jusqu'a obtenir un jeton ; rate <= 0 desactive la limite.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Consomme un jeton, en attendant si le seau est vide."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Rattrapage de la colonne geom des biens du pool qui n'en ont pas.
+A lancer une fois apres la migration add_pool_geom_trigger (les nouvelles
+ecritures sont couvertes par le trigger) ; un commit par paquet, sans verrou
+prolonge sur la table.
+
+Usage: python scripts/backfill_pool_geom.py [--batch-size 5000]
+"""
+import sys
+import os
+import argparse
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.comparable_geom import POOL_GEOM_BACKFILL_BATCH, backfill_pool_geom
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rattrapage de geom sur comparable_pool")
+    parser.add_argument("--batch-size", type=int, default=POOL_GEOM_BACKFILL_BATCH, help="Lignes par transaction")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Rattrapage de geom (comparable_pool)")
+    print("=" * 60)
+
+    db = SessionLocal()
+    try:
+        report = backfill_pool_geom(
+            db, args.batch_size,
+            progress=lambda done, total: print(f"  {done}/{total} lignes", end="\r"),
+        )
+    except Exception as e:
+        print(f"Erreur : {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"  {report['missing']} biens sans geom : {report['updated']} mis a jour "
+          f"en {report['batches']} paquets, {report['seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
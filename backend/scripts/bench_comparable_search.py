@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recherche spatiale de comparables (moteur PostGIS).
+Remplit une copie temporaire de comparable_pool (table TEMP qui masque la table
+reelle pour la session) avec des biens synthetiques repartis sur la France,
+puis mesure la latence de la requete de recherche a chaque palier de volumetrie
+et affiche le plan d'execution (EXPLAIN) pour verifier l'utilisation de l'index GIST.
+Tout le benchmark s'execute sur une seule connexion explicite : la table TEMP
+masque toujours la table reelle entre les paliers, puis est supprimee.
+Aucune donnee reelle n'est modifiee.
+
+Usage: python scripts/bench_comparable_search.py [--sizes 10000,100000,1000000] [--runs 20]
+"""
+import sys
+import os
+import argparse
+import statistics
+import time
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from app.database import engine
+from app.services.comparable_service import ComparableSearchParams, build_postgis_search_statement
+
+# Centre de recherche : Valence centre
+CENTER_LAT = 44.9334
+CENTER_LNG = 4.8924
+
+
+def create_bench_table(db: Session):
+    """Cree la table temporaire comparable_pool (memes colonnes, colonne generee et index)."""
+    db.execute(text("""
+        CREATE TEMP TABLE comparable_pool
+        (LIKE public.comparable_pool INCLUDING ALL)
+        ON COMMIT PRESERVE ROWS
+    """))
+
+
+def grow_bench_table(db: Session, current_size: int, target_size: int):
+    """Ajoute des biens synthetiques jusqu'a atteindre target_size lignes."""
+    # Garde-fou : jamais d'insertion dans la table reelle
+    if not db.execute(text(
+        "SELECT relpersistence = 't' FROM pg_class WHERE oid = 'comparable_pool'::regclass"
+    )).scalar():
+        raise RuntimeError("comparable_pool ne designe pas la table temporaire du benchmark")
+    db.execute(text("""
+        INSERT INTO comparable_pool (
+            id, address, city, latitude, longitude, geom, property_type, surface,
+            construction_year, transaction_type, price, price_per_m2,
+            transaction_date, source, status, created_at, updated_at
+        )
+        SELECT
+            g, 'Bien synthetique ' || g, 'Bench', lat, lng,
+            ST_SetSRID(ST_MakePoint(lng, lat), 4326),
+            (ARRAY['office', 'warehouse', 'retail', 'industrial', 'land', 'mixed'])[1 + g % 6],
+            surface, 1960 + (g % 64),
+            (CASE WHEN g % 3 = 0 THEN 'rent' ELSE 'sale' END)::transactiontype,
+            surface * price_m2, price_m2,
+            CURRENT_DATE - (g % 1500),
+            (CASE WHEN g % 5 < 3 THEN 'arthur_loyd' ELSE 'concurrence' END)::comparablesource,
+            'transaction', now(), now()
+        FROM (
+            SELECT
+                g,
+                42.5 + random() * 8.5 AS lat,
+                -4.5 + random() * 12.5 AS lng,
+                50 + random() * 5000 AS surface,
+                50 + random() * 4000 AS price_m2
+            FROM generate_series(:start, :stop) AS g
+        ) AS synthetic
+    """), {"start": current_size + 1, "stop": target_size})
+    db.execute(text("ANALYZE comparable_pool"))
+    db.commit()
+
+
+def run_benchmark(db: Session, stmt, runs: int) -> list:
+    """Execute la requete `runs` fois et retourne les latences en ms."""
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        db.execute(stmt).all()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def explain(db: Session, stmt) -> list:
+    """Retourne le plan d'execution de la requete."""
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    return [row[0] for row in db.execute(text(f"EXPLAIN {sql}"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche de comparables")
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="Paliers de volumetrie du pool (separes par des virgules)")
+    parser.add_argument("--runs", type=int, default=20, help="Nombre d'executions par palier")
+    parser.add_argument("--distance-km", type=float, default=5.0, help="Rayon utilisateur")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    params = ComparableSearchParams(distance_km=args.distance_km)
+    stmt = build_postgis_search_statement("office", CENTER_LAT, CENTER_LNG, "Valence", params)
+
+    print("=" * 60)
+    print("Benchmark recherche de comparables (PostGIS)")
+    print("=" * 60)
+
+    # Une seule connexion : les commits entre paliers ne la rendent pas au pool
+    connection = engine.connect()
+    db = Session(bind=connection)
+    try:
+        create_bench_table(db)
+        db.commit()
+        current_size = 0
+        for size in sizes:
+            print(f"\nRemplissage du pool synthetique : {size} biens...")
+            grow_bench_table(db, current_size, size)
+            current_size = size
+
+            # Chauffe du cache avant mesure
+            db.execute(stmt).all()
+            latencies = run_benchmark(db, stmt, args.runs)
+            latencies.sort()
+            p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+            print(f"   p50 = {statistics.median(latencies):.2f} ms | p95 = {p95:.2f} ms")
+
+            index_lines = [line.strip() for line in explain(db, stmt) if "Index" in line]
+            print("   Plan :", index_lines[0] if index_lines else "aucun index utilise (seq scan)")
+    finally:
+        db.rollback()
+        db.execute(text("DROP TABLE IF EXISTS pg_temp.comparable_pool"))
+        db.commit()
+        db.close()
+        connection.close()
+
+    print("\n" + "=" * 60)
+    print("Benchmark termine (table temporaire supprimee)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
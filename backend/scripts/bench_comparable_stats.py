@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark du noyau vectorise de distances/statistiques (comparable_stats)
+face a l'implementation historique objet par objet (Haversine par paire,
+plusieurs parcours de liste pour les statistiques).
+Aucune base de donnees n'est necessaire : les biens sont synthetiques.
+
+Usage: python scripts/bench_comparable_stats.py [--sizes 1000,10000,100000] [--runs 5]
+"""
+import sys
+import os
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.models import TransactionType
+from app.services.comparable_stats import comparable_arrays, haversine_km, perimeter_price_stats
+
+# Centre de recherche : Valence centre
+CENTER_LAT = 44.9334
+CENTER_LNG = 4.8924
+
+
+def legacy_distance(lat1, lng1, lat2, lng2):
+    """Implementation historique de calculate_distance (import math a chaque appel)."""
+    from math import radians, sin, cos, sqrt, atan2
+
+    R = 6371
+    lat1_rad = radians(lat1)
+    lat2_rad = radians(lat2)
+    delta_lat = radians(lat2 - lat1)
+    delta_lng = radians(lng2 - lng1)
+    a = sin(delta_lat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lng / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return R * c
+
+
+def legacy_stats(comparables):
+    """Implementation historique de calculate_stats (plusieurs parcours de liste)."""
+    rentals = [c for c in comparables if c.transaction_type == TransactionType.RENT]
+    sales = [c for c in comparables if c.transaction_type == TransactionType.SALE]
+    stats = {
+        "avg_rent_per_m2": None, "rent_count": len(rentals),
+        "avg_sale_per_m2": None, "sale_count": len(sales),
+        "latest_sale_per_m2": None, "latest_sale_date": None,
+        "total_count": len(comparables),
+    }
+    if rentals:
+        stats["avg_rent_per_m2"] = round(sum(c.price_per_m2 for c in rentals) / len(rentals), 2)
+    if sales:
+        stats["avg_sale_per_m2"] = round(sum(c.price_per_m2 for c in sales) / len(sales), 2)
+        latest_sale = max(sales, key=lambda x: x.transaction_date or date.min)
+        if latest_sale.transaction_date:
+            stats["latest_sale_per_m2"] = latest_sale.price_per_m2
+            stats["latest_sale_date"] = latest_sale.transaction_date.isoformat()
+    return stats
+
+
+def make_comparables(size: int) -> list:
+    """Genere des biens synthetiques dans un rayon d'environ 20 km."""
+    base_date = date.today()
+    return [
+        SimpleNamespace(
+            latitude=CENTER_LAT + random.uniform(-0.2, 0.2),
+            longitude=CENTER_LNG + random.uniform(-0.25, 0.25),
+            city=random.choice(["Valence", "Bourg-les-Valence", "Alixan"]),
+            transaction_type=TransactionType.RENT if random.random() < 0.4 else TransactionType.SALE,
+            price_per_m2=random.uniform(50, 4000),
+            transaction_date=base_date - timedelta(days=random.randint(0, 1500)),
+        )
+        for _ in range(size)
+    ]
+
+
+def run_legacy(comparables: list, distance_km: float) -> list:
+    """Pipeline historique : distance par objet puis 3 appels a calculate_stats."""
+    for c in comparables:
+        c._dist = legacy_distance(CENTER_LAT, CENTER_LNG, c.latitude, c.longitude)
+    in_radius = [c for c in comparables if c._dist <= distance_km]
+    agglo = [c for c in comparables if c.city and c.city.lower() == "valence"]
+    sector = [c for c in comparables if c._dist <= 5.0]
+    return [legacy_stats(in_radius), legacy_stats(agglo), legacy_stats(sector)]
+
+
+def run_kernel(comparables: list, distance_km: float) -> list:
+    """Pipeline vectorise : extraction des colonnes puis un seul appel au noyau."""
+    arrays = comparable_arrays(comparables)
+    in_agglo = np.fromiter((c.city.lower() == "valence" for c in comparables), dtype=bool, count=len(comparables))
+    return run_kernel_only(arrays, in_agglo, distance_km)
+
+
+def run_kernel_only(arrays: dict, in_agglo: np.ndarray, distance_km: float) -> list:
+    """Noyau seul, colonnes deja extraites (cas du snapshot memoire)."""
+    distances = haversine_km(CENTER_LAT, CENTER_LNG, arrays["lat"], arrays["lng"])
+    return perimeter_price_stats(
+        arrays["is_rent"], arrays["price_per_m2"], arrays["transaction_day"],
+        np.vstack([distances <= distance_km, in_agglo, distances <= 5.0]),
+    )
+
+
+def best_of(func, runs: int, *args) -> float:
+    """Meilleur temps (ms) sur `runs` executions."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark du noyau de statistiques")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Nombres de biens (separes par des virgules)")
+    parser.add_argument("--runs", type=int, default=5, help="Nombre d'executions par mesure")
+    parser.add_argument("--distance-km", type=float, default=5.0, help="Rayon utilisateur")
+    args = parser.parse_args()
+
+    random.seed(42)
+
+    print("=" * 76)
+    print("Micro-benchmark distances + statistiques des comparables")
+    print("=" * 76)
+    print(f"\n{'Biens':>10} | {'Historique (ms)':>16} | {'Vectorise (ms)':>15} | {'Noyau seul (ms)':>16} | {'Gain':>6}")
+    print("-" * 76)
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        comparables = make_comparables(size)
+
+        # Verification de coherence des deux implementations
+        for legacy, kernel in zip(run_legacy(comparables, args.distance_km), run_kernel(comparables, args.distance_km)):
+            assert legacy["rent_count"] == kernel["rent_count"]
+            assert legacy["sale_count"] == kernel["sale_count"]
+            assert legacy["latest_sale_date"] == kernel["latest_sale_date"]
+
+        legacy_ms = best_of(run_legacy, args.runs, comparables, args.distance_km)
+        kernel_ms = best_of(run_kernel, args.runs, comparables, args.distance_km)
+        arrays = comparable_arrays(comparables)
+        in_agglo = np.fromiter((c.city.lower() == "valence" for c in comparables), dtype=bool, count=size)
+        kernel_only_ms = best_of(run_kernel_only, args.runs, arrays, in_agglo, args.distance_km)
+        print(
+            f"{size:>10} | {legacy_ms:>16.2f} | {kernel_ms:>15.2f} | {kernel_only_ms:>16.2f} | "
+            f"{legacy_ms / kernel_ms:>5.1f}x"
+        )
+
+    print("\n" + "=" * 76)
+
+
+if __name__ == "__main__":
+    main()
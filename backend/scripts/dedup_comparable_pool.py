@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Recherche et fusion des doublons du pool de comparables.
+Incremental : seuls les biens pas encore examines (nouveaux ou deplaces) sont
+compares au reste du pool. A planifier (cron) apres les imports et promotions ;
+--dry-run liste les paires detectees sans rien modifier.
+
+Usage: python scripts/dedup_comparable_pool.py [--dry-run] [--batch-size 2000]
+"""
+import sys
+import os
+import argparse
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.comparable_dedup import COMPARABLE_DEDUP_BATCH, dedup_comparable_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Doublons du pool de comparables")
+    parser.add_argument("--dry-run", action="store_true", help="Lister les paires sans fusionner")
+    parser.add_argument("--batch-size", type=int, default=COMPARABLE_DEDUP_BATCH, help="Biens examines par transaction")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Doublons du pool de comparables" + (" (dry-run)" if args.dry_run else ""))
+    print("=" * 60)
+
+    db = SessionLocal()
+    try:
+        report = dedup_comparable_pool(
+            db, dry_run=args.dry_run, batch_size=args.batch_size,
+            progress=lambda done, total: print(f"  {done}/{total} biens examines", end="\r"),
+        )
+    except Exception as e:
+        print(f"Erreur : {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"  {report['checked']} biens examines : {report['duplicates']} doublons, "
+          f"{report['survivors_filled']} biens completes, en {report['seconds']:.1f} s")
+    for pair in report.get("pairs", [])[:50]:
+        print(f"  {pair['duplicate_id']} -> {pair['survivor_id']} "
+              f"({pair['similarity']:.2f}, {pair['distance_m']:.0f} m) : "
+              f"{pair['duplicate_address']} / {pair['survivor_address']}")
+
+
+if __name__ == "__main__":
+    main()
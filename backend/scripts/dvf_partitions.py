@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Partitions de dvf_records (departement / annee) : liste et archivage.
+Detacher une annee retire ses lignes de dvf_records sans reecriture ; les
+tables detachees restent en base (pg_dump, archivage) sauf si --drop.
+
+Usage: python scripts/dvf_partitions.py list
+       python scripts/dvf_partitions.py detach --year 2014 [--drop]
+"""
+import sys
+import os
+import argparse
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.dvf_partitions import detach_dvf_year, list_dvf_partitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partitions des donnees DVF")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="Lister les partitions")
+    detach = subparsers.add_parser("detach", help="Detacher une annee de tous les departements")
+    detach.add_argument("--year", type=int, required=True, help="Annee de mutation a detacher")
+    detach.add_argument("--drop", action="store_true", help="Supprimer les tables detachees")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Partitions des donnees DVF")
+    print("=" * 60)
+
+    db = SessionLocal()
+    try:
+        if args.command == "list":
+            for row in list_dvf_partitions(db):
+                indent = "  " if row["partitioned"] else "    "
+                print(f"{indent}{row['name']:<28} {row['bound']:<55} "
+                      f"{row['estimated_rows']:>10} lignes  {row['size_bytes'] / 1e6:>8.1f} Mo")
+        else:
+            names = detach_dvf_year(db, args.year, drop=args.drop)
+            action = "supprimees" if args.drop else "detachees"
+            print(f"  {len(names)} partitions {args.year} {action}")
+            for name in names:
+                print(f"    {name}")
+    except Exception as e:
+        print(f"Erreur : {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
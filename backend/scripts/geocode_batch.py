@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Geocodage par lot : projets sans coordonnees (par defaut) ou biens du pool a
+regeocoder. Adresses dedoublonnees, caches consultes d'abord, geocodeurs
+appeles par un pool de threads (Nominatim limite a NOMINATIM_RATE_PER_SECOND).
+
+Usage: python scripts/geocode_batch.py [--target projects|pool] [--ids 1,2,3] [--limit 500]
+"""
+import sys
+import os
+import argparse
+import time
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.geocoding import geocoding_stats
+from app.services.geocoding_batch import (
+    GEOCODE_TARGET_POOL,
+    GEOCODE_TARGET_PROJECTS,
+    geocode_pool,
+    geocode_projects,
+)
+
+
+def print_progress(done: int, total: int):
+    """Avancement sur une seule ligne."""
+    percent = 100 * done / total if total else 100
+    print(f"\r  {done}/{total} adresses ({percent:.0f} %)", end="", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geocodage par lot")
+    parser.add_argument("--target", choices=[GEOCODE_TARGET_PROJECTS, GEOCODE_TARGET_POOL],
+                        default=GEOCODE_TARGET_PROJECTS, help="Projets ou biens du pool")
+    parser.add_argument("--ids", default="", help="Identifiants (separes par des virgules)")
+    parser.add_argument("--limit", type=int, default=None, help="Nombre max de projets")
+    args = parser.parse_args()
+
+    ids = [int(value) for value in args.ids.split(",") if value.strip()]
+    if args.target == GEOCODE_TARGET_POOL and not ids:
+        print("--ids requis pour regeocoder des biens du pool")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"Geocodage par lot ({args.target})")
+    print("=" * 60)
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        if args.target == GEOCODE_TARGET_POOL:
+            report = geocode_pool(db, ids, print_progress)
+        else:
+            report = geocode_projects(db, ids or None, args.limit, print_progress)
+    except Exception as e:
+        print(f"\nErreur : {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - start
+    stats = geocoding_stats()
+    print()
+    print(f"  {report['geocoded']}/{report['requested']} geocodes, {report['failed']} en echec, "
+          f"en {elapsed:.1f} s")
+    print(f"  Caches : {stats['memory_hits']} memoire, {stats['database_hits']} base, "
+          f"{stats['provider_calls']} appels geocodeur {stats['providers']}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Import en masse de biens comparables (CSV ou XLSX) dans comparable_pool.
+Colonnes reconnues par leur en-tete (francais ou anglais) ; les lignes sans
+coordonnees sont geocodees par lot. Les lignes invalides sont ecartees et
+listees avec leur numero de ligne (--errors pour les ecrire en CSV).
+
+Usage: python scripts/import_comparables.py fichier.xlsx [--source concurrence]
+       [--dry-run] [--errors erreurs.csv] [--chunk-rows 5000]
+"""
+import sys
+import os
+import csv
+import argparse
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.models import ComparableSource
+from app.services.comparable_import import COMPARABLE_IMPORT_EXTENSIONS, import_comparables_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse de biens comparables")
+    parser.add_argument("file", help="Fichier CSV ou XLSX")
+    parser.add_argument(
+        "--source", choices=[source.value for source in ComparableSource], default=ComparableSource.CONCURRENCE.value,
+        help="Source des lignes sans colonne source"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Valider et geocoder sans inserer")
+    parser.add_argument("--errors", help="Fichier CSV des lignes en erreur")
+    parser.add_argument("--chunk-rows", type=int, help="Lignes par paquet (defaut : COMPARABLE_IMPORT_CHUNK_ROWS)")
+    args = parser.parse_args()
+
+    if os.path.splitext(args.file)[1].lower() not in COMPARABLE_IMPORT_EXTENSIONS:
+        print(f"Format non supporte (attendu : {', '.join(COMPARABLE_IMPORT_EXTENSIONS)})")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"Import des comparables : {args.file}" + (" (dry-run)" if args.dry_run else ""))
+    print("=" * 60)
+
+    db = SessionLocal()
+    try:
+        report = import_comparables_file(
+            db, args.file, args.source, dry_run=args.dry_run, chunk_rows=args.chunk_rows,
+            progress=lambda done, _total: print(f"  {done} lignes lues", end="\r"),
+        )
+    except Exception as e:
+        print(f"Erreur : {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"  {report.rows} lignes lues : {report.valid} valides, {report.invalid} ecartees, "
+          f"{report.geocoded} geocodees")
+    print(f"  {report.inserted} biens inseres en {report.seconds:.1f} s ({report.rows_per_second:.0f} lignes/s)")
+    for error in report.errors[:20]:
+        print(f"  ligne {error['row']} : {', '.join(error['errors'])}")
+    if report.invalid > 20:
+        print(f"  ... {report.invalid - 20} autres lignes en erreur")
+
+    if args.errors and report.errors:
+        with open(args.errors, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(["ligne", "erreurs"])
+            for error in report.errors:
+                writer.writerow([error["row"], ", ".join(error["errors"])])
+        print(f"  Erreurs ecrites dans {args.errors}"
+              + (" (liste tronquee)" if report.errors_truncated else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Import incremental des fichiers DVF dans dvf_records : COPY en flux (geom
+compris) dans une table de transit puis fusion par (mutation_id, numero_disposition, lot_key).
+Formats : DVF geolocalisees Etalab (https://files.data.gouv.fr/geo-dvf/latest/csv/)
+ou fichiers bruts DGFiP valeursfoncieres-AAAA.txt (sans coordonnees).
+Chaque fichier est charge dans sa propre transaction et son empreinte
+enregistree dans dvf_import_files : a la publication semestrielle, seuls les
+fichiers nouveaux ou modifies sont recharges ; en cas d'interruption, relancer
+la commande reprend au premier fichier non charge. Les mutations professionnelles
+importees sont ensuite promues dans le pool de comparables (services/dvf_promotion.py)
+et les partitions touchees exportees en Parquet (services/dvf_parquet.py).
+
+Usage: python scripts/import_dvf.py [fichiers ou repertoires...] [--force] [--chunk-rows 100000]
+                                   [--skip-promotion] [--skip-export]
+       (par defaut : tous les fichiers de DVF_DATA_PATH)
+"""
+import sys
+import os
+import argparse
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.dvf_import import DVF_CHUNK_ROWS, import_dvf_file, list_dvf_files
+from app.services.dvf_parquet import export_dvf_parquet
+from app.services.dvf_promotion import promote_dvf_mutations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import des donnees DVF")
+    parser.add_argument("paths", nargs="*", default=[settings.DVF_DATA_PATH],
+                        help="Fichiers DVF (.csv, .txt, .gz, .zip) ou repertoires")
+    parser.add_argument("--force", action="store_true",
+                        help="Recharger aussi les fichiers inchanges")
+    parser.add_argument("--chunk-rows", type=int, default=DVF_CHUNK_ROWS,
+                        help="Lignes lues et envoyees par COPY a la fois")
+    parser.add_argument("--skip-promotion", action="store_true",
+                        help="Ne pas promouvoir les mutations importees dans le pool de comparables")
+    parser.add_argument("--skip-export", action="store_true",
+                        help="Ne pas mettre a jour le cache Parquet des analyses de marche")
+    args = parser.parse_args()
+
+    files = [f for path in args.paths for f in list_dvf_files(path)]
+
+    print("=" * 60)
+    print("Import des donnees DVF")
+    print("=" * 60)
+    if not files:
+        print("  Aucun fichier DVF trouve")
+        sys.exit(1)
+
+    total_rows = 0
+    for path in files:
+        db = SessionLocal()
+        try:
+            report = import_dvf_file(db, path, args.chunk_rows, args.force)
+        except Exception as e:
+            print(f"  {os.path.basename(path)} : erreur {e}")
+            sys.exit(1)
+        finally:
+            db.close()
+        if report.unchanged:
+            print(f"  {report.file_name} : inchange (--force pour recharger)")
+            continue
+        total_rows += report.rows
+        print(f"  {report.file_name} : {report.rows} lignes "
+              f"({report.skipped} ignorees) en {report.seconds:.1f} s, "
+              f"{report.rows_per_second:,.0f} lignes/s")
+        print(f"    {report.inserted} ajoutees, {report.updated} modifiees, {report.deleted} supprimees")
+
+    print("=" * 60)
+    print(f"Total : {total_rows} lignes lues")
+
+    if not args.skip_promotion:
+        db = SessionLocal()
+        try:
+            report = promote_dvf_mutations(db)
+        except Exception as e:
+            print(f"Erreur de promotion : {e}")
+            sys.exit(1)
+        finally:
+            db.close()
+        print(f"Promotion dans le pool : {report['promotable']} mutations retenues sur "
+              f"{report['candidates']} ({report['files']} fichiers), {report['inserted']} ajoutees, "
+              f"{report['updated']} modifiees, {report['deleted']} retirees")
+
+    if not args.skip_export:
+        db = SessionLocal()
+        try:
+            report = export_dvf_parquet(db)
+        except Exception as e:
+            print(f"Erreur d'export Parquet : {e}")
+            sys.exit(1)
+        finally:
+            db.close()
+        print(f"Export Parquet : {report['partitions']} partitions, {report['rows']} lignes, "
+              f"{report['size_bytes'] / 1e6:.1f} Mo en {report['seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Chargement des extraits departementaux de la Base Adresse Nationale
+(adresses-XX.csv.gz, https://adresse.data.gouv.fr/data/ban/adresses/latest/csv)
+dans la table ban_addresses, en flux par COPY. Chaque fichier est charge dans
+sa propre transaction : en cas d'interruption, relancer la commande suffit.
+
+Usage: python scripts/load_ban.py [fichiers ou repertoires...] [--departements 26,07,84]
+       (par defaut : tous les extraits de BAN_DATA_PATH)
+"""
+import sys
+import os
+import argparse
+import glob
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.ban import load_ban_file
+
+
+def list_files(paths: list, departements: set) -> list:
+    """Extraits BAN a charger (repertoires developpes), filtres par departement."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "adresses-*.csv*")))
+        else:
+            files.append(path)
+    if departements:
+        files = [
+            f for f in files
+            if os.path.basename(f).split(".")[0].removeprefix("adresses-") in departements
+        ]
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chargement de la Base Adresse Nationale")
+    parser.add_argument("paths", nargs="*", default=[settings.BAN_DATA_PATH],
+                        help="Fichiers adresses-XX.csv[.gz] ou repertoires")
+    parser.add_argument("--departements", default="",
+                        help="Departements a charger (separes par des virgules, tous par defaut)")
+    args = parser.parse_args()
+
+    departements = {value.strip() for value in args.departements.split(",") if value.strip()}
+    files = list_files(args.paths, departements)
+
+    print("=" * 60)
+    print("Chargement de la Base Adresse Nationale")
+    print("=" * 60)
+    if not files:
+        print("  Aucun extrait BAN trouve")
+        sys.exit(1)
+
+    total_rows = 0
+    for path in files:
+        db = SessionLocal()
+        try:
+            report = load_ban_file(db, path)
+        except Exception as e:
+            print(f"  {os.path.basename(path)} : erreur {e}")
+            sys.exit(1)
+        finally:
+            db.close()
+        total_rows += report.rows
+        print(f"  {os.path.basename(path)} : {report.rows} adresses "
+              f"({report.skipped} ignorees) en {report.seconds:.1f} s, "
+              f"{report.rows_per_second:,.0f} lignes/s")
+
+    print("=" * 60)
+    print(f"Total : {total_rows} adresses chargees")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Chargement des contours des communes (et de leur EPCI) depuis un fichier
+GeoJSON local, puis rattachement des biens du pool et des biens evalues a
+leur commune (insee_code) par jointure spatiale.
+
+Formats acceptes (proprietes des features) :
+  - geo.api.gouv.fr : code, nom, codeDepartement, codeEpci, nomEpci
+  - IGN ADMIN EXPRESS : INSEE_COM, NOM, INSEE_DEP, SIREN_EPCI, NOM_EPCI
+
+Usage: python scripts/load_communes.py data/communes.geojson [--departements 26,07,84]
+                                       [--skip-backfill] [--overwrite]
+"""
+import sys
+import os
+import argparse
+import json
+import time
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import SessionLocal
+from app.services.communes import backfill_insee_codes
+
+# Noms de propriete possibles pour chaque colonne, par ordre de preference
+PROPERTY_NAMES = {
+    "insee_code": ("code", "INSEE_COM", "insee"),
+    "name": ("nom", "NOM", "NOM_COM"),
+    "departement": ("codeDepartement", "INSEE_DEP"),
+    "epci_code": ("codeEpci", "SIREN_EPCI", "epci"),
+    "epci_name": ("nomEpci", "NOM_EPCI"),
+}
+
+BATCH_SIZE = 500
+
+_UPSERT_SQL = text("""
+    INSERT INTO communes (insee_code, name, departement, epci_code, epci_name, geom)
+    VALUES (:insee_code, :name, :departement, :epci_code, :epci_name,
+            ST_Multi(ST_SetSRID(ST_GeomFromGeoJSON(:geometry), 4326)))
+    ON CONFLICT (insee_code) DO UPDATE SET
+        name = EXCLUDED.name,
+        departement = EXCLUDED.departement,
+        epci_code = EXCLUDED.epci_code,
+        epci_name = EXCLUDED.epci_name,
+        geom = EXCLUDED.geom
+""")
+
+
+def read_property(properties: dict, column: str):
+    """Valeur de la premiere propriete presente parmi les noms connus de la colonne."""
+    for name in PROPERTY_NAMES[column]:
+        value = properties.get(name)
+        if value not in (None, "", "NC"):
+            return str(value)
+    return None
+
+
+def iter_communes(path: str, departements: set):
+    """Lignes a inserer, filtrees par departement si demande."""
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    for feature in features:
+        properties = feature.get("properties") or {}
+        row = {column: read_property(properties, column) for column in PROPERTY_NAMES}
+        if not row["insee_code"] or not row["name"] or not feature.get("geometry"):
+            continue
+        if departements and row["departement"] not in departements:
+            continue
+        row["geometry"] = json.dumps(feature["geometry"])
+        yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chargement des contours des communes")
+    parser.add_argument("path", help="Fichier GeoJSON des communes")
+    parser.add_argument("--departements", default="",
+                        help="Departements a charger (separes par des virgules, tous par defaut)")
+    parser.add_argument("--skip-backfill", action="store_true",
+                        help="Ne pas renseigner insee_code sur le pool et les biens evalues")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Recalculer insee_code meme s'il est deja renseigne")
+    args = parser.parse_args()
+
+    departements = {value.strip() for value in args.departements.split(",") if value.strip()}
+
+    print("=" * 60)
+    print("Chargement des contours des communes")
+    print("=" * 60)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        count = 0
+        batch = []
+        for row in iter_communes(args.path, departements):
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                db.execute(_UPSERT_SQL, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            db.execute(_UPSERT_SQL, batch)
+            count += len(batch)
+        db.commit()
+        print(f"  {count} communes chargees en {time.perf_counter() - start:.1f} s")
+
+        if not args.skip_backfill:
+            start = time.perf_counter()
+            pool, properties = backfill_insee_codes(db, overwrite=args.overwrite)
+            print(f"  insee_code renseigne : {pool} biens du pool, {properties} biens evalues "
+                  f"({time.perf_counter() - start:.1f} s)")
+    except Exception as e:
+        print(f"Erreur : {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
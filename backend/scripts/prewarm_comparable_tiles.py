@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Prechauffage du cache disque des tuiles vectorielles du pool de comparables
+pour les zones desservies (Valence, Avignon).
+
+Usage: python scripts/prewarm_comparable_tiles.py [--areas valence,avignon] [--zooms 8-14]
+                                                  [--property-types office,warehouse]
+"""
+import sys
+import os
+import argparse
+import time
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import PropertyType
+from app.services.comparable_tiles import PREWARM_AREAS, TileFilters, prewarm_tiles
+
+
+def parse_zooms(value: str) -> list:
+    """Convertit '8-14' ou '10,12,14' en liste de niveaux de zoom."""
+    if "-" in value:
+        start, stop = (int(v) for v in value.split("-"))
+        return list(range(start, stop + 1))
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prechauffage du cache des tuiles de comparables")
+    parser.add_argument("--areas", default=",".join(PREWARM_AREAS),
+                        help="Zones a prechauffer (separees par des virgules)")
+    parser.add_argument("--zooms", default=f"8-{min(14, settings.COMPARABLE_TILE_CACHE_MAX_ZOOM)}",
+                        help="Niveaux de zoom (intervalle 8-14 ou liste 10,12)")
+    parser.add_argument("--property-types", default="",
+                        help="Types de bien a prechauffer en plus de la vue sans filtre")
+    args = parser.parse_args()
+
+    zooms = [z for z in parse_zooms(args.zooms) if z <= settings.COMPARABLE_TILE_CACHE_MAX_ZOOM]
+    filters = [TileFilters()] + [
+        TileFilters(property_type=PropertyType(value).value)
+        for value in args.property_types.split(",") if value
+    ]
+
+    print("=" * 60)
+    print("Prechauffage du cache des tuiles de comparables")
+    print("=" * 60)
+    print(f"Cache : {settings.COMPARABLE_TILE_CACHE_DIR} | zooms {zooms[0]}-{zooms[-1]}" if zooms
+          else "Aucun zoom a prechauffer")
+
+    db = SessionLocal()
+    try:
+        for area in args.areas.split(","):
+            bbox = PREWARM_AREAS[area]
+            for tile_filters in filters:
+                start = time.perf_counter()
+                count = prewarm_tiles(db, bbox, zooms, tile_filters)
+                elapsed = time.perf_counter() - start
+                print(f"   {area} [{tile_filters.cache_key()}] : {count} tuiles en {elapsed:.1f} s")
+    finally:
+        db.close()
+
+    print("\n" + "=" * 60)
+    print("Prechauffage termine")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
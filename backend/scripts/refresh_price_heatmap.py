@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Recalcul de la carte de chaleur des prix (price_heatmap_cells).
+Incremental par defaut : cellules touchees par les ecritures du pool et par les
+fichiers DVF importes depuis le dernier passage. A planifier (cron) apres les
+imports ; --full reconstruit toutes les cellules.
+
+Usage: python scripts/refresh_price_heatmap.py [--full]
+"""
+import sys
+import os
+import argparse
+
+# Ajouter le repertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.price_heatmap import refresh_price_heatmap
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcul de la carte de chaleur des prix")
+    parser.add_argument("--full", action="store_true", help="Reconstruire toutes les cellules")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Carte de chaleur des prix")
+    print("=" * 60)
+
+    db = SessionLocal()
+    try:
+        report = refresh_price_heatmap(db, full=args.full)
+    except Exception as e:
+        print(f"Erreur : {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"  {report['keys']} cles touchees ({report['dvf_files']} fichiers DVF)")
+    print(f"  {report['cells']} cellules recalculees : {report['written']} ecrites, "
+          f"{report['emptied']} videes, en {report['seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
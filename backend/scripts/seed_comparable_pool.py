@@ -14,7 +14,6 @@ import random
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from app.database import SessionLocal
 from app.models import ComparablePool, ComparableSource, TransactionType
 
@@ -261,16 +260,6 @@ def create_comparable_pool_data(db: Session) -> list:
     return comparables
 
 
-def update_geom_column(db: Session):
-    """Met a jour la colonne geom avec les coordonnees lat/lng."""
-    db.execute(text("""
-        UPDATE comparable_pool
-        SET geom = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
-        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
-    """))
-    db.commit()
-
-
 def main():
     print("=" * 60)
     print("Peuplement de la table comparable_pool")
@@ -293,12 +282,7 @@ def main():
             db.add(comp)
 
         db.commit()
-        print(f"   {len(comparables)} comparables crees")
-
-        # Mettre a jour la colonne geom
-        print("\nMise a jour des colonnes PostGIS...")
-        update_geom_column(db)
-        print("   Colonnes geom mises a jour")
+        print(f"   {len(comparables)} comparables crees (geom posee par trigger)")
 
         # Statistiques
         print("\n" + "=" * 60)
@@ -0,0 +1,34 @@
+"""
+Tests des conversions de colonnes de l'import de comparables
+"""
+from datetime import date, datetime
+
+import pandas as pd
+
+from app.services.comparable_import import _to_date, _to_number
+
+
+def test_to_date_iso_not_swapped():
+    values = pd.Series(["2024-03-05", "2024-03-25", "2024-12-01"], dtype=object)
+    assert _to_date(values).tolist() == [date(2024, 3, 5), date(2024, 3, 25), date(2024, 12, 1)]
+
+
+def test_to_date_day_first():
+    values = pd.Series(["05/03/2024", "31/12/2024", "5/3/24"], dtype=object)
+    assert _to_date(values).tolist() == [date(2024, 3, 5), date(2024, 12, 31), date(2024, 3, 5)]
+
+
+def test_to_date_mixed_and_invalid():
+    values = pd.Series(["2024-03-05", "05/03/2024", datetime(2024, 3, 5), None, "", "inconnue"], dtype=object)
+    assert _to_date(values).tolist() == [date(2024, 3, 5)] * 3 + [None] * 3
+
+
+def test_to_number_french_formats():
+    values = pd.Series(["1.250,50", "1 250,50 EUR", "12,5", "1250.5", 1250, "abc", None], dtype=object)
+    numbers = _to_number(values)
+    assert numbers[:5].tolist() == [1250.5, 1250.5, 12.5, 1250.5, 1250.0]
+    assert numbers[5:].isna().all()
+
+
+def test_to_number_numeric_column():
+    assert _to_number(pd.Series([1, 2.5])).tolist() == [1.0, 2.5]